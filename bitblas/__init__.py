@@ -38,6 +38,7 @@ from .ops.general_matmul import MatmulConfig, Matmul  # noqa: F401
 from .ops.general_matmul_splitk import MatmulConfigWithSplitK, MatmulWithSplitK  # noqa: F401
 from .ops.matmul_dequantize import MatmulWeightOnlyDequantizeConfig, MatmulWeightOnlyDequantize  # noqa: F401
 from .module import Linear  # noqa: F401
+from .batch_tuner import BatchTuner, collect_linear_configs  # noqa: F401
 
 import logging
 from tqdm import tqdm
@@ -15,4 +15,19 @@ from .common_schedules import get_block, get_output_blocks, try_inline, try_inli
 from .schedule_rule import ScheduleRule
 from .transform import ApplyDefaultSchedule, ApplyFastTuning
 from .utils import fast_tune, fast_tune_with_dynamic_range
+from .tuning_package import build_tuning_package, load_tuning_package, measure_tuning_package
+from .budget import TuningBudget
+from .builder import Builder, BuildServer, LocalBuilder, RemoteBuilder, get_builder, set_builder
+from .measure import MeasureOption, measure_latency, summarize_latency
+from .tensor_pool import ProfileTensorPool, get_profile_tensor_pool
+from .buckets import padded_cost, select_buckets
+from .tuning_log import TuningLog, get_tuning_log, set_tuning_log
+from .cost_model import (
+    CostModel,
+    RidgeCostModel,
+    extract_hint_features,
+    get_cost_model,
+    rank_candidates,
+    set_cost_model,
+)
 from .roller import *
@@ -0,0 +1,73 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""Selection of the dynamic-range buckets from the observed shapes."""
+from typing import Callable, Dict, List, Optional
+
+# default number of buckets, as many as the default opt_M of bitblas.Linear
+DEFAULT_MAX_BUCKETS = 7
+
+
+def padded_cost(m: int, bucket: int) -> float:
+    """
+    Relative cost of running a problem of size `m` with the kernel tuned for
+    `bucket` (>= m): the kernel is tiled for `bucket` rows, so the larger the
+    bucket is compared to m, the more of its tiles are padding.
+    """
+    return bucket / m
+
+
+def select_buckets(histogram: Dict[int, int],
+                   max_buckets: int = DEFAULT_MAX_BUCKETS,
+                   cost_fn: Optional[Callable[[int, int], float]] = None) -> List[int]:
+    """
+    Returns the bucket boundaries (opt_shapes) minimizing the expected cost of the
+    observed sizes, where `histogram` maps a size to its number of occurrences and
+    a size is served by the smallest bucket not below it, as in the dispatcher.
+
+    `cost_fn(m, bucket)` is the cost of serving m with the kernel of bucket,
+    `padded_cost` by default; measured latencies can be plugged in instead. The
+    optimal boundaries are among the observed sizes, which are partitioned into at
+    most `max_buckets` contiguous groups by dynamic programming.
+    """
+    if max_buckets < 1:
+        raise ValueError("max_buckets should be at least 1")
+    values = sorted(int(m) for m, count in histogram.items() if count > 0 and int(m) > 0)
+    if not values:
+        raise ValueError("The histogram has no positive size")
+    if cost_fn is None:
+        cost_fn = padded_cost
+    counts = [histogram[m] for m in values]
+    num_values = len(values)
+    max_buckets = min(max_buckets, num_values)
+
+    # segment_cost[i][j]: the cost of serving values[i..j] with the bucket values[j]
+    segment_cost = [[0.0] * num_values for _ in range(num_values)]
+    for j in range(num_values):
+        total = 0.0
+        for i in range(j, -1, -1):
+            total += counts[i] * cost_fn(values[i], values[j])
+            segment_cost[i][j] = total
+
+    inf = float("inf")
+    # cost[k][j]: the cost of serving values[0..j] with k + 1 buckets, the last one values[j]
+    cost = [[inf] * num_values for _ in range(max_buckets)]
+    split = [[-1] * num_values for _ in range(max_buckets)]
+    for j in range(num_values):
+        cost[0][j] = segment_cost[0][j]
+    for k in range(1, max_buckets):
+        for j in range(k, num_values):
+            for i in range(k - 1, j):
+                candidate = cost[k - 1][i] + segment_cost[i + 1][j]
+                if candidate < cost[k][j]:
+                    cost[k][j] = candidate
+                    split[k][j] = i
+
+    # fewer buckets are kept when more do not lower the cost
+    k = min(range(max_buckets), key=lambda k: (cost[k][num_values - 1], k))
+    buckets = []
+    j = num_values - 1
+    while k >= 0 and j >= 0:
+        buckets.append(values[j])
+        j = split[k][j]
+        k -= 1
+    return sorted(buckets)
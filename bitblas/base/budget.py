@@ -0,0 +1,69 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""Time and compile-count budgets of tuning jobs."""
+import time
+from typing import Dict, Optional
+
+
+class TuningBudget:
+    """
+    Bounds the wall time (`max_seconds`) and the number of builds (`max_builds`)
+    of tuning. A budget can be shared by several tunings, e.g. all the operators of
+    a batch job: the clock starts with the first one and the builds add up.
+
+    Once the budget is exhausted no new candidate is applied or built; with a time
+    budget the candidates still in flight are abandoned as well. The best candidate
+    measured so far is kept and the others remain unexplored, they are not recorded
+    in the tuning log so that a later run evaluates them. `report` tells how much of
+    the candidate space was explored; a budget can be exhausted and still complete,
+    e.g. when the last candidate used up the last build.
+    """
+
+    def __init__(self, max_seconds: Optional[float] = None, max_builds: Optional[int] = None):
+        self.max_seconds = max_seconds
+        self.max_builds = max_builds
+        self.start_time: Optional[float] = None
+        self.builds = 0
+        self.candidates = 0
+        self.explored = 0
+
+    def start(self) -> "TuningBudget":
+        if self.start_time is None:
+            self.start_time = time.monotonic()
+        return self
+
+    def elapsed(self) -> float:
+        return 0.0 if self.start_time is None else time.monotonic() - self.start_time
+
+    def remaining_seconds(self) -> Optional[float]:
+        if self.max_seconds is None:
+            return None
+        return max(self.max_seconds - self.elapsed(), 0.0)
+
+    def time_exhausted(self) -> bool:
+        return self.max_seconds is not None and self.elapsed() >= self.max_seconds
+
+    def can_build(self) -> bool:
+        if self.time_exhausted():
+            return False
+        return self.max_builds is None or self.builds < self.max_builds
+
+    @property
+    def exhausted(self) -> bool:
+        return not self.can_build()
+
+    @property
+    def is_complete(self) -> bool:
+        """Whether every candidate handed to the tunings so far was explored."""
+        return self.explored >= self.candidates
+
+    def report(self) -> Dict:
+        return {
+            "elapsed": self.elapsed(),
+            "builds": self.builds,
+            "candidates": self.candidates,
+            "explored": self.explored,
+            "explored_ratio": self.explored / self.candidates if self.candidates else 1.0,
+            "exhausted": self.exhausted,
+            "complete": self.is_complete,
+        }
@@ -0,0 +1,257 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""Builders compiling the scheduled candidates of tuning, locally or on remote hosts."""
+import argparse
+import os
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import cycle
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from typing import Dict, List, Optional, Tuple, Union
+import logging
+
+from tvm.contrib.popen_pool import PopenPoolExecutor
+from tvm.contrib.tar import tar
+from tvm.target import Target
+
+from bitblas import tvm
+from bitblas.utils import tensor_replace_dp4a, tensor_remove_make_int4, tensor_remove_make_int2
+
+logger = logging.getLogger(__name__)
+
+Address = Tuple[str, int]
+
+
+def build_module(mod: tvm.IRModule, target: Target, pass_context: Dict) -> tvm.runtime.Module:
+    """Builds a scheduled candidate with the pass context of its hint."""
+
+    # TODO(lei):
+    # this is a trick to implement rasteration, will be removed in the future
+    @tvm.register_func(func_name="tvm_callback_cuda_postproc", override=True)
+    def tvm_callback_cuda_postproc(code, _):
+        code = tensor_replace_dp4a(code)
+        code = tensor_remove_make_int4(code)
+        code = tensor_remove_make_int2(code)
+        return code
+
+    with tvm.transform.PassContext(config={"tir.use_async_copy": True, **pass_context}):
+        return tvm.build(mod, target=target)
+
+
+def build_and_export(mod: tvm.IRModule, target: Target, pass_context: Dict,
+                     artifact_path: Optional[str]) -> Tuple[str, Union[str, bytes]]:
+    """
+    Builds a candidate and exports it as a tar archive, returns the generated
+    source and the path of the archive, or its content when `artifact_path` is None.
+    """
+    rt_mod = build_module(mod, target, pass_context)
+    code = rt_mod.imported_modules[0].get_source()
+    if artifact_path is not None:
+        rt_mod.export_library(artifact_path, fcompile=tar)
+        return code, artifact_path
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        artifact_path = os.path.join(tmp_dir, "tvm_tmp_mod." + tar.output_format)
+        rt_mod.export_library(artifact_path, fcompile=tar)
+        with open(artifact_path, "rb") as f:
+            return code, f.read()
+
+
+def _build_serialized(mod_json: str, target: str, pass_context: Dict) -> Tuple[str, bytes]:
+    return build_and_export(tvm.ir.load_json(mod_json), Target(target), pass_context, None)
+
+
+class Builder(ABC):
+    """
+    Compiles the scheduled candidates of `_apply_and_build_candidates`. `submit`
+    returns a future of the generated source and the built module exported as a
+    tar archive: its path when `artifact_path` is given and the builder can write
+    there, its content otherwise. A build exceeding the timeout of the builder
+    raises TimeoutError.
+    """
+
+    # builds running at once, bounds the candidates handed to the builder
+    max_workers: int = 1
+
+    @abstractmethod
+    def submit(self, mod: tvm.IRModule, target: Target, pass_context: Dict,
+               artifact_path: Optional[str]) -> Future:
+        pass
+
+    def shutdown(self):
+        pass
+
+
+class LocalBuilder(Builder):
+    """Builds in local worker processes."""
+
+    def __init__(self, max_workers: Optional[int] = None, timeout: Optional[float] = 30):
+        self.max_workers = max_workers or os.cpu_count()
+        self.pool = PopenPoolExecutor(max_workers=self.max_workers, timeout=timeout)
+
+    def submit(self, mod: tvm.IRModule, target: Target, pass_context: Dict,
+               artifact_path: Optional[str]) -> Future:
+        return self.pool.submit(build_and_export, mod, target, pass_context, artifact_path)
+
+    def shutdown(self):
+        del self.pool
+
+
+class RemoteBuilder(Builder):
+    """
+    Builds on `BuildServer`s, e.g. CPU-only hosts doing the compile-heavy part of
+    tuning for a GPU machine. Every build is sent to the next server in turn as
+    the serialized module, the target and the pass context, and the archive comes
+    back as bytes, so the servers need no shared filesystem. `max_workers` builds
+    are in flight at once, by default as many as the servers run together.
+
+    The connections are authenticated with `authkey`, but the messages are
+    pickled: only use servers on a trusted network.
+    """
+
+    def __init__(self,
+                 addresses: List[Address],
+                 authkey: bytes,
+                 max_workers: Optional[int] = None,
+                 timeout: Optional[float] = 30):
+        if not addresses:
+            raise ValueError("RemoteBuilder needs at least one server address")
+        self.addresses = [tuple(address) for address in addresses]
+        self.authkey = authkey
+        self.timeout = timeout
+        if max_workers is None:
+            max_workers = sum(self._query_workers(address) for address in self.addresses)
+        self.max_workers = max_workers
+        self._next_address = cycle(self.addresses)
+        self._lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def _query_workers(self, address: Address) -> int:
+        with Client(address, authkey=self.authkey) as conn:
+            conn.send({"query": "max_workers"})
+            return conn.recv()["max_workers"]
+
+    def _request(self, address: Address, request: Dict) -> Tuple[str, bytes]:
+        with Client(address, authkey=self.authkey) as conn:
+            conn.send(request)
+            if not conn.poll(self.timeout):
+                raise TimeoutError(f"Build on {address} timed out")
+            response = conn.recv()
+        if "error" in response:
+            raise RuntimeError(f"Build on {address} failed: {response['error']}")
+        return response["code"], response["artifact"]
+
+    def submit(self, mod: tvm.IRModule, target: Target, pass_context: Dict,
+               artifact_path: Optional[str]) -> Future:
+        with self._lock:
+            address = next(self._next_address)
+        request = {
+            "mod": tvm.ir.save_json(mod),
+            "target": str(target),
+            "pass_context": dict(pass_context),
+        }
+        return self.pool.submit(self._request, address, request)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
+
+
+class BuildServer:
+    """
+    Serves the builds of `RemoteBuilder`s with `max_workers` local worker
+    processes. Run one per build host with `python -m bitblas.base.builder`, or
+    `start` one in the background, e.g. as a local stand-in in tests:
+
+        server = BuildServer(("localhost", 0), authkey=b"secret").start()
+        builder = RemoteBuilder([server.address], authkey=b"secret")
+    """
+
+    def __init__(self,
+                 address: Address,
+                 authkey: bytes,
+                 max_workers: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        self.max_workers = max_workers or os.cpu_count()
+        self.listener = Listener(tuple(address), authkey=authkey)
+        self.pool = PopenPoolExecutor(max_workers=self.max_workers, timeout=timeout)
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    @property
+    def address(self) -> Address:
+        return self.listener.address
+
+    def _handle(self, conn):
+        with conn:
+            try:
+                request = conn.recv()
+            except (EOFError, OSError):
+                return
+            if request.get("query") == "max_workers":
+                conn.send({"max_workers": self.max_workers})
+                return
+            try:
+                code, artifact = self.pool.submit(_build_serialized, request["mod"],
+                                                  request["target"],
+                                                  request["pass_context"]).result()
+                response = {"code": code, "artifact": artifact}
+            except Exception as build_error:  # pylint: disable=broad-except
+                response = {"error": str(build_error)}
+            try:
+                conn.send(response)
+            except OSError:
+                logger.debug("The builder left before its build finished")
+
+    def serve_forever(self):
+        while not self._closed:
+            try:
+                conn = self.listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                # closed, or a client failed to authenticate
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def start(self) -> "BuildServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._closed = True
+        self.listener.close()
+        del self.pool
+
+
+_global_builder: Optional[Builder] = None
+
+
+def get_builder() -> Optional[Builder]:
+    return _global_builder
+
+
+def set_builder(builder: Optional[Builder]) -> Optional[Builder]:
+    """Sets the builder used by tuning when none is passed explicitly, None builds locally."""
+    global _global_builder
+    _global_builder = builder
+    return _global_builder
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the builds of BitBLAS tuning")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=9190)
+    parser.add_argument("--authkey", required=True)
+    parser.add_argument("--max-workers", type=int, default=None)
+    args = parser.parse_args()
+    server = BuildServer((args.host, args.port), args.authkey.encode(), args.max_workers)
+    logger.info(f"Serving builds on {server.address} with {server.max_workers} workers")
+    try:
+        server.serve_forever()
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""Cost models ranking the candidates of the roller policies before they are built."""
+import json
+import math
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .roller.hint import Hint
+from .tuning_log import STATUS_OK, TuningLog
+
+# candidates kept by `rank_candidates` when no count is given
+DEFAULT_PRUNE_TOPK = 5
+
+
+def _log2_prod(values) -> float:
+    return float(sum(math.log2(max(int(v), 1)) for v in values))
+
+
+def extract_hint_features(hint_json: Dict) -> List[float]:
+    """
+    Features of a serialized hint (Hint.to_json), so that models can be trained from
+    the hints stored in tuning logs and applied to the hints emitted by the policies.
+    """
+    block = hint_json["block"]
+    rstep = hint_json["rstep"]
+    vectorize = list(hint_json.get("vectorize", {}).values())
+    opt_shapes = [v for v in hint_json.get("opt_shapes", {}).values() if isinstance(v, int)]
+    block_reduction_depth = hint_json.get("block_reduction_depth") or 0
+    return [
+        _log2_prod(block),
+        _log2_prod(hint_json["thread"]),
+        _log2_prod(hint_json["warp"]) if hint_json["use_tc"] else 0.0,
+        _log2_prod(rstep),
+        _log2_prod(hint_json["reduce_thread"]),
+        # aspect ratio of the two innermost block dimensions
+        _log2_prod(block[-1:]) - _log2_prod(block[-2:-1]) if len(block) > 1 else 0.0,
+        float(hint_json["use_tc"]),
+        float(hint_json["use_async"]),
+        float(hint_json["pipeline_stage"]),
+        float(block_reduction_depth),
+        float(hint_json["rasterization_plan"]["kind"] != "NoRasterization"),
+        float(len(hint_json.get("cached_tensors", []))),
+        _log2_prod(vectorize) / len(vectorize) if vectorize else 0.0,
+        # the tile relative to the (dynamic) problem size it was tuned for
+        _log2_prod(block) - _log2_prod(opt_shapes) if opt_shapes else 0.0,
+    ]
+
+
+class CostModel(ABC):
+    """Predicts a score per candidate, smaller is better."""
+
+    @abstractmethod
+    def predict(self, hints: List[Hint]) -> np.ndarray:
+        pass
+
+
+class RidgeCostModel(CostModel):
+    """
+    Ridge regression over `extract_hint_features`, trained on the records of tuning
+    logs. The target is the log latency relative to the fastest candidate of the same
+    workload and arch, so that workloads of different sizes can be mixed and only the
+    ranking within a workload is learned. Training and inference run on CPU with
+    numpy; an untrained model scores all candidates equally, which keeps the order
+    of the policy.
+    """
+
+    def __init__(self, alpha: float = 1.0):
+        self.alpha = alpha
+        self.weights: Optional[np.ndarray] = None
+        self.mean: Optional[np.ndarray] = None
+        self.std: Optional[np.ndarray] = None
+
+    @property
+    def is_trained(self) -> bool:
+        return self.weights is not None
+
+    def fit(self, records: Iterable[Dict]) -> "RidgeCostModel":
+        """Trains on tuning log records, only successfully measured ones are used."""
+        groups: Dict = {}
+        for record in records:
+            if record["status"] != STATUS_OK or not record.get("latency"):
+                continue
+            groups.setdefault((record["workload"], record["arch"]), []).append(record)
+        features, targets = [], []
+        for group in groups.values():
+            best_latency = min(record["latency"] for record in group)
+            for record in group:
+                features.append(extract_hint_features(record["hint"]))
+                targets.append(math.log(record["latency"] / best_latency))
+        if not features:
+            raise ValueError("No successfully measured records to train the cost model")
+        x = np.asarray(features, dtype=np.float64)
+        y = np.asarray(targets, dtype=np.float64)
+        self.mean = x.mean(axis=0)
+        self.std = x.std(axis=0)
+        self.std[self.std == 0] = 1.0
+        x = np.hstack([(x - self.mean) / self.std, np.ones((len(x), 1))])
+        regularizer = self.alpha * np.eye(x.shape[1])
+        # the intercept is not regularized
+        regularizer[-1, -1] = 0.0
+        self.weights = np.linalg.solve(x.T @ x + regularizer, x.T @ y)
+        return self
+
+    def fit_from_log(self, tuning_log: TuningLog) -> "RidgeCostModel":
+        return self.fit(tuning_log)
+
+    def predict(self, hints: List[Hint]) -> np.ndarray:
+        if not self.is_trained or not hints:
+            return np.zeros(len(hints))
+        x = np.asarray([extract_hint_features(hint.to_json()) for hint in hints],
+                       dtype=np.float64)
+        x = np.hstack([(x - self.mean) / self.std, np.ones((len(x), 1))])
+        return x @ self.weights
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "alpha": self.alpha,
+                    "weights": self.weights.tolist(),
+                    "mean": self.mean.tolist(),
+                    "std": self.std.tolist(),
+                }, f)
+
+    @classmethod
+    def load(cls, path: str) -> "RidgeCostModel":
+        with open(path) as f:
+            data = json.load(f)
+        model = cls(alpha=data["alpha"])
+        model.weights = np.asarray(data["weights"])
+        model.mean = np.asarray(data["mean"])
+        model.std = np.asarray(data["std"])
+        return model
+
+
+def rank_candidates(configs: List[Hint],
+                    cost_model: CostModel,
+                    topk: Optional[int] = DEFAULT_PRUNE_TOPK) -> List[Hint]:
+    """Orders the candidates by the predicted score and keeps the best `topk`."""
+    if not configs:
+        return configs
+    scores = cost_model.predict(configs)
+    # stable, candidates scored equally keep the order of the policy
+    order = sorted(range(len(configs)), key=lambda idx: scores[idx])
+    ranked = [configs[idx] for idx in order]
+    return ranked[:topk] if topk is not None else ranked
+
+
+_global_cost_model: Optional[CostModel] = None
+
+
+def get_cost_model() -> Optional[CostModel]:
+    return _global_cost_model
+
+
+def set_cost_model(cost_model: Optional[CostModel]) -> Optional[CostModel]:
+    """Sets the model used by `fast_tune` when none is passed explicitly, None disables it."""
+    global _global_cost_model
+    _global_cost_model = cost_model
+    return _global_cost_model
@@ -0,0 +1,117 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""Robust latency measurement of built kernels."""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from bitblas import tvm
+
+# the global function called by the time evaluator before every sample to flush the L2
+_FLUSH_FUNC_NAME = "bitblas.measure.flush_l2"
+# flushed bytes when the L2 size of the device is unknown, larger than the L2 of current GPUs
+DEFAULT_FLUSH_BYTES = 64 << 20
+
+# the device buffers copied into each other to flush the L2, per device
+_flush_buffers: Dict[Tuple[int, int], Tuple[tvm.nd.NDArray, tvm.nd.NDArray]] = {}
+_active_flush: List[Tuple[tvm.nd.NDArray, tvm.nd.NDArray]] = []
+
+
+@dataclass
+class MeasureOption:
+    """
+    How `measure_latency` measures a kernel: `warmup` untimed runs, then `repeat`
+    samples of `number` runs each, the number raised until a sample takes at least
+    `min_repeat_ms`. With `flush_l2` the L2 cache is flushed before every sample,
+    so that a kernel is not timed with the inputs left in cache by the previous
+    run; only the first run of a sample is cold, so use it with `number=1` and
+    without `min_repeat_ms`. Samples further than `outlier_threshold` (scaled)
+    median absolute deviations from the median are rejected, None keeps them all.
+    """
+    warmup: int = 5
+    repeat: int = 20
+    number: int = 1
+    min_repeat_ms: float = 0.0
+    flush_l2: bool = True
+    outlier_threshold: Optional[float] = 3.0
+
+
+def _flush_l2(*args):
+    for src, dst in _active_flush:
+        dst.copyfrom(src)
+
+
+def _get_flush_buffers(device, nbytes: int) -> Tuple[tvm.nd.NDArray, tvm.nd.NDArray]:
+    key = (device.device_type, device.device_id)
+    buffers = _flush_buffers.get(key)
+    if buffers is None or buffers[0].shape[0] < nbytes:
+        buffers = tuple(tvm.nd.empty((nbytes,), "int8", device) for _ in range(2))
+        _flush_buffers[key] = buffers
+    return buffers
+
+
+def summarize_latency(samples: Sequence[float],
+                      outlier_threshold: Optional[float] = 3.0) -> Tuple[List[float], Dict]:
+    """
+    Rejects the outliers of the latency samples and returns the kept samples with
+    their median, mean, p90, standard deviation and minimum, and the number of
+    samples and of rejected outliers.
+    """
+    values = np.asarray(samples, dtype=np.float64)
+    if len(values) == 0:
+        raise ValueError("No latency sample to summarize")
+    kept = values
+    median = float(np.median(values))
+    if outlier_threshold is not None and len(values) >= 3:
+        # 1.4826 scales the median absolute deviation to the standard deviation of a normal
+        mad = 1.4826 * float(np.median(np.abs(values - median)))
+        if mad > 0:
+            kept = values[np.abs(values - median) <= outlier_threshold * mad]
+    stats = {
+        "median": float(np.median(kept)),
+        "mean": float(np.mean(kept)),
+        "p90": float(np.percentile(kept, 90)),
+        "std": float(np.std(kept)),
+        "min": float(np.min(kept)),
+        "num_samples": len(kept),
+        "num_outliers": len(values) - len(kept),
+    }
+    return kept.tolist(), stats
+
+
+def measure_latency(rt_mod,
+                    device,
+                    args: Sequence,
+                    option: Optional[MeasureOption] = None,
+                    l2_cache_size_bytes: Optional[int] = None) -> Tuple[List[float], Dict]:
+    """
+    Measures the entry function of a runtime module on `args` as described by
+    `option` (the default `MeasureOption` if None), returns the kept samples and
+    their statistics in ms, see `summarize_latency`. Twice `l2_cache_size_bytes`
+    are flushed, `DEFAULT_FLUSH_BYTES` when it is unknown.
+    """
+    if option is None:
+        option = MeasureOption()
+    if option.warmup > 0:
+        rt_mod.time_evaluator(rt_mod.entry_name, device, number=option.warmup, repeat=1)(*args)
+
+    f_preproc = ""
+    if option.flush_l2:
+        tvm.register_func(_FLUSH_FUNC_NAME, _flush_l2, override=True)
+        nbytes = 2 * l2_cache_size_bytes if l2_cache_size_bytes else DEFAULT_FLUSH_BYTES
+        _active_flush.append(_get_flush_buffers(device, nbytes))
+        f_preproc = _FLUSH_FUNC_NAME
+    try:
+        result = rt_mod.time_evaluator(
+            rt_mod.entry_name,
+            device,
+            number=option.number,
+            repeat=option.repeat,
+            min_repeat_ms=option.min_repeat_ms,
+            f_preproc=f_preproc)(*args)
+    finally:
+        if option.flush_l2:
+            _active_flush.pop()
+    return summarize_latency([sample * 1e3 for sample in result.results],
+                             option.outlier_threshold)
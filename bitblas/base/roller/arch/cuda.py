@@ -1,10 +1,14 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
+import os
 from bitblas import tvm
 from tvm.target import Target
 from .arch_base import TileDevice
-from typing import List, Dict, Union
+from typing import List, Dict, Optional, Union
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 def check_sm_version(arch: str) -> int:
@@ -26,22 +30,49 @@ class TensorInstruction(object):
         self.shape: List[int] = shape
 
 
+# number of SMs assumed for a deviceless arch, by sm version (V100, T4, A100, A10, L4, H100)
+DEFAULT_SM_COUNTS = {70: 80, 75: 40, 80: 108, 86: 72, 89: 58, 90: 132}
+
+
 class CUDA(TileDevice):
+    """
+    The CUDA arch of a target. The limits are queried from cuda device 0; with
+    `deviceless` (by default when there is no device, e.g. on a build host) they
+    are taken from the target attributes instead, so that candidates can be
+    emitted and compiled but not measured. The SM count, which the target does not
+    describe, is taken from $BITBLAS_NUM_SMS or guessed from the sm version.
+    """
 
-    def __init__(self, target: Union[Target, str]):
+    def __init__(self, target: Union[Target, str], deviceless: Optional[bool] = None):
         if isinstance(target, str):
             target = tvm.target.Target(target)
         self.target = target
         self.sm_version = check_sm_version(self.target.arch)
         device = tvm.runtime.cuda(0)
-        if not device.exist:
+        if deviceless is None:
+            deviceless = not device.exist
+            if deviceless:
+                logger.info("Cannot find cuda device 0, the arch is described by the target "
+                            f"{target}")
+        elif not deviceless and not device.exist:
             raise RuntimeError("Cannot find cuda device 0.")
         self.device: tvm.runtime.Device = device
+        self.has_device: bool = not deviceless
         self.platform: str = "CUDA"
-        self.smem_cap = device.max_shared_memory_per_block
-        self.compute_max_core = device.multi_processor_count
-        self.warp_size = device.warp_size
-        self.compute_capability = device.compute_version.replace(".", "")
+        if deviceless:
+            if self.sm_version < 0:
+                raise ValueError(f"A deviceless cuda target needs an arch, got {target}")
+            self.smem_cap = int(target.attrs.get("max_shared_memory_per_block", 49152))
+            self.compute_max_core = int(
+                os.environ.get("BITBLAS_NUM_SMS",
+                               DEFAULT_SM_COUNTS.get(self.sm_version, DEFAULT_SM_COUNTS[80])))
+            self.warp_size = int(target.attrs.get("thread_warp_size", 32))
+            self.compute_capability = str(self.sm_version)
+        else:
+            self.smem_cap = device.max_shared_memory_per_block
+            self.compute_max_core = device.multi_processor_count
+            self.warp_size = device.warp_size
+            self.compute_capability = device.compute_version.replace(".", "")
         self.reg_cap: int = 65536
         self.max_smem_usage: int = 2 * self.smem_cap
         self.sm_partition: int = 4
@@ -3,6 +3,7 @@
 """Hint definition for schedule"""
 from typing import Dict, List, Tuple
 from . import PrimFuncNode
+from bitblas import tvm
 import numpy as np
 from .rasterization import *
 
@@ -217,6 +218,85 @@ class Hint(object):
             setattr(self, k, v)
         return self
 
+    def to_json(self) -> Dict:
+        """
+        Serializes the hint into a json compatible dict, `Hint().from_json` restores it.
+        The arch is not serialized and has to be attached by the consumer.
+        """
+
+        def _to_int(value):
+            if isinstance(value, (list, tuple, tvm.ir.Array)):
+                return [_to_int(v) for v in value]
+            return int(value)
+
+        rasterization = {"kind": type(self.rasterization_plan).__name__}
+        if hasattr(self.rasterization_plan, "panel_width_"):
+            rasterization["panel_width"] = self.rasterization_plan.panel_width_
+        intrin_info = self.intrin_info
+        return {
+            "block": _to_int(self.block),
+            "thread": _to_int(self.thread),
+            "warp": _to_int(self.warp),
+            "rstep": _to_int(self.rstep),
+            "reduce_thread": _to_int(self.reduce_thread),
+            "use_tc": bool(self.use_tc),
+            "rasterization_plan": rasterization,
+            "cached_tensors": list(self.cached_tensors),
+            "output_strides": {
+                str(k): [stride.ax, stride.stride] for k, stride in self.output_strides.items()
+            },
+            "block_reduction_depth": self.block_reduction_depth,
+            "raxis_order": _to_int(self._raxis_order),
+            "step": _to_int(self._step),
+            "vectorize": {k: int(v) for k, v in self.vectorize.items()},
+            "pipeline_stage": int(self.pipeline_stage),
+            "use_async": bool(self.use_async),
+            "opt_shapes": {k: _to_int(v) for k, v in (self.opt_shapes or {}).items()},
+            "intrin_info": {
+                "in_dtype": intrin_info.in_dtype,
+                "out_dtype": intrin_info.out_dtype,
+                "trans_b": intrin_info.trans_b,
+                "input_transform_kind": int(intrin_info.input_transform_kind),
+                "weight_transform_kind": int(intrin_info.weight_transform_kind),
+            },
+            "shared_scope": self.shared_scope,
+            "pass_context": dict(self.pass_context),
+        }
+
+    def from_json(self, dic: Dict, arch=None) -> "Hint":
+        self.__init__()
+        self.arch = arch
+        self.block = list(dic["block"])
+        self.thread = list(dic["thread"])
+        self.warp = list(dic["warp"])
+        self.rstep = list(dic["rstep"])
+        self.reduce_thread = list(dic["reduce_thread"])
+        self.use_tc = dic["use_tc"]
+        rasterization = dic["rasterization_plan"]
+        if rasterization["kind"] == "Rasterization2DRow":
+            self.rasterization_plan = Rasterization2DRow(rasterization["panel_width"])
+        elif rasterization["kind"] == "Rasterization2DColumn":
+            self.rasterization_plan = Rasterization2DColumn(rasterization["panel_width"])
+        else:
+            self.rasterization_plan = NoRasterization()
+        self.cached_tensors = list(dic["cached_tensors"])
+        # json turns integer keys into strings
+        self.output_strides = {
+            int(k) if k.isdigit() else k: Stride(stride, ax)
+            for k, (ax, stride) in dic["output_strides"].items()
+        }
+        self.block_reduction_depth = dic["block_reduction_depth"]
+        self._raxis_order = list(dic["raxis_order"])
+        self._step = list(dic["step"])
+        self.vectorize = dict(dic["vectorize"])
+        self.pipeline_stage = dic["pipeline_stage"]
+        self.use_async = dic["use_async"]
+        self.opt_shapes = dict(dic["opt_shapes"])
+        self.intrin_info = IntrinInfo(**dic["intrin_info"])
+        self.shared_scope = dic["shared_scope"]
+        self.pass_context = dict(dic["pass_context"])
+        return self
+
     def tensorcore_legalization(self):
         # only keep the last 2 axes for tensorcore
         self.warp = self.warp[-2:]
@@ -1,7 +1,7 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
-from typing import List
+from typing import List, Union
 import numpy as np
 
 
@@ -42,6 +42,16 @@ def coalesced_factor(subtensor: List[int], tensor: List[int]) -> int:
         return subtensor[-1] * coalesced_factor(subtensor[:-1], tensor[:-1])
 
 
+def coalesced_factor_grid(subtensor: List[Union[int, np.ndarray]], tensor: List[int]) -> np.ndarray:
+    # coalesced_factor for a grid of subtensors, whose dims are scalars or arrays of the grid
+    factor = np.asarray(subtensor[-1])
+    merge = (factor == tensor[-1]) & (len(subtensor) > 1)
+    for i in range(len(subtensor) - 2, -1, -1):
+        factor = np.where(merge, factor * subtensor[i], factor)
+        merge = merge & (np.asarray(subtensor[i]) == tensor[i - len(subtensor)]) & (i > 0)
+    return factor
+
+
 def coalesced_tensor_shape(subtensor: List[int], tensor: List[int], transaction_size: int) -> int:
     # Calculate the total number of elements in the subtensor
     bytes = int(np.prod(subtensor))
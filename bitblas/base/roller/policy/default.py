@@ -2,9 +2,10 @@
 # Licensed under the MIT License.
 """Policy for cuda core schedule"""
 import functools
+import heapq
 import math
 from queue import PriorityQueue
-from typing import Iterable, Dict, List, Optional
+from typing import Iterable, Dict, List, Optional, Tuple
 
 import numpy as np
 from bitblas import tvm
@@ -12,10 +13,29 @@ from bitblas import tvm
 from ..arch import TileDevice
 from ..bestfit import BestFit
 from ..hint import Hint, Stride, TileDict
-from .common import coalesced_factor, coalesced_tensor_shape, factorize, get_all_factors
+from .common import (
+    coalesced_factor,
+    coalesced_factor_grid,
+    coalesced_tensor_shape,
+    factorize,
+    get_all_factors,
+)
 from ..node import PrimFuncNode
 from ..rasterization import NoRasterization
 
+# tiles visited by the search of dfs_smem_tile
+MAX_VISITED_TILES = 2000
+# larger tile grids are searched tile by tile
+MAX_TILE_GRID_SIZE = 1 << 20
+# the evaluation of tiles replayed on the whole grid, a policy overriding one of them
+# is searched tile by tile
+_TILE_GRID_METHODS = (
+    "compute_tile_dict",
+    "_compute_memory_traffic",
+    "_compute_shared_memory_usage",
+    "_get_output_tile_map",
+)
+
 
 class DefaultPolicy:
     """
@@ -66,6 +86,12 @@ class DefaultPolicy:
                 ))
             steps[i].extend(added)
             steps[i] = sorted(steps[i])
+
+        grid = self._evaluate_tile_grid(steps, rstep_map)
+        if grid is not None and self._check_tile_grid(steps, rstep_map, *grid):
+            valid, prio, _, _ = grid
+            return self._search_tile_grid(steps, rstep_map, valid, prio)
+
         visited_tiles = {}
         queue = PriorityQueue()
 
@@ -81,7 +107,7 @@ class DefaultPolicy:
                 queue.put([prio(td), tile])
 
         add_to_queue(init_tile)
-        while not (queue.empty() or len(visited_tiles) > 2000):
+        while not (queue.empty() or len(visited_tiles) > MAX_VISITED_TILES):
             _, tile = queue.get()
             dim_ids = [step.index(t) for step, t in zip(steps, tile)]
             for i in reversed(range(len(dim_ids))):
@@ -94,6 +120,226 @@ class DefaultPolicy:
         sorted_tiles = sorted(visited_tiles, key=lambda td: prio(td))
         return sorted_tiles
 
+    def _get_tile_grid_access(self, node: PrimFuncNode) -> Optional[Dict[str, List[Optional[int]]]]:
+        """
+        Maps every dim of the buffers of a matmul-like node, whose single block is a
+        reduction indexing every buffer dim by a block iter var, to the index of the
+        spatial axis indexing it, None for a reduce axis.
+
+        Returns
+        -------
+        Optional[Dict[str, List[Optional[int]]]]
+            The axes of the dims by buffer name, None if the node is not matmul-like.
+        """
+        if (node.reduction_block is None or len(node.blocks) != 1 or
+                node.block_analyzer.block_infos is None):
+            return None
+        block_info = node.block_analyzer.get_block_info(node.reduction_block)
+        space_vars = [iter.var for iter in block_info.iters if iter.kind == "S"]
+        reduce_vars = [iter.var for iter in block_info.iters if iter.kind == "R"]
+        if len(space_vars) + len(reduce_vars) != len(block_info.iters):
+            return None
+
+        block = node.sch.get(node.reduction_block)
+        access = {}
+        for buffer_region in list(block.reads) + list(block.writes):
+            buffer = buffer_region.buffer
+            if not all(isinstance(dim, tvm.tir.IntImm) for dim in buffer.shape):
+                return None
+            axes = []
+            for region in buffer_region.region:
+                if not (isinstance(region.extent, tvm.tir.IntImm) and region.extent.value == 1):
+                    return None
+                space_axes = [i for i, var in enumerate(space_vars) if region.min.same_as(var)]
+                if space_axes:
+                    axes.append(space_axes[0])
+                elif any(region.min.same_as(var) for var in reduce_vars):
+                    axes.append(None)
+                else:
+                    return None
+            if access.setdefault(buffer.name, axes) != axes:
+                return None
+        return access
+
+    def _infer_grid_smem_usage(self, node: PrimFuncNode, footprint: np.ndarray) -> np.ndarray:
+        """
+        The shared memory usage of a node for a grid of tiles, whose footprints are
+        given, as infer_node_smem_usage computes it for one tile.
+        """
+        return footprint
+
+    def _evaluate_tile_grid(
+            self, steps: List[List[int]],
+            rstep_map: Dict) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Evaluates compute_tile_dict for every tile of the grid spanned by the steps of the
+        spatial axes at once with array operations, for matmul-like functions: the dims of
+        their buffers either follow a spatial axis of the tile or do not depend on the tile,
+        so the shapes inferred for the smallest tile give the shapes of every tile.
+
+        Parameters
+        ----------
+        steps : List[List[int]]
+            The candidate extents of each spatial axis.
+        rstep_map : Dict
+            The reduction step map.
+
+        Returns
+        -------
+        Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]
+            The validity, priority in dfs_smem_tile, memory traffic and shared memory cost
+            of the tiles, flattened in row-major order of the grid, None if the function is
+            not matmul-like and must be evaluated tile by tile.
+        """
+        node = self.prim_func_node
+        if len(steps) == 0 or len(self.ordered_nodes) != 1 or any(
+                getattr(type(self), name) is not getattr(DefaultPolicy, name)
+                for name in _TILE_GRID_METHODS):
+            return None
+        if int(np.prod([len(step) for step in steps])) > MAX_TILE_GRID_SIZE:
+            return None
+        access = self._get_tile_grid_access(node)
+        if access is None or any(buffer.name not in access for buffer in node.args):
+            return None
+        if len(node.output_buffers) > len(node.input_buffers):
+            return None
+
+        tiles = [axis.reshape(-1) for axis in np.meshgrid(*steps, indexing="ij")]
+        num_tiles = len(tiles[0])
+        base_tile = [1 for _ in steps]
+
+        def prod(shape):
+            return functools.reduce(np.multiply, shape, np.ones(num_tiles, dtype=np.int64))
+
+        def grid_shape(buffer_name, base_shape, bound=None):
+            shape = []
+            for i, (axis, base_dim) in enumerate(zip(access[buffer_name], base_shape)):
+                if axis is None:
+                    shape.append(int(base_dim))
+                elif bound is None:
+                    shape.append(tiles[axis])
+                else:
+                    shape.append(np.minimum(tiles[axis], bound[i]))
+            return shape
+
+        def grid_traffic(shape, buffer, transaction_size):
+            tensor = [int(dim) for dim in buffer.shape]
+            if len(shape) > len(tensor):
+                return None
+            nbytes = (node.get_buffer_dtype(buffer).bits + 7) // 8
+            transaction_elements = transaction_size // nbytes
+            num_elements = prod(shape)
+            factor = np.minimum(transaction_elements, coalesced_factor_grid(shape, tensor))
+            coalesced = transaction_elements * num_elements / np.maximum(factor, 1)
+            return np.where(num_elements == 0, 0, coalesced) * nbytes
+
+        # memory traffic, as _compute_memory_traffic
+        traffic = np.zeros(num_tiles)
+        input_shapes = node.propagate_inputs(base_tile)
+        output_shapes = node.propagate_outputs(base_tile)
+        for i, buffer in enumerate(node.input_buffers):
+            bound = [int(dim) for dim in buffer.shape]
+            buffer_traffic = grid_traffic(
+                grid_shape(buffer.name, input_shapes[i], bound), buffer,
+                self.arch.transaction_size[1])
+            if buffer_traffic is None:
+                return None
+            traffic += buffer_traffic
+        for i, buffer in enumerate(node.output_buffers):
+            # the output shapes are bounded by the input shapes in propagate_outputs
+            bound = [int(dim) for dim in node.input_buffers[i].shape]
+            buffer_traffic = grid_traffic(
+                grid_shape(buffer.name, output_shapes[i], bound), buffer,
+                self.arch.transaction_size[0])
+            if buffer_traffic is None:
+                return None
+            traffic += buffer_traffic
+
+        # shared memory cost, as _compute_shared_memory_usage
+        footprint_shapes, _ = node.propagate(base_tile, rstep_map)
+        footprint = np.zeros(num_tiles, dtype=np.int64)
+        cached_tensors = []
+        for buffer in node.block_analyzer.get_input_buffers(node.reduction_block):
+            if buffer.name in cached_tensors:
+                continue
+            cached_tensors.append(buffer.name)
+            num_elements = prod(grid_shape(buffer.name, footprint_shapes[buffer.name]))
+            buffer_len = num_elements * int((tvm.DataType(buffer.dtype).bits + 7) // 8)
+            footprint += (buffer_len + 31) // 32 * 32
+        smem_cost = self._infer_grid_smem_usage(node, footprint)
+        smem_cost = (smem_cost + 31) // 32 * 32
+
+        reg_usage = (2 * (prod(tiles) * node.get_dtype().bits / 32)).astype(np.int64)
+        valid = (smem_cost <= self.arch.smem_cap) & (reg_usage <= self.arch.reg_cap)
+        output_shape = node.get_space_dim()
+        grid_size = prod([(dim + tile - 1) // tile for tile, dim in zip(tiles, output_shape)])
+        block_per_SM = np.minimum(
+            np.minimum(self.arch.max_smem_usage // np.maximum(smem_cost, 1),
+                       self.arch.reg_cap // np.maximum(reg_usage, 1)),
+            self.arch.sm_partition,
+        )
+        num_cores = block_per_SM * int(self.arch.compute_max_core)
+        if np.any(valid & (num_cores == 0)):
+            return None
+        num_wave = np.ceil(grid_size / np.maximum(num_cores, 1)).astype(np.int64)
+        prio = (traffic + 1) * num_wave
+        return valid, prio, traffic, smem_cost
+
+    def _check_tile_grid(self, steps: List[List[int]], rstep_map: Dict, valid: np.ndarray,
+                         prio: np.ndarray, traffic: np.ndarray, smem_cost: np.ndarray) -> bool:
+        """
+        Checks the grid evaluation against compute_tile_dict on the smallest, a middle
+        and the largest tile, so that a function the grid does not model, e.g. through a
+        policy overriding infer_node_smem_usage, is searched tile by tile.
+        """
+        grid_shape = [len(step) for step in steps]
+        samples = {
+            tuple(0 for _ in grid_shape),
+            tuple(n // 2 for n in grid_shape),
+            tuple(n - 1 for n in grid_shape),
+        }
+        for ids in samples:
+            idx = int(np.ravel_multi_index(ids, grid_shape))
+            td = self.compute_tile_dict([step[i] for step, i in zip(steps, ids)], rstep_map)
+            if (td.valid != bool(valid[idx]) or td.smem_cost != smem_cost[idx] or
+                    not np.isclose(td.traffic, traffic[idx])):
+                return False
+            if td.valid and not np.isclose((td.traffic + 1) * td.num_wave, prio[idx]):
+                return False
+        return True
+
+    def _search_tile_grid(self, steps: List[List[int]], rstep_map: Dict, valid: np.ndarray,
+                          prio: np.ndarray) -> Iterable[TileDict]:
+        """
+        The search of dfs_smem_tile over a grid evaluated by _evaluate_tile_grid, visiting
+        the same tiles in the same order. Yields the TileDicts of the valid visited tiles
+        by priority, computed when consumed.
+        """
+        grid_shape = [len(step) for step in steps]
+        strides = [int(np.prod(grid_shape[i + 1:])) for i in range(len(grid_shape))]
+        visited_tiles = {}
+        queue = []
+
+        def add_to_queue(ids):
+            if ids in visited_tiles:
+                return
+            idx = sum(i * stride for i, stride in zip(ids, strides))
+            visited_tiles[ids] = idx
+            if valid[idx]:
+                # the steps are sorted, so ids order ties as the tiles do
+                heapq.heappush(queue, (float(prio[idx]), ids))
+
+        add_to_queue(tuple(0 for _ in grid_shape))
+        while queue and len(visited_tiles) <= MAX_VISITED_TILES:
+            _, ids = heapq.heappop(queue)
+            for i in reversed(range(len(ids))):
+                if ids[i] + 1 < grid_shape[i]:
+                    add_to_queue(ids[:i] + (ids[i] + 1,) + ids[i + 1:])
+
+        valid_tiles = [ids for ids, idx in visited_tiles.items() if valid[idx]]
+        for ids in sorted(valid_tiles, key=lambda ids: prio[visited_tiles[ids]]):
+            yield self.compute_tile_dict([step[i] for step, i in zip(steps, ids)], rstep_map)
+
     def get_base_tile(self):
         """
         Gets the minimum tile configuration that satisfies no redundancy in computation.
@@ -82,6 +82,9 @@ class TensorCorePolicy(DefaultPolicy):
         value *= self.pipeline_stage
         return value, cached_tensors
 
+    def _infer_grid_smem_usage(self, node: PrimFuncNode, footprint: np.ndarray) -> np.ndarray:
+        return super()._infer_grid_smem_usage(node, footprint) * self.pipeline_stage
+
     def _assign_reduce_step(self, node):
         if not node.get_tag("tensorcore_config"):
             return super()._assign_reduce_step(node)
@@ -0,0 +1,158 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""Pool of the device tensors used to profile kernels."""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+
+from bitblas import tvm
+
+logger = logging.getLogger(__name__)
+
+# bytes kept by the global pool, the least recently used tensors are evicted beyond
+DEFAULT_MAX_BYTES = 4 << 30
+
+# names of the tvm dtypes that differ in numpy (ml_dtypes) and torch
+_DTYPE_NAMES = {
+    "e4m3_float8": "float8_e4m3fn",
+    "e5m2_float8": "float8_e5m2",
+}
+
+_DISTRIBUTIONS = ("uniform", "onefill")
+
+
+def _to_array_dtype(dtype: str) -> str:
+    return _DTYPE_NAMES.get(dtype, dtype)
+
+
+def get_torch_dtype(dtype: str):
+    """The torch dtype of a tvm dtype name, None when torch has no such dtype."""
+    import torch
+
+    torch_dtype = getattr(torch, _to_array_dtype(dtype), None)
+    return torch_dtype if isinstance(torch_dtype, torch.dtype) else None
+
+
+def _nbytes(shape: Sequence[int], dtype: str) -> int:
+    return int(np.prod(shape, dtype=np.int64)) * ((tvm.DataType(dtype).bits + 7) // 8)
+
+
+def _generate_on_cuda(shape: Tuple[int, ...], dtype: str, device,
+                      distribution: str) -> Optional[tvm.nd.NDArray]:
+    """Fills the tensor on the device with torch, None if torch can not produce the dtype."""
+    try:
+        import torch
+        from torch.utils.dlpack import to_dlpack
+    except ImportError:
+        return None
+    torch_dtype = get_torch_dtype(dtype)
+    if torch_dtype is None:
+        return None
+    torch_device = torch.device("cuda", device.device_id)
+    try:
+        if distribution == "onefill":
+            tensor = torch.ones(shape, dtype=torch_dtype, device=torch_device)
+        elif torch_dtype.is_floating_point:
+            # torch does not sample float8 directly
+            sample_dtype = torch_dtype if torch_dtype.itemsize >= 2 else torch.float16
+            tensor = torch.rand(shape, dtype=sample_dtype, device=torch_device).to(torch_dtype)
+        else:
+            tensor = torch.randint(0, 2, shape, dtype=torch_dtype, device=torch_device)
+        return tvm.nd.from_dlpack(to_dlpack(tensor))
+    except (RuntimeError, TypeError, ValueError, BufferError) as error:
+        logger.debug(f"Failed to generate a {dtype} tensor on the device: {error}")
+        return None
+
+
+def _generate_on_host(shape: Tuple[int, ...], dtype: str, device,
+                      distribution: str) -> tvm.nd.NDArray:
+    array_dtype = _to_array_dtype(dtype)
+    if distribution == "onefill":
+        array = np.ones(shape).astype(array_dtype)
+    elif np.issubdtype(np.dtype(array_dtype), np.integer):
+        array = np.random.randint(0, 2, shape).astype(array_dtype)
+    else:
+        array = np.random.rand(*shape).astype(array_dtype)
+    return tvm.nd.array(array, device=device)
+
+
+class ProfileTensorPool:
+    """
+    Tensors to profile kernels with, keyed by (shape, dtype, distribution, device)
+    and shared by all the candidates and operators profiled in the process, so that
+    the inputs of a workload are generated once instead of per tuning and per
+    `profile_latency`. On CUDA devices the data is generated in device memory with
+    torch, without a host copy; other devices and dtypes torch does not handle are
+    filled on the host with numpy, as before.
+
+    The tensors are shared and overwritten by the kernels writing into them: they
+    are only meant to measure latencies. The arguments of one call are never
+    aliased, the second argument of a key is a different tensor (`slot`).
+    """
+
+    def __init__(self, max_bytes: Optional[int] = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._tensors: "OrderedDict[Tuple, tvm.nd.NDArray]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._tensors)
+
+    def get(self,
+            shape: Sequence[int],
+            dtype: str,
+            device,
+            distribution: str = "uniform",
+            slot: int = 0) -> tvm.nd.NDArray:
+        if distribution not in _DISTRIBUTIONS:
+            raise ValueError("Not supported distribution: ", distribution)
+        shape = tuple(int(dim) for dim in shape)
+        key = (shape, str(dtype), distribution, device.device_type, device.device_id, slot)
+        tensor = self._tensors.get(key)
+        if tensor is not None:
+            self._tensors.move_to_end(key)
+            return tensor
+
+        tensor = None
+        if device.device_type == tvm.cuda().device_type:
+            tensor = _generate_on_cuda(shape, dtype, device, distribution)
+        if tensor is None:
+            tensor = _generate_on_host(shape, dtype, device, distribution)
+        self._tensors[key] = tensor
+        self.nbytes += _nbytes(shape, dtype)
+        self._evict()
+        return tensor
+
+    def get_tensors(self,
+                    specs: List[Tuple[Sequence[int], str]],
+                    device,
+                    distribution: str = "uniform") -> List[tvm.nd.NDArray]:
+        """The tensors of the (shape, dtype) of the arguments of one call, none aliased."""
+        slots: Dict[Tuple, int] = {}
+        tensors = []
+        for shape, dtype in specs:
+            key = (tuple(int(dim) for dim in shape), str(dtype))
+            slot = slots.get(key, 0)
+            slots[key] = slot + 1
+            tensors.append(self.get(shape, dtype, device, distribution, slot))
+        return tensors
+
+    def _evict(self):
+        # the most recent tensor is kept even if it alone exceeds the limit
+        while self.max_bytes is not None and self.nbytes > self.max_bytes and len(
+                self._tensors) > 1:
+            (shape, dtype, *_), _ = self._tensors.popitem(last=False)
+            self.nbytes -= _nbytes(shape, dtype)
+
+    def clear(self):
+        self._tensors.clear()
+        self.nbytes = 0
+
+
+_global_tensor_pool = ProfileTensorPool()
+
+
+def get_profile_tensor_pool() -> ProfileTensorPool:
+    return _global_tensor_pool
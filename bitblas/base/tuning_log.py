@@ -0,0 +1,137 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""Persistent log of the candidates evaluated during tuning."""
+import os
+import json
+import time
+from hashlib import sha256
+from typing import Dict, Iterator, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# status of a candidate in the tuning log
+STATUS_OK = "ok"
+STATUS_APPLY_FAILED = "apply_failed"
+STATUS_BUILD_FAILED = "build_failed"
+STATUS_BUILD_TIMEOUT = "build_timeout"
+STATUS_PROFILE_FAILED = "profile_failed"
+
+
+class TuningLog:
+    """
+    Appends every candidate evaluated by `apply_and_build_parallel` to a JSON
+    lines file: the workload (the tuned function), the arch, the serialized hint
+    with its pass context, the status, the latency, its samples and statistics.
+    Each record is a single line written with one `write` to a file opened in
+    append mode and synced, so that concurrent tuners can share a log and an
+    interrupted run leaves at most one truncated line, which is skipped when
+    reading.
+
+    Tuning with a log skips the candidates already recorded for the workload and
+    arch, so an interrupted run resumes where it stopped and a larger `topk` only
+    evaluates the new candidates.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def get_workload_key(func) -> str:
+        """Hash of the tuned function, including its attributes such as opt_shapes."""
+        return sha256(func.script(show_meta=True).encode()).hexdigest()
+
+    @staticmethod
+    def get_candidate_key(hint_json: Dict) -> str:
+        payload = json.dumps(hint_json, sort_keys=True, separators=(",", ":"))
+        return sha256(payload.encode()).hexdigest()
+
+    def append(self, records: List[Dict]):
+        if not records:
+            return
+        lines = "".join(json.dumps(record, sort_keys=True) + "\n" for record in records)
+        fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            if size > 0 and os.pread(fd, 1, size - 1) != b"\n":
+                # terminate the truncated line of an interrupted writer, so that the
+                # first new record stays on a line of its own
+                lines = "\n" + lines
+            os.write(fd, lines.encode())
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def make_record(self,
+                    workload: str,
+                    arch: str,
+                    hint_json: Dict,
+                    status: str,
+                    latency: Optional[float] = None,
+                    samples: Optional[List[float]] = None,
+                    stats: Optional[Dict] = None) -> Dict:
+        return {
+            "workload": workload,
+            "arch": arch,
+            "candidate": self.get_candidate_key(hint_json),
+            "hint": hint_json,
+            "pass_context": hint_json.get("pass_context", {}),
+            "status": status,
+            "latency": latency,
+            "samples": samples or [],
+            # median, p90, std, ... of the samples when measured robustly
+            "stats": stats or {},
+            "timestamp": time.time(),
+        }
+
+    def __iter__(self) -> Iterator[Dict]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logger.debug(f"Skipping truncated record in tuning log {self.path}")
+
+    def query(self,
+              workload: Optional[str] = None,
+              arch: Optional[str] = None,
+              status: Optional[str] = None) -> List[Dict]:
+        """Returns the records matching all the given fields."""
+        return [
+            record for record in self
+            if (workload is None or record["workload"] == workload) and
+            (arch is None or record["arch"] == arch) and
+            (status is None or record["status"] == status)
+        ]
+
+    def lookup(self, workload: str, arch: str) -> Dict[str, Dict]:
+        """Returns the records of a workload keyed by candidate, the last record wins."""
+        return {record["candidate"]: record for record in self.query(workload, arch)}
+
+    def best(self, workload: str, arch: str) -> Optional[Dict]:
+        """Returns the fastest successfully measured record of a workload."""
+        records = self.query(workload, arch, status=STATUS_OK)
+        if not records:
+            return None
+        return min(records, key=lambda record: record["latency"])
+
+
+_global_tuning_log: Optional[TuningLog] = None
+
+
+def get_tuning_log() -> Optional[TuningLog]:
+    return _global_tuning_log
+
+
+def set_tuning_log(path: Optional[str]) -> Optional[TuningLog]:
+    """Sets the log used by tuning when none is passed explicitly, None disables it."""
+    global _global_tuning_log
+    _global_tuning_log = TuningLog(path) if path is not None else None
+    return _global_tuning_log
@@ -0,0 +1,200 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""Tuning split into a build-only step, without device, and a measure-only step on the GPU."""
+import os
+import json
+from typing import Dict, List, Optional, Tuple, Union
+import logging
+
+from bitblas import tvm
+from tvm import tir
+from tvm.target import Target
+
+from .builder import Builder
+from .cost_model import CostModel, DEFAULT_PRUNE_TOPK
+from .measure import MeasureOption
+from .roller.arch import CUDA
+from .roller.hint import Hint
+from .tuning_log import (
+    TuningLog,
+    get_tuning_log,
+    STATUS_OK,
+    STATUS_PROFILE_FAILED,
+)
+from .utils import (
+    CompileResult,
+    MeasureStrategy,
+    _apply_and_build_candidates,
+    emit_candidates,
+    get_dummy_input_arrays,
+    successive_halving,
+)
+
+logger = logging.getLogger(__name__)
+
+PACKAGE_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+
+def build_tuning_package(func: tir.PrimFunc,
+                         target: Union[str, Target],
+                         package_dir: str,
+                         topk: int = 10,
+                         configs: Optional[List[Hint]] = None,
+                         seed_hints: Optional[List[Dict]] = None,
+                         cost_model: Optional[CostModel] = None,
+                         prune_topk: Optional[int] = DEFAULT_PRUNE_TOPK,
+                         max_workers: int = 10,
+                         timeout: int = 30,
+                         apply_in_process: bool = False,
+                         builder: Optional[Builder] = None) -> str:
+    """
+    Emits the candidates of `func` (unless `configs` are given), applies and
+    builds them without measuring, e.g. on a CI host without GPU: the arch is
+    described by the target (see `CUDA`), which needs an arch such as
+    "nvidia/nvidia-a100" or "cuda -arch=sm_80". Writes into `package_dir` the
+    function, and per built candidate its hint, scheduled module, generated source
+    and exported archive, listed in a manifest. Returns the manifest path;
+    `measure_tuning_package` measures the package on the GPU.
+    """
+    if isinstance(target, str):
+        target = Target(target)
+    arch = CUDA(target, deviceless=True)
+    if configs is None:
+        configs = emit_candidates(
+            func, arch, topk, seed_hints=seed_hints, cost_model=cost_model, prune_topk=prune_topk)
+        if configs is None:
+            raise ValueError("The function can not be tuned")
+
+    for sub_dir in ("artifacts", "schedules", "sources"):
+        os.makedirs(os.path.join(package_dir, sub_dir), exist_ok=True)
+    cpresults, _, statuses = _apply_and_build_candidates(
+        func,
+        configs,
+        arch,
+        num_repeats=None,
+        max_workers=max_workers,
+        timeout=timeout,
+        data_distribution=None,
+        apply_in_process=apply_in_process,
+        builder=builder,
+        build_only=True,
+        artifact_dir=os.path.join(package_dir, "artifacts"))
+
+    with open(os.path.join(package_dir, "func.json"), "w") as f:
+        f.write(tvm.ir.save_json(func))
+    built = {cpresult.index: cpresult for cpresult in cpresults}
+    candidates = []
+    for idx, (config, status) in enumerate(zip(configs, statuses)):
+        candidate = {"hint": config.to_json(), "status": status}
+        if idx in built:
+            cpresult = built[idx]
+            candidate["artifact"] = os.path.relpath(cpresult.artifact, package_dir)
+            candidate["schedule"] = os.path.join("schedules", f"{idx}.json")
+            candidate["source"] = os.path.join("sources", f"{idx}.cu")
+            with open(os.path.join(package_dir, candidate["schedule"]), "w") as f:
+                f.write(tvm.ir.save_json(cpresult.sch.mod))
+            with open(os.path.join(package_dir, candidate["source"]), "w") as f:
+                f.write(cpresult.code)
+        candidates.append(candidate)
+
+    manifest = {
+        "version": PACKAGE_VERSION,
+        "target": str(target),
+        "workload": TuningLog.get_workload_key(func),
+        "func": "func.json",
+        "candidates": candidates,
+    }
+    manifest_path = os.path.join(package_dir, MANIFEST_NAME)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    logger.info(f"Built {len(built)} of {len(configs)} candidates into {package_dir}")
+    return manifest_path
+
+
+def load_tuning_package(package_dir: str) -> Tuple[Dict, tir.PrimFunc]:
+    """Returns the manifest and the function of a package."""
+    with open(os.path.join(package_dir, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != PACKAGE_VERSION:
+        raise ValueError(f"Unsupported tuning package version {manifest.get('version')}")
+    with open(os.path.join(package_dir, manifest["func"])) as f:
+        func = tvm.ir.load_json(f.read())
+    return manifest, func
+
+
+def measure_tuning_package(
+    package_dir: str,
+    num_repeats: int = 3,
+    data_distribution: str = "uniform",
+    tuning_log: Optional[TuningLog] = None,
+    measure_strategy: MeasureStrategy = "fixed",
+    measure_option: Optional[MeasureOption] = None,
+) -> Tuple[List[CompileResult], Optional[CompileResult]]:
+    """
+    Loads and measures the candidates of a package written by
+    `build_tuning_package`, on cuda device 0, as `apply_and_build_parallel` does:
+    returns the compile results, whose schedules are loaded from the package, and
+    the best one, among the survivors of `successive_halving` with that strategy. The measured candidates are recorded in the tuning log, if any.
+    """
+    manifest, func = load_tuning_package(package_dir)
+    arch = CUDA(Target(manifest["target"]), deviceless=False)
+    profile_tensors = get_dummy_input_arrays(func, arch.device, distribution=data_distribution)
+    if tuning_log is None:
+        tuning_log = get_tuning_log()
+
+    cpresults = []
+    for idx, candidate in enumerate(manifest["candidates"]):
+        if candidate["status"] != STATUS_OK:
+            continue
+        config = Hint().from_json(candidate["hint"], arch=arch)
+        with open(os.path.join(package_dir, candidate["schedule"])) as f:
+            sch = tir.Schedule(tvm.ir.load_json(f.read()))
+        rt_mod = tvm.runtime.load_module(os.path.join(package_dir, candidate["artifact"]))
+        cpresult = CompileResult(config, sch, rt_mod)
+        cpresult.profile_tensors = profile_tensors
+        cpresult.index = idx
+        try:
+            if measure_strategy == "robust":
+                cpresult.measure_robust(arch.device, measure_option, arch.l2_cache_size_bytes)
+            elif measure_strategy == "successive_halving":
+                cpresult.measure(arch.device, number=1, repeat=3)
+            else:
+                cpresult.measure(arch.device, number=num_repeats, repeat=1)
+        except Exception as e_mesg:
+            logger.debug(f"Evaluation with config failed {e_mesg}")
+            candidate["status"] = STATUS_PROFILE_FAILED
+            continue
+        logger.info("Time cost of config {}: {:.3f} ms".format(config, cpresult.latency))
+        cpresults.append(cpresult)
+
+    if measure_strategy == "successive_halving":
+        successive_halving(cpresults, arch.device)
+        cpresults = [cpresult for cpresult in cpresults if cpresult.latency < 1e9]
+
+    if tuning_log is not None:
+        arch_str = str(arch.target)
+        measured = {cpresult.index: cpresult for cpresult in cpresults}
+        records = []
+        for idx, candidate in enumerate(manifest["candidates"]):
+            cpresult = measured.get(idx)
+            status = STATUS_OK if cpresult is not None else candidate["status"]
+            if status == STATUS_OK and cpresult is None:
+                status = STATUS_PROFILE_FAILED
+            records.append(
+                tuning_log.make_record(
+                    manifest["workload"],
+                    arch_str,
+                    candidate["hint"],
+                    status,
+                    latency=cpresult.latency if cpresult else None,
+                    samples=cpresult.latency_samples if cpresult else None,
+                    stats=cpresult.latency_stats if cpresult else None,
+                ))
+        tuning_log.append(records)
+
+    # with successive halving, the candidates eliminated after the cheap round are not ranked
+    best = min((cpresult for cpresult in cpresults if cpresult.ranked),
+               key=lambda cpresult: cpresult.latency,
+               default=None)
+    return cpresults, best
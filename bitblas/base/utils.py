@@ -3,10 +3,12 @@
 
 from bitblas import tvm
 import os
-from tvm.contrib.popen_pool import PopenPoolExecutor, StatusKind
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import math
+from tvm.contrib.popen_pool import PopenPoolExecutor
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from collections import deque
 import numpy as np
-from typing import List, Tuple, Optional, Dict, Union, Literal
+from typing import Callable, List, Tuple, Optional, Dict, Union, Literal
 from tvm import tir, IRModule
 from tvm.runtime import Module
 from tvm.tir import Schedule
@@ -15,15 +17,36 @@ import bitblas
 from .analysis import get_root_block, get_reduction_blocks, find_var_from_func
 from bitblas.base.roller.arch import CUDA
 from bitblas.base.roller.policy import TensorCorePolicy, DefaultPolicy
+from bitblas.base.roller.hint import Hint
 from bitblas.gpu.matmul_analysis import get_tensorized_func_and_tags
+from .budget import TuningBudget
+from .builder import Builder, LocalBuilder, get_builder
+from .measure import MeasureOption, measure_latency
+from .tensor_pool import ProfileTensorPool, get_profile_tensor_pool
+from .cost_model import CostModel, DEFAULT_PRUNE_TOPK, get_cost_model, rank_candidates
+from .tuning_log import (
+    TuningLog,
+    get_tuning_log,
+    STATUS_OK,
+    STATUS_APPLY_FAILED,
+    STATUS_BUILD_FAILED,
+    STATUS_BUILD_TIMEOUT,
+    STATUS_PROFILE_FAILED,
+)
 import tempfile
+import shutil
 import itertools
 from tvm.ir.supply import GlobalVarSupply
-from bitblas.utils import tensor_replace_dp4a, tensor_remove_make_int4, tensor_remove_make_int2
 import logging
 
 logger = logging.getLogger(__name__)
 
+# prefix of the build artifact directories, followed by the pid of the tuning process
+ARTIFACT_DIR_PREFIX = "bitblas_build_"
+
+# how the built candidates are measured, see `_apply_and_build_candidates`
+MeasureStrategy = Literal["fixed", "successive_halving", "robust"]
+
 
 def get_rasterization_code(pannel_width: int = 8) -> str:
     return f"""
@@ -51,12 +74,103 @@ class CompileResult:
         self.mod = mod
         self.code = mod.imported_modules[0].get_source() if mod else None
         self.latency = 1e9
+        self.latency_samples: List[float] = []
+        self.latency_std = 0.0
+        # median, mean, p90, std, ... of the samples measured by `measure_robust`
+        self.latency_stats: Dict = {}
         self.profile_tensors = []
         self.time_evaluator = None
+        # path of the exported archive of a candidate built without being loaded
+        self.artifact: Optional[str] = None
+        # position of the candidate in the configs it was built from
+        self.index = None
+        # False when eliminated by `successive_halving`, whose latency is too noisy to rank
+        self.ranked = True
 
     def profile(self):
         profile_tensors = self.profile_tensors
-        return self.time_evaluator(*profile_tensors).mean * 1e3
+        result = self.time_evaluator(*profile_tensors)
+        self.latency_samples = [sample * 1e3 for sample in result.results]
+        self.latency_std = float(np.std(self.latency_samples))
+        return result.mean * 1e3
+
+    def measure(self, device, number: int, repeat: int) -> float:
+        """
+        Measures `repeat` samples, each the mean of `number` runs, and accumulates
+        them into the latency samples. Returns the mean latency of all samples in ms.
+        """
+        evaluator = self.mod.time_evaluator(
+            self.mod.entry_name, device, number=number, repeat=repeat)
+        result = evaluator(*self.profile_tensors)
+        self.latency_samples += [sample * 1e3 for sample in result.results]
+        self.latency = float(np.mean(self.latency_samples))
+        self.latency_std = float(np.std(self.latency_samples))
+        return self.latency
+
+    def measure_robust(self,
+                       device,
+                       option: Optional[MeasureOption] = None,
+                       l2_cache_size_bytes: Optional[int] = None) -> float:
+        """
+        Measures with warmup, L2 flushing and outlier rejection (see
+        `measure_latency`), returns the median latency in ms.
+        """
+        self.latency_samples, self.latency_stats = measure_latency(
+            self.mod, device, self.profile_tensors, option, l2_cache_size_bytes)
+        self.latency = self.latency_stats["median"]
+        self.latency_std = self.latency_stats["std"]
+        return self.latency
+
+    def stderr(self) -> float:
+        if len(self.latency_samples) < 2:
+            return float("inf")
+        return self.latency_std / np.sqrt(len(self.latency_samples))
+
+
+def successive_halving(cpresults: List[CompileResult],
+                       device,
+                       eta: int = 2,
+                       max_rounds: int = 4,
+                       repeat: int = 3,
+                       confidence: float = 2.0) -> List[CompileResult]:
+    """
+    Re-measures the fastest candidates with increasing effort: every round keeps the
+    fastest 1/eta of the candidates and measures them with eta times more runs per
+    sample. Stops after `max_rounds`, when one candidate is left, or once the fastest
+    candidate is faster than the runner-up by `confidence` standard errors of both.
+    Candidates failing a measurement are dropped. Returns the survivors, fastest first;
+    the other candidates are marked as not `ranked`, their latency being measured with
+    fewer runs than the survivors'.
+    """
+    survivors = sorted(cpresults, key=lambda cpresult: cpresult.latency)
+    number = 1
+    for _ in range(max_rounds):
+        if len(survivors) <= 1:
+            break
+        first, second = survivors[0], survivors[1]
+        if (first.latency + confidence * first.stderr() <
+                second.latency - confidence * second.stderr()):
+            break
+        survivors = survivors[:max(2, math.ceil(len(survivors) / eta))]
+        number *= eta
+        measured = []
+        for cpresult in survivors:
+            try:
+                cpresult.measure(device, number, repeat)
+            except Exception as e_mesg:
+                logger.debug(f"Re-measuring config failed {e_mesg}")
+                cpresult.latency = 1e9
+                continue
+            measured.append(cpresult)
+        survivors = sorted(measured, key=lambda cpresult: cpresult.latency)
+    survivor_ids = {id(cpresult) for cpresult in survivors}
+    for cpresult in cpresults:
+        cpresult.ranked = id(cpresult) in survivor_ids
+    for cpresult in survivors:
+        logger.info("Config {} measured {:.3f} +- {:.3f} ms over {} samples".format(
+            cpresult.config, cpresult.latency, cpresult.latency_std,
+            len(cpresult.latency_samples)))
+    return survivors
 
 
 def _apply_config(
@@ -107,11 +221,38 @@ def _apply_config(
     return None
 
 
+# the arch of each target in a schedule worker process
+_WORKER_ARCHS: Dict[str, CUDA] = {}
+
+
+def _apply_config_in_worker(func_json: str, hint_json: Dict, target: str) -> Optional[str]:
+    """
+    Applies a serialized hint (Hint.to_json) to a serialized PrimFunc in a worker
+    process, returns the scheduled module serialized by `tvm.ir.save_json`.
+    """
+    if target not in _WORKER_ARCHS:
+        _WORKER_ARCHS[target] = CUDA(tvm.target.Target(target))
+    func = tvm.ir.load_json(func_json)
+    config = Hint().from_json(hint_json, arch=_WORKER_ARCHS[target])
+    try:
+        sch = _apply_config(func, config)
+    except Exception as apply_schedule_error:
+        logger.debug("Apply schedule failed: {}".format(apply_schedule_error))
+        return None
+    return tvm.ir.save_json(sch.mod) if sch is not None else None
+
+
 def get_dummy_input_arrays(
     func: Union[tir.PrimFunc, Function],
     device: tvm.runtime.Device,
     distribution: Literal["uniform", "onefill"] = "uniform",
+    pool: Optional[ProfileTensorPool] = None,
 ):
+    """
+    The tensors to profile `func` with, taken from the profile tensor pool (the
+    global one by default), so they are shared with every other caller profiling
+    the same shapes.
+    """
 
     def var_wrapper(v):
         if isinstance(v, tvm.tir.Var):
@@ -123,7 +264,7 @@ def get_dummy_input_arrays(
         else:
             raise RuntimeError("Not supported type: ", type(v))
 
-    profile_tensors = []
+    specs = []
     for param in func.params:
         if isinstance(func, tir.PrimFunc):
             if param not in func.buffer_map:
@@ -134,49 +275,181 @@ def get_dummy_input_arrays(
             arg = param.struct_info
         else:
             raise ValueError("Not supported type: ", type(func))
+        specs.append(([var_wrapper(i) for i in arg.shape], arg.dtype))
+    if pool is None:
+        pool = get_profile_tensor_pool()
+    return pool.get_tensors(specs, device, distribution)
 
-        def map_numpy_type(intype):
-            typemap = {
-                'e4m3_float8': 'float8_e4m3fn',
-                'e5m2_float8': 'float8_e5m2',
-            }
-            if intype in typemap:
-                return typemap[intype]
-            else:
-                return intype
-
-        numpy_dtype = map_numpy_type(arg.dtype)
-        if distribution == "uniform":
-            profile_tensors.append(
-                tvm.nd.array(
-                    np.random.rand(*[var_wrapper(i) for i in arg.shape]).astype(numpy_dtype),
-                    device=device,
-                ))
-        elif distribution == "onefill":
-            profile_tensors.append(
-                tvm.nd.array(
-                    np.ones([var_wrapper(i) for i in arg.shape]).astype(numpy_dtype),
-                    device=device,
-                ))
-        else:
-            raise ValueError("Not supported distribution: ", distribution)
-    return profile_tensors
 
+def _strip_opt_shapes(mod: IRModule) -> IRModule:
+    """The module without its opt_shapes annotations, which do not affect the build."""
+    functions = {}
+    for g_var, func in mod.functions.items():
+        if isinstance(func, tir.PrimFunc) and func.attrs is not None and "opt_shapes" in func.attrs:
+            func = func.without_attr("opt_shapes")
+        functions[g_var] = func
+    return tvm.IRModule(functions)
 
-def apply_and_build_parallel(func,
-                             configs,
-                             arch,
-                             num_repeats=3,
-                             max_workers=10,
-                             timeout=30,
-                             data_distribution="uniform") -> CompileResult:
-    cpresults = []
 
-    profile_tensors = get_dummy_input_arrays(func, arch.device, distribution=data_distribution)
-    max_workers = min(len(configs), os.cpu_count(), max_workers)
+def get_artifact_root() -> str:
+    """
+    Where the build artifacts of tuning are written: $BITBLAS_ARTIFACT_DIR, else the
+    shared memory filesystem when available, else the temporary directory.
+    """
+    root = os.environ.get("BITBLAS_ARTIFACT_DIR")
+    if root:
+        os.makedirs(root, exist_ok=True)
+        return root
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
 
-    # apply config in thread parallel
-    _sched: List[Schedule] = []
+
+def _is_process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # alive, owned by another user
+        return True
+    return True
+
+
+def _sweep_stale_artifact_dirs(root: str):
+    """Removes the artifact directories left behind by killed tuning processes."""
+    for name in os.listdir(root):
+        if not name.startswith(ARTIFACT_DIR_PREFIX):
+            continue
+        pid = name[len(ARTIFACT_DIR_PREFIX):].split("_")[0]
+        if pid.isdigit() and not _is_process_alive(int(pid)):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def create_artifact_dir(root: Optional[str] = None) -> str:
+    """
+    Creates the directory of the build artifacts of one tuning, named after the
+    process so that the directories left by killed processes are swept here.
+    """
+    root = root or get_artifact_root()
+    _sweep_stale_artifact_dirs(root)
+    return tempfile.mkdtemp(prefix=f"{ARTIFACT_DIR_PREFIX}{os.getpid()}_", dir=root)
+
+
+def _load_artifact(artifact: Union[str, bytes], artifact_dir: str, idx: int) -> Module:
+    """Loads a built module exported as a file or transferred as bytes, then removes the file."""
+    if isinstance(artifact, bytes):
+        artifact_path = os.path.join(artifact_dir, f"{idx}.loaded.tar")
+        with open(artifact_path, "wb") as f:
+            f.write(artifact)
+    else:
+        artifact_path = artifact
+    try:
+        return tvm.runtime.load_module(artifact_path)
+    finally:
+        os.remove(artifact_path)
+
+
+def _store_artifact(artifact: Union[str, bytes], artifact_dir: str, idx: int) -> str:
+    """Writes an archive transferred as bytes into the artifact directory, returns its path."""
+    if isinstance(artifact, str):
+        return artifact
+    artifact_path = os.path.join(artifact_dir, f"{idx}.tar")
+    with open(artifact_path, "wb") as f:
+        f.write(artifact)
+    return artifact_path
+
+
+def _apply_and_build_candidates(func,
+                                configs,
+                                arch,
+                                num_repeats,
+                                max_workers,
+                                timeout,
+                                data_distribution,
+                                queue_size=None,
+                                apply_workers=None,
+                                apply_in_process=False,
+                                measure_strategy="fixed",
+                                progress: Optional[Callable[[int], None]] = None,
+                                budget: Optional[TuningBudget] = None,
+                                in_memory: bool = False,
+                                measure_option: Optional[MeasureOption] = None,
+                                builder: Optional[Builder] = None,
+                                build_only: bool = False,
+                                artifact_dir: Optional[str] = None):
+    """
+    Applies, builds and profiles the candidates, returns the compile results, the
+    best one and the tuning log status of every candidate. `func` is either the
+    function of all candidates or a list with the function of each candidate, e.g.
+    the buckets of a dynamic range; each candidate is profiled with the inputs of
+    its function. Candidates whose schedules only differ in their opt_shapes
+    (the same tiling tuned for several buckets) are built once.
+
+    Schedules are applied by `apply_workers` threads (4 by default), or with
+    `apply_in_process` by worker processes (one per cpu by default) which receive
+    the PrimFunc and the hints serialized and return the scheduled modules as json,
+    so that scheduling is not serialized by the GIL.
+
+    With the "fixed" `measure_strategy` every candidate is measured once with
+    `num_repeats` runs. With "successive_halving" every candidate is measured
+    cheaply (a few single runs) when its build finishes, then the fastest ones of
+    each function are re-measured with more runs by `successive_halving`, and the
+    best one is chosen among its survivors. With
+    "robust" every candidate is measured by `CompileResult.measure_robust` as
+    described by `measure_option`, and ranked by its median latency.
+
+    The stages are pipelined: a candidate is handed to the build pool as soon as
+    its schedule is applied and profiled as soon as its build finishes, while the
+    other candidates are still being applied and built. `queue_size` bounds the
+    candidates waiting in or running through each stage (twice the build workers
+    by default), which keeps the pool busy without piling up schedules.
+
+    `progress(n)` is called whenever n more candidates are evaluated (measured or
+    failed), e.g. with the `update` method of a progress bar.
+
+    With a `budget` (see `TuningBudget`), no candidate is applied or built once it
+    is exhausted; the status of the unexplored candidates stays None.
+
+    The built modules are exported into a directory of this tuning (see
+    `create_artifact_dir`), removed as soon as they are loaded; the directory is
+    removed when the tuning ends. With `in_memory` they are sent back over the pool's pipe as bytes
+    instead, so the build workers need no access to the directory.
+
+    The candidates are compiled by `builder`, by default the one set by
+    `set_builder`, else a `LocalBuilder` with `max_workers` processes; a
+    `RemoteBuilder` compiles them on other hosts and always returns the modules
+    as bytes.
+
+    With `build_only` the candidates are applied and built but neither loaded nor
+    measured, which needs no device: the compile results hold the generated
+    source and the path of the archive (`artifact`) in `artifact_dir`, which is
+    kept, and no best one is returned (see `build_tuning_package`).
+    """
+    cpresults = []
+    statuses = [None] * len(configs)
+    if not configs:
+        return cpresults, None, statuses
+    if not build_only and not getattr(arch, "has_device", True):
+        raise RuntimeError("Cannot find cuda device 0 to measure the candidates, "
+                           "build them with build_tuning_package instead")
+
+    funcs = func if isinstance(func, (list, tuple)) else [func] * len(configs)
+    # candidates of the same function share their profile tensors, other functions of the
+    # same shapes share them through the pool
+    func_ids = [id(f) for f in funcs]
+    profile_tensors = {}
+    for f in funcs:
+        if not build_only and id(f) not in profile_tensors:
+            profile_tensors[id(f)] = get_dummy_input_arrays(
+                f, arch.device, distribution=data_distribution)
+    if builder is None:
+        builder = get_builder()
+    max_workers = min(len(configs), os.cpu_count(), max_workers)
+    if builder is not None:
+        max_workers = min(len(configs), builder.max_workers)
+    if queue_size is None:
+        queue_size = 2 * max_workers
 
     def _apply_schedule(f, c):
         try:
@@ -186,89 +459,414 @@ def apply_and_build_parallel(func,
             sch = None
         return sch
 
-    with ThreadPoolExecutor(max_workers=4) as scheduler:
-        futures = {scheduler.submit(_apply_schedule, func, config) for config in configs}
-        for future in as_completed(futures, timeout=timeout):
-            _sched.append(future.result())
+    def _profile(idx, sch, code, rt_mod):
+        config = configs[idx]
+        cpresult = CompileResult(config, sch, rt_mod)
+        if measure_strategy == "successive_halving":
+            cpresult.time_evaluator = rt_mod.time_evaluator(
+                rt_mod.entry_name, arch.device, number=1, repeat=3)
+        else:
+            cpresult.time_evaluator = rt_mod.time_evaluator(
+                rt_mod.entry_name, arch.device, number=num_repeats)
+        cpresult.profile_tensors = profile_tensors[func_ids[idx]]
+        cpresult.code = code
+        cpresult.index = idx
+        cpresults.append(cpresult)
+        try:
+            if measure_strategy == "robust":
+                latency = cpresult.measure_robust(arch.device, measure_option,
+                                                  getattr(arch, "l2_cache_size_bytes", None))
+            else:
+                latency = cpresult.profile()
+        except Exception as e_mesg:
+            logger.debug(f"Evaluation with config failed {e_mesg}")
+            statuses[idx] = STATUS_PROFILE_FAILED
+            return
+        logger.info("Evaluation with config {}".format(config))
+        logger.info("Time cost of this config: {:.3f} ms".format(latency))
+        cpresult.latency = latency
+        statuses[idx] = STATUS_OK
 
-    builder = PopenPoolExecutor(max_workers=max_workers, timeout=timeout)
+    if apply_in_process:
+        scheduler = PopenPoolExecutor(
+            max_workers=apply_workers or os.cpu_count(), timeout=timeout)
+        func_jsons = {}
+        target_str = str(arch.target)
 
-    # build in process parallel
-    def _build(context) -> str:
-        idx, mod, arch = context
-        if mod is None:
-            return idx, None, None
-        # TODO(lei):
-        # this is a trick to implement rasteration, will be removed in the future
-        config = configs[idx]
+        def _submit_apply(idx):
+            if func_ids[idx] not in func_jsons:
+                func_jsons[func_ids[idx]] = tvm.ir.save_json(funcs[idx])
+            return scheduler.submit(_apply_config_in_worker, func_jsons[func_ids[idx]],
+                                    configs[idx].to_json(), target_str)
 
-        @tvm.register_func(func_name="tvm_callback_cuda_postproc", override=True)
-        def tvm_callback_cuda_postproc(code, _):
-            code = tensor_replace_dp4a(code)
-            code = tensor_remove_make_int4(code)
-            code = tensor_remove_make_int2(code)
-            return code
-
-        with tvm.transform.PassContext(config={"tir.use_async_copy": True, **config.pass_context}):
-            rt_mod = tvm.build(mod, target=arch.target)
-
-        from tvm.contrib.tar import tar  # pylint: disable=import-outside-toplevel
-
-        artifact_path = os.path.join(tempfile.mkdtemp(), "tvm_tmp_mod." + tar.output_format)
-        code = rt_mod.imported_modules[0].get_source()
-        rt_mod.export_library(artifact_path, fcompile=tar)
-        return idx, code, artifact_path
-
-    _mods = [sch.mod if sch is not None else None for sch in _sched]
-
-    for map_result in builder.map_with_error_catching(
-            _build,
-        [(i, mod, arch) for i, mod in enumerate(_mods)],
-    ):
-        if map_result.status == StatusKind.TIMEOUT:
-            logger.debug("LocalBuilder: Timeout")
-        elif map_result.status == StatusKind.EXCEPTION:
-            # TODO(lei): redirect the exception to file if needed
-            logger.debug("LocalBuilder: An exception occurred {}".format(map_result.value))
-            continue
-        elif map_result.status == StatusKind.COMPLETE:
-            idx, code, artifact_path = map_result.value
-            if artifact_path is None:
-                logger.debug("Artifact path is None")
-                continue
-            sch = _sched[idx]
-            config = configs[idx]
-            rt_mod = tvm.runtime.load_module(artifact_path)
-            cpresult = CompileResult(config, sch, rt_mod)
-            timer_cuda_mod = rt_mod.time_evaluator(
-                rt_mod.entry_name, arch.device, number=num_repeats)
-            cpresult.profile_tensors = profile_tensors
-            cpresult.time_evaluator = timer_cuda_mod
+        def _apply_result(future):
+            try:
+                mod_json = future.result()
+            except Exception as apply_schedule_error:
+                logger.debug("Apply schedule failed: {}".format(apply_schedule_error))
+                return None
+            return tir.Schedule(tvm.ir.load_json(mod_json)) if mod_json is not None else None
+    else:
+        scheduler = ThreadPoolExecutor(max_workers=apply_workers or 4)
+
+        def _submit_apply(idx):
+            return scheduler.submit(_apply_schedule, funcs[idx], configs[idx])
+
+        def _apply_result(future):
+            return future.result()
+
+    owns_builder = builder is None
+    if owns_builder:
+        builder = LocalBuilder(max_workers=max_workers, timeout=timeout)
+    waiting = deque(range(len(configs)))
+    applying: Dict[Future, int] = {}
+    scheduled: deque = deque()
+    building: Dict[Future, int] = {}
+    _sched: List[Optional[Schedule]] = [None] * len(configs)
+    # identical schedules are built once: the candidates sharing the build of a
+    # leader candidate, and the outcome of every finished build
+    build_keys: List[Tuple[int, IRModule, Dict]] = []
+    leader_candidates: List[int] = []
+    followers: Dict[int, List[int]] = {}
+    build_outcomes: Dict[int, Tuple] = {}
+
+    def _find_leader(idx):
+        stripped = _strip_opt_shapes(_sched[idx].mod)
+        structural_hash = tvm.ir.structural_hash(stripped)
+        pass_context = configs[idx].pass_context
+        for leader, (leader_hash, leader_mod, leader_context) in enumerate(build_keys):
+            if (leader_hash == structural_hash and leader_context == pass_context and
+                    tvm.ir.structural_equal(leader_mod, stripped)):
+                return leader_candidates[leader]
+        build_keys.append((structural_hash, stripped, pass_context))
+        leader_candidates.append(idx)
+        return None
+
+    def _advance():
+        if progress is not None:
+            progress(1)
+
+    def _finish(idx, outcome):
+        _advance()
+        status, code, rt_mod = outcome
+        if status is not None:
+            statuses[idx] = status
+        elif build_only:
+            cpresult = CompileResult(configs[idx], _sched[idx], None)
             cpresult.code = code
+            # the archive of the leader, shared by the candidates built with it
+            cpresult.artifact = rt_mod
+            cpresult.index = idx
             cpresults.append(cpresult)
+            statuses[idx] = STATUS_OK
+        elif rt_mod is not None:
+            # measured while the remaining candidates are applied and built
+            _profile(idx, _sched[idx], code, rt_mod)
+
+    def _can_build():
+        return budget is None or budget.can_build()
+
+    def _fill_stages():
+        while waiting and len(applying) + len(scheduled) < queue_size and _can_build():
+            idx = waiting.popleft()
+            applying[_submit_apply(idx)] = idx
+        while scheduled and len(building) < queue_size and _can_build():
+            idx = scheduled.popleft()
+            artifact_path = None if in_memory else os.path.join(artifact_dir, f"{idx}.tar")
+            building[builder.submit(_sched[idx].mod, arch.target, configs[idx].pass_context,
+                                    artifact_path)] = idx
+            if budget is not None:
+                budget.builds += 1
+
+    if budget is not None:
+        budget.start()
+        budget.candidates += len(configs)
+    owns_artifact_dir = artifact_dir is None
+    if owns_artifact_dir:
+        artifact_dir = create_artifact_dir()
+    try:
+        _fill_stages()
+        while applying or building:
+            if budget is not None and (budget.time_exhausted() or
+                                       (not building and not budget.can_build())):
+                # the candidates in flight are abandoned, the best one so far is kept
+                break
+            done, _ = wait(
+                list(applying) + list(building),
+                timeout=budget.remaining_seconds() if budget is not None else None,
+                return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in applying:
+                    idx = applying.pop(future)
+                    _sched[idx] = _apply_result(future)
+                    if _sched[idx] is None:
+                        statuses[idx] = STATUS_APPLY_FAILED
+                        _advance()
+                        continue
+                    leader = _find_leader(idx)
+                    if leader is None:
+                        scheduled.append(idx)
+                    elif leader in build_outcomes:
+                        _finish(idx, build_outcomes[leader])
+                    else:
+                        followers.setdefault(leader, []).append(idx)
+                    continue
+                idx = building.pop(future)
+                try:
+                    code, artifact = future.result()
+                except TimeoutError:
+                    logger.debug("LocalBuilder: Timeout")
+                    outcome = (STATUS_BUILD_TIMEOUT, None, None)
+                except Exception as build_error:
+                    # TODO(lei): redirect the exception to file if needed
+                    logger.debug("LocalBuilder: An exception occurred {}".format(build_error))
+                    outcome = (STATUS_BUILD_FAILED, None, None)
+                else:
+                    if artifact is None:
+                        logger.debug("Artifact path is None")
+                        outcome = (STATUS_BUILD_FAILED, None, None)
+                    elif build_only:
+                        outcome = (None, code, _store_artifact(artifact, artifact_dir, idx))
+                    else:
+                        outcome = (None, code, _load_artifact(artifact, artifact_dir, idx))
+                build_outcomes[idx] = outcome
+                for candidate in [idx] + followers.pop(idx, []):
+                    _finish(candidate, outcome)
+            _fill_stages()
+    finally:
+        if apply_in_process:
+            del scheduler
         else:
-            raise ValueError(f"Unreachable: unexpected result: {map_result}")
-
-    del builder
+            scheduler.shutdown(wait=False)
+        if owns_builder:
+            builder.shutdown()
+        if owns_artifact_dir:
+            shutil.rmtree(artifact_dir, ignore_errors=True)
+
+    if budget is not None:
+        explored = sum(status is not None for status in statuses)
+        budget.explored += explored
+        if explored < len(configs):
+            logger.info("Tuning budget exhausted after {:.1f}s and {} builds, explored {} of {} "
+                        "candidates".format(budget.elapsed(), budget.builds, explored,
+                                            len(configs)))
+
+    if build_only:
+        return cpresults, None, statuses
+
+    if measure_strategy == "successive_halving" and not (budget is not None and
+                                                         budget.time_exhausted()):
+        measured_by_func: Dict[int, List[CompileResult]] = {}
+        for cpresult in cpresults:
+            if statuses[cpresult.index] == STATUS_OK:
+                measured_by_func.setdefault(func_ids[cpresult.index], []).append(cpresult)
+        for measured in measured_by_func.values():
+            successive_halving(measured, arch.device)
+            for cpresult in measured:
+                if cpresult.latency >= 1e9:
+                    statuses[cpresult.index] = STATUS_PROFILE_FAILED
 
     best = None
     best_latency = 1e9
     for cpresult in cpresults:
-        config = cpresult.config
-        try:
-            latency = cpresult.profile()
-        except Exception as e_mesg:
-            logger.debug(f"Evaluation with config failed {e_mesg}")
+        if (statuses[cpresult.index] == STATUS_OK and cpresult.ranked and
+                cpresult.latency < best_latency):
+            best_latency = cpresult.latency
+            best = cpresult
+
+    return cpresults, best, statuses
+
+
+def _split_logged_candidates(tuning_log: TuningLog, workload: str, arch_str: str,
+                             configs: List[Hint]):
+    """
+    Splits the candidates into the ones not recorded in the log yet, with their
+    serialized hints, and the fastest recorded one with its record (or None).
+    """
+    logged = tuning_log.lookup(workload, arch_str)
+    logged_best = None
+    new_configs, hint_jsons = [], []
+    for config in configs:
+        hint_json = config.to_json()
+        record = logged.get(tuning_log.get_candidate_key(hint_json))
+        if record is None:
+            new_configs.append(config)
+            hint_jsons.append(hint_json)
+        elif record["status"] == STATUS_OK and (logged_best is None or
+                                                 record["latency"] < logged_best[1]["latency"]):
+            logged_best = (config, record)
+    if len(new_configs) < len(configs):
+        logger.info("Skipping {} candidates found in the tuning log".format(
+            len(configs) - len(new_configs)))
+    return new_configs, hint_jsons, logged_best
+
+
+def apply_and_build_buckets(funcs: List[tir.PrimFunc],
+                            configs_per_func: List[List[Hint]],
+                            arch,
+                            num_repeats=3,
+                            max_workers=10,
+                            timeout=30,
+                            data_distribution="uniform",
+                            tuning_log: Optional[TuningLog] = None,
+                            queue_size: Optional[int] = None,
+                            apply_workers: Optional[int] = None,
+                            apply_in_process: bool = False,
+                            measure_strategy: MeasureStrategy = "fixed",
+                            progress: Optional[Callable[[int], None]] = None,
+                            budget: Optional[TuningBudget] = None,
+                            in_memory: bool = False,
+                            measure_option: Optional[MeasureOption] = None,
+                            builder: Optional[Builder] = None) -> List[Tuple]:
+    """
+    Tunes several functions at once, e.g. the buckets of a dynamic range: the
+    candidates of all functions go through one pipeline (see
+    `_apply_and_build_candidates`), so they share the apply and build pools and
+    identical schedules are built once. Returns the compile results and the best
+    one of each function.
+
+    With a tuning log (`tuning_log` or the one set by `set_tuning_log`), every
+    evaluated candidate is recorded and the candidates already recorded for the
+    function and arch are not evaluated again; when one of them is faster than the
+    new candidates of its function, only that one is rebuilt. `progress` and
+    `budget` are handled as in `_apply_and_build_candidates`; the candidates left
+    unexplored by the budget are not recorded, and the rebuild of the fastest
+    recorded candidate is not bounded by the budget. With `in_memory` the built
+    modules are transferred as bytes instead of files. The statistics of the
+    "robust" `measure_strategy` (see `measure_option`) are recorded with the
+    latency. `builder` compiles the candidates, see `_apply_and_build_candidates`.
+    """
+    if tuning_log is None:
+        tuning_log = get_tuning_log()
+    arch_str = str(arch.target)
+
+    workloads, logged_bests = [], []
+    flat_funcs, flat_configs, flat_hint_jsons, owners = [], [], [], []
+    for bucket, (func, configs) in enumerate(zip(funcs, configs_per_func)):
+        if tuning_log is not None:
+            workloads.append(tuning_log.get_workload_key(func))
+            num_candidates = len(configs)
+            configs, bucket_hint_jsons, logged_best = _split_logged_candidates(
+                tuning_log, workloads[-1], arch_str, configs)
+            if progress is not None and len(configs) < num_candidates:
+                # evaluated by an earlier run
+                progress(num_candidates - len(configs))
+        else:
+            bucket_hint_jsons, logged_best = [], None
+        logged_bests.append(logged_best)
+        flat_hint_jsons += bucket_hint_jsons
+        flat_funcs += [func] * len(configs)
+        flat_configs += configs
+        owners += [bucket] * len(configs)
+
+    def _run(run_funcs, run_configs, run_owners, **kwargs):
+        cpresults, _, statuses = _apply_and_build_candidates(
+            run_funcs, run_configs, arch, num_repeats, timeout=timeout,
+            data_distribution=data_distribution, in_memory=in_memory,
+            measure_option=measure_option, builder=builder, **kwargs)
+        results = [([], None) for _ in funcs]
+        for cpresult in cpresults:
+            bucket_results, best = results[run_owners[cpresult.index]]
+            bucket_results.append(cpresult)
+            if statuses[cpresult.index] == STATUS_OK and cpresult.ranked and (
+                    best is None or cpresult.latency < best.latency):
+                results[run_owners[cpresult.index]] = (bucket_results, cpresult)
+        return results, cpresults, statuses
+
+    results, cpresults, statuses = _run(
+        flat_funcs,
+        flat_configs,
+        owners,
+        max_workers=max_workers,
+        queue_size=queue_size,
+        apply_workers=apply_workers,
+        apply_in_process=apply_in_process,
+        measure_strategy=measure_strategy,
+        progress=progress,
+        budget=budget)
+    if tuning_log is None:
+        return results
+
+    measured = {cpresult.index: cpresult for cpresult in cpresults}
+    records = []
+    for idx, (bucket, hint_json) in enumerate(zip(owners, flat_hint_jsons)):
+        status = statuses[idx]
+        if status is None:
+            # left unexplored by the budget, evaluated by a later run
             continue
-        logger.info("Evaluation with config {}".format(config))
-        logger.info("Time cost of this config: {:.3f} ms".format(latency))
+        cpresult = measured[idx] if status == STATUS_OK else None
+        records.append(
+            tuning_log.make_record(
+                workloads[bucket],
+                arch_str,
+                hint_json,
+                status,
+                latency=cpresult.latency if cpresult else None,
+                samples=cpresult.latency_samples if cpresult else None,
+                stats=cpresult.latency_stats if cpresult else None,
+            ))
+    tuning_log.append(records)
+
+    # only the fastest candidate of the earlier runs is rebuilt
+    rebuild = [
+        bucket for bucket, logged_best in enumerate(logged_bests)
+        if logged_best is not None and
+        (results[bucket][1] is None or logged_best[1]["latency"] < results[bucket][1].latency)
+    ]
+    if rebuild:
+        rebuilt_results, _, _ = _run([funcs[bucket] for bucket in rebuild],
+                                     [logged_bests[bucket][0] for bucket in rebuild],
+                                     rebuild,
+                                     max_workers=max_workers,
+                                     measure_strategy="robust"
+                                     if measure_strategy == "robust" else "fixed")
+        for bucket in rebuild:
+            bucket_results, best = results[bucket]
+            rebuilt_bucket_results, rebuilt = rebuilt_results[bucket]
+            bucket_results += rebuilt_bucket_results
+            if rebuilt is not None and (best is None or rebuilt.latency < best.latency):
+                best = rebuilt
+            results[bucket] = (bucket_results, best)
+    return results
 
-        cpresult.latency = latency
-        if latency < best_latency:
-            best_latency = latency
-            best = cpresult
 
-    return cpresults, best
+def apply_and_build_parallel(func,
+                             configs,
+                             arch,
+                             num_repeats=3,
+                             max_workers=10,
+                             timeout=30,
+                             data_distribution="uniform",
+                             tuning_log: Optional[TuningLog] = None,
+                             queue_size: Optional[int] = None,
+                             apply_workers: Optional[int] = None,
+                             apply_in_process: bool = False,
+                             measure_strategy: MeasureStrategy = "fixed",
+                             budget: Optional[TuningBudget] = None,
+                             in_memory: bool = False,
+                             measure_option: Optional[MeasureOption] = None,
+                             builder: Optional[Builder] = None) -> CompileResult:
+    """
+    Applies, builds and profiles the candidates in a pipeline (see
+    `_apply_and_build_candidates`), returns all compile results and the best one.
+    The tuning log, the budget, `in_memory`, `measure_option` and `builder` are
+    handled as in `apply_and_build_buckets`.
+    """
+    return apply_and_build_buckets([func], [configs],
+                                   arch,
+                                   num_repeats,
+                                   max_workers,
+                                   timeout,
+                                   data_distribution,
+                                   tuning_log=tuning_log,
+                                   queue_size=queue_size,
+                                   apply_workers=apply_workers,
+                                   apply_in_process=apply_in_process,
+                                   measure_strategy=measure_strategy,
+                                   budget=budget,
+                                   in_memory=in_memory,
+                                   measure_option=measure_option,
+                                   builder=builder)[0]
 
 
 def apply_and_build(
@@ -277,38 +875,101 @@ def apply_and_build(
     arch,
     parallel_build=False,
     data_distribution="uniform",
+    tuning_log: Optional[TuningLog] = None,
+    apply_in_process: bool = False,
+    measure_strategy: MeasureStrategy = "fixed",
+    budget: Optional[TuningBudget] = None,
+    builder: Optional[Builder] = None,
 ) -> Tuple[List[CompileResult], CompileResult]:
     max_workers = 10 if parallel_build else 1
     return apply_and_build_parallel(
-        func, configs, arch, max_workers=max_workers, data_distribution=data_distribution)
+        func,
+        configs,
+        arch,
+        max_workers=max_workers,
+        data_distribution=data_distribution,
+        tuning_log=tuning_log,
+        apply_in_process=apply_in_process,
+        measure_strategy=measure_strategy,
+        budget=budget,
+        builder=builder)
 
 
-def fast_tune(
-    func: tir.PrimFunc,
-    target: tvm.target.Target,
-    topk: int = 10,
-    parallel_build: bool = True,
-    data_distribution: Literal["uniform", "onefill"] = "uniform",
-):
-    # check the function is a primfunc
-    if not isinstance(func, tir.PrimFunc):
-        raise ValueError("Only support func is PrimFunc")  # pragma: no cover
+def select_seed_hints(seed_hints: List[Dict], opt_shapes: Dict[str, int]) -> List[Dict]:
+    """
+    Orders serialized hints (Hint.to_json) by the distance between the opt_shapes
+    they were tuned for and `opt_shapes`, the closest one first.
+    """
 
-    if target.kind.name != "cuda":
-        logger.error("Only support CUDA target")
-        return None, None
+    def distance(hint_json):
+        seed_shapes = hint_json.get("opt_shapes", {})
+        dist = 0.0
+        for name, value in opt_shapes.items():
+            seed_value = seed_shapes.get(name)
+            if not isinstance(seed_value, int) or seed_value <= 0 or int(value) <= 0:
+                dist += 64
+                continue
+            dist += abs(np.log2(seed_value) - np.log2(int(value)))
+        return dist
 
+    return sorted(seed_hints, key=distance)
+
+
+def apply_seed_hints(configs: List[Hint],
+                     seed_hints: Optional[List[Dict]],
+                     seed_only: bool = False) -> List[Hint]:
+    """
+    Turns the tuned hints of a similar operator into candidates placed ahead of the
+    configs emitted by the policy. The tiling of a seed is taken from the stored hint,
+    the function specific analysis (intrinsic, opt_shapes) from the policy's config.
+
+    With `seed_only`, only the seeds are returned when any of them is compatible.
+    """
+    if not seed_hints or not configs:
+        return configs
+    template = configs[0]
+    seeds: List[Hint] = []
+    visited = {repr(config) for config in configs}
+    for hint_json in seed_hints:
+        if bool(hint_json["use_tc"]) != bool(template.use_tc):
+            continue
+        if (len(hint_json["block"]) != len(template.block) or
+                len(hint_json["rstep"]) != len(template.rstep)):
+            continue
+        seed = Hint().from_json(hint_json, arch=template.arch)
+        seed.intrin_info = template.intrin_info
+        seed.opt_shapes = template.opt_shapes
+        seed.cached_tensors = template.cached_tensors
+        if repr(seed) in visited:
+            continue
+        visited.add(repr(seed))
+        seeds.append(seed)
+    if seed_only and seeds:
+        return seeds
+    return seeds + configs
+
+
+def emit_candidates(
+    func: tir.PrimFunc,
+    arch: CUDA,
+    topk: int,
+    seed_hints: Optional[List[Dict]] = None,
+    seed_only: bool = False,
+    cost_model: Optional[CostModel] = None,
+    prune_topk: Optional[int] = DEFAULT_PRUNE_TOPK,
+) -> Optional[List[Hint]]:
+    """
+    Returns the candidates of the policy for `func` (specialized to its opt_shapes),
+    reranked and pruned by the cost model and preceded by the seeds, or None when
+    the function can not be tuned.
+    """
     specilized_func = func
     if func.attrs is not None and "opt_shapes" in func.attrs:
         opt_shapes = func.attrs["opt_shapes"]
         # should be int value
         if not all([isinstance(v.value, int) for v in opt_shapes.values()]):
             logger.error("The opt_shapes should be int value")
-            return None, None
-        # currently only support one dynamic range
-        if len(opt_shapes) > 1:
-            logger.error("Currently only support one dynamic range")
-            return None, None
+            return None
 
         for buffer in func.buffer_map.values():
             for axis in buffer.shape:
@@ -316,13 +977,12 @@ def fast_tune(
                     raise NotImplementedError(
                         "Currently do not support fast tune with none-dynamic range set")
         if opt_shapes:
+            # all the dynamic symbolics are specialized at once
+            specialize_map = {}
             for name, shape in opt_shapes.items():
                 var = find_var_from_func(func, name)
-                specilized_func = func.specialize({
-                    var: shape.astype(var.dtype)
-                }).with_attr("is_specialized")
-
-    arch = CUDA(target)
+                specialize_map[var] = shape.astype(var.dtype)
+            specilized_func = func.specialize(specialize_map).with_attr("is_specialized")
 
     policy = DefaultPolicy(func=func, arch=arch)
     try:
@@ -333,10 +993,69 @@ def fast_tune(
     if tags:
         policy = TensorCorePolicy(func=specilized_func, arch=arch, tags=tags)
 
-    configs = policy.emit_config(topk)
+    # the policy only provides the template of the seeds in seed only mode
+    configs = policy.emit_config(1 if (seed_only and seed_hints) else topk)
+    if cost_model is None:
+        cost_model = get_cost_model()
+    if cost_model is not None and not (seed_only and seed_hints):
+        configs = rank_candidates(configs, cost_model, topk=prune_topk)
+    configs = apply_seed_hints(configs, seed_hints, seed_only=seed_only)
 
     if len(configs) == 0:
         raise ValueError("No valid config generated")
+    return configs
+
+
+def fast_tune(
+    func: tir.PrimFunc,
+    target: tvm.target.Target,
+    topk: int = 10,
+    parallel_build: bool = True,
+    data_distribution: Literal["uniform", "onefill"] = "uniform",
+    seed_hints: Optional[List[Dict]] = None,
+    seed_only: bool = False,
+    tuning_log: Optional[TuningLog] = None,
+    cost_model: Optional[CostModel] = None,
+    prune_topk: Optional[int] = DEFAULT_PRUNE_TOPK,
+    apply_in_process: bool = False,
+    measure_strategy: MeasureStrategy = "fixed",
+    budget: Optional[TuningBudget] = None,
+    builder: Optional[Builder] = None,
+):
+    """
+    Tunes `func` for the target: the policy emits `topk` candidates, which are built
+    and profiled. With a cost model (`cost_model` or the one set by `set_cost_model`)
+    the candidates are reranked by the model and only the best `prune_topk` of them
+    are built; the seeds derived from `seed_hints` are always kept. With
+    `apply_in_process` the schedules are applied in worker processes, with the
+    "successive_halving" `measure_strategy` the candidates are measured adaptively,
+    with "robust" with warmup, L2 flushing and outlier rejection (see `MeasureOption`).
+    With a `budget` (see `TuningBudget`), tuning stops when it is exhausted and the
+    best candidate measured so far is returned. `builder` compiles the candidates,
+    see `_apply_and_build_candidates`.
+    """
+    if budget is not None:
+        # the candidate generation is charged to the budget as well
+        budget.start()
+    # check the function is a primfunc
+    if not isinstance(func, tir.PrimFunc):
+        raise ValueError("Only support func is PrimFunc")  # pragma: no cover
+
+    if target.kind.name != "cuda":
+        logger.error("Only support CUDA target")
+        return None, None
+
+    arch = CUDA(target)
+    configs = emit_candidates(
+        func,
+        arch,
+        topk,
+        seed_hints=seed_hints,
+        seed_only=seed_only,
+        cost_model=cost_model,
+        prune_topk=prune_topk)
+    if configs is None:
+        return None, None
 
     cpresults, best = apply_and_build(
         func,
@@ -344,6 +1063,11 @@ def fast_tune(
         arch,
         parallel_build=parallel_build,
         data_distribution=data_distribution,
+        tuning_log=tuning_log,
+        apply_in_process=apply_in_process,
+        measure_strategy=measure_strategy,
+        budget=budget,
+        builder=builder,
     )
 
     return cpresults, best
@@ -412,29 +1136,37 @@ def create_dispatch_func(g_var: str, func: tir.PrimFunc, refactored_funcs: List[
         _invoke_params.append(buffer.data)
     _invoke_params += list(dyn_symbolic)
 
-    func_range: List[int] = []
-    global_symbols = []
+    # the buckets form a grid over the dynamic symbolics, dispatched by a decision
+    # tree with one level of range checks per dynamic symbolic
+    bucket_funcs: Dict[Tuple[int, ...], str] = {}
     for g_var, refactor_func in refactored_funcs:
         opt_shapes = refactor_func.attrs["opt_shapes"]
-        func_range.append(list(opt_shapes.values())[0])
-        global_symbols.append(g_var)
-
-    # TODO(lei): general the dispatch function to support multiple dynamic symbolics
-    assert len(dyn_symbolic) == 1, "Only support one dynamic symbolics currently"
+        bucket_funcs[tuple(int(opt_shapes[var.name]) for var in dyn_symbolic)] = g_var
+    ranges = [sorted({key[axis] for key in bucket_funcs}) for axis in range(len(dyn_symbolic))]
+    if len(bucket_funcs) != math.prod(len(axis_ranges) for axis_ranges in ranges):
+        raise ValueError("The opt_shapes of the specialized functions should form a grid")
 
     ib = tvm.tir.ir_builder.create()
-    syb = list(dyn_symbolic)[-1]
-    last_range = 0
-    for i, (_range, g_var) in enumerate(zip(func_range, global_symbols)):
-        if i == 0:
-            with ib.if_scope(syb <= _range):
-                ib.emit(tvm.tir.Call(None, g_var, _invoke_params))
-        else:
-            with ib.if_scope(tvm.tir.all(syb > last_range, syb <= _range)):
-                ib.emit(tvm.tir.Call(None, g_var, _invoke_params))
-        last_range = _range
-    with ib.if_scope(syb > last_range):
-        ib.emit(tvm.tir.Call(None, g_var, _invoke_params))
+
+    def _emit_dispatch(axis: int, key: Tuple[int, ...]):
+        if axis == len(dyn_symbolic):
+            ib.emit(tvm.tir.Call(None, bucket_funcs[key], _invoke_params))
+            return
+        syb = dyn_symbolic[axis]
+        last_range = 0
+        for i, _range in enumerate(ranges[axis]):
+            if i == 0:
+                with ib.if_scope(syb <= _range):
+                    _emit_dispatch(axis + 1, key + (_range,))
+            else:
+                with ib.if_scope(tvm.tir.all(syb > last_range, syb <= _range)):
+                    _emit_dispatch(axis + 1, key + (_range,))
+            last_range = _range
+        # beyond the largest bucket the largest one is used
+        with ib.if_scope(syb > last_range):
+            _emit_dispatch(axis + 1, key + (last_range,))
+
+    _emit_dispatch(0, ())
     stmt = ib.get()
     dispatch_func = tvm.tir.PrimFunc(params, stmt, ret_type, buffer_map, attrs).with_attrs({
         "tir.is_global_func": True,
@@ -460,22 +1192,21 @@ def create_dispatch_mod(g_var: str, original_func: tir.PrimFunc,
     return dispatch_mod
 
 
-def fast_tune_with_dynamic_range(
+def emit_bucket_candidates(
     func: tir.PrimFunc,
-    target: tvm.target.Target,
-    topk: int = 10,
-    parallel_build: bool = True,
-    global_symbol: Optional[str] = None,
-    dynamic_range: Optional[Dict[str, List[int]]] = None,
-) -> IRModule:
-    if dynamic_range is None:
-        dynamic_range = {}
-    if target.kind.name != "cuda":
-        logger.error("Only support CUDA target")
-        return None
-    if not global_symbol:
-        global_symbol = func.attrs["global_symbol"]
-
+    arch: CUDA,
+    topk: int,
+    dynamic_range: Dict[str, List[int]],
+    seed_hints: Optional[List[Dict]] = None,
+    seed_only: bool = False,
+    cost_model: Optional[CostModel] = None,
+    prune_topk: Optional[int] = DEFAULT_PRUNE_TOPK,
+) -> Optional[Tuple[tir.PrimFunc, List[Dict], List[tir.PrimFunc], List[List[Hint]]]]:
+    """
+    Returns the function annotated with its opt_shapes, the opt_shapes of every
+    bucket of the dynamic range, the function of every bucket and its candidates
+    (see `emit_candidates`), or None when the function can not be tuned.
+    """
     # set opt_shapes for the primfunc with dynamic symbolic
     opt_shapes: Dict[str, List[int]] = {}
     for buffer in func.buffer_map.values():
@@ -497,7 +1228,6 @@ def fast_tune_with_dynamic_range(
             logger.error("The opt_shapes should be list value")
             return None
 
-    logger.info("Start fast tuning with dynamic range")
     opt_shapes = func.attrs["opt_shapes"]
 
     # Step 1.Calculate the Cartesian product using itertools.product
@@ -506,12 +1236,214 @@ def fast_tune_with_dynamic_range(
     # Convert the Cartesian product to a list of dictionaries
     specialize_items: List[Dict] = [dict(zip(opt_shapes.keys(), values)) for values in product_list]
 
-    specilized_tuned_funcs: List[tir.PrimFunc] = []
+    bucket_funcs: List[tir.PrimFunc] = []
+    bucket_configs: List[List[Hint]] = []
     for item in specialize_items:
         func = func.with_attr("opt_shapes", item)
-        _, best = fast_tune(func, target, topk, parallel_build)
-        if best is None:
+        bucket_seeds = None
+        if seed_hints:
+            bucket_seeds = select_seed_hints(seed_hints, {k: int(v) for k, v in item.items()})
+        configs = emit_candidates(
+            func,
+            arch,
+            topk,
+            seed_hints=bucket_seeds,
+            seed_only=seed_only,
+            cost_model=cost_model,
+            prune_topk=prune_topk)
+        if configs is None:
             return None
-        specilized_tuned_funcs.append(best.sch.mod["main"])
+        bucket_funcs.append(func)
+        bucket_configs.append(configs)
+    return func, specialize_items, bucket_funcs, bucket_configs
+
+
+def collect_bucket_results(
+        specialize_items: List[Dict],
+        results: List[Tuple],
+        merge_identical: bool = False) -> Optional[List[Tuple[Dict, CompileResult]]]:
+    """
+    Pairs the opt_shapes of every bucket with its best result (from
+    `apply_and_build_buckets`), None when no bucket has a valid candidate. The
+    buckets without one, e.g. when the tuning budget ran out, use the best result
+    of the closest bucket. With `merge_identical`, adjacent buckets with identical
+    kernels are merged (see `merge_identical_buckets`) to keep the dispatcher small.
+    """
+    bucket_shapes = [{k: int(v) for k, v in item.items()} for item in specialize_items]
+    tuned = [
+        (shapes, best) for shapes, (_, best) in zip(bucket_shapes, results) if best is not None
+    ]
+    if not tuned:
+        return None
+
+    def distance(shapes: Dict[str, int], other: Dict[str, int]) -> float:
+        return sum(abs(math.log2(shapes[k]) - math.log2(other[k])) for k in shapes)
+
+    bucket_results: List[Tuple[Dict, CompileResult]] = []
+    for shapes, (_, best) in zip(bucket_shapes, results):
+        if best is None:
+            _, best = min(tuned, key=lambda item: distance(shapes, item[0]))
+            logger.info(f"No measured candidate for the bucket {shapes}, using the kernel of "
+                        "the closest bucket")
+        bucket_results.append((shapes, best))
+    if merge_identical:
+        bucket_results = merge_identical_buckets(bucket_results)
+    return bucket_results
+
+
+def fast_tune_dynamic_buckets(
+    func: tir.PrimFunc,
+    target: tvm.target.Target,
+    topk: int = 10,
+    parallel_build: bool = True,
+    dynamic_range: Optional[Dict[str, List[int]]] = None,
+    seed_hints: Optional[List[Dict]] = None,
+    seed_only: bool = False,
+    tuning_log: Optional[TuningLog] = None,
+    cost_model: Optional[CostModel] = None,
+    prune_topk: Optional[int] = DEFAULT_PRUNE_TOPK,
+    apply_in_process: bool = False,
+    measure_strategy: MeasureStrategy = "fixed",
+    merge_identical: bool = False,
+    budget: Optional[TuningBudget] = None,
+    builder: Optional[Builder] = None,
+) -> Optional[Tuple[tir.PrimFunc, List[Tuple[Dict, CompileResult]]]]:
+    """
+    Tunes every bucket of the dynamic range, returns the function annotated with
+    its opt_shapes and the best result of each bucket. The candidates of all the
+    buckets are emitted first and tuned together by `apply_and_build_buckets`, so
+    the buckets share one build pool and a tiling chosen for several buckets is
+    built once. With `merge_identical`, adjacent buckets with identical kernels are
+    merged (see `merge_identical_buckets`) to keep the dispatcher small. With a
+    `budget`, the buckets left without a measured candidate use the kernel of the
+    closest bucket that has one. `builder` compiles the candidates, see
+    `_apply_and_build_candidates`.
+    """
+    if dynamic_range is None:
+        dynamic_range = {}
+    if budget is not None:
+        budget.start()
+    if target.kind.name != "cuda":
+        logger.error("Only support CUDA target")
+        return None
+
+    logger.info("Start fast tuning with dynamic range")
+    arch = CUDA(target)
+    emitted = emit_bucket_candidates(
+        func,
+        arch,
+        topk,
+        dynamic_range,
+        seed_hints=seed_hints,
+        seed_only=seed_only,
+        cost_model=cost_model,
+        prune_topk=prune_topk)
+    if emitted is None:
+        return None
+    func, specialize_items, bucket_funcs, bucket_configs = emitted
+
+    results = apply_and_build_buckets(
+        bucket_funcs,
+        bucket_configs,
+        arch,
+        max_workers=10 if parallel_build else 1,
+        tuning_log=tuning_log,
+        apply_in_process=apply_in_process,
+        measure_strategy=measure_strategy,
+        budget=budget,
+        builder=builder)
+    bucket_results = collect_bucket_results(specialize_items, results, merge_identical)
+    if bucket_results is None:
+        return None
+
+    return func, bucket_results
 
+
+def merge_identical_buckets(
+        bucket_results: List[Tuple[Dict, CompileResult]]) -> List[Tuple[Dict, CompileResult]]:
+    """
+    Merges adjacent buckets whose best kernels are identical (the same schedule and
+    pass context, up to the opt_shapes): the smaller bucket is dropped, so its sizes
+    are dispatched to the larger one. Along a dynamic symbolic, two adjacent ranges
+    are merged when the kernels are identical for all the ranges of the other
+    symbolics, so the buckets still form a grid.
+    """
+    if len(bucket_results) < 2:
+        return bucket_results
+    names = list(bucket_results[0][0].keys())
+    table = {tuple(shapes[name] for name in names): best for shapes, best in bucket_results}
+
+    def _identical(lhs: CompileResult, rhs: CompileResult) -> bool:
+        return lhs.config.pass_context == rhs.config.pass_context and tvm.ir.structural_equal(
+            _strip_opt_shapes(lhs.sch.mod), _strip_opt_shapes(rhs.sch.mod))
+
+    def _merge_once() -> bool:
+        for axis in range(len(names)):
+            ranges = sorted({key[axis] for key in table})
+            for lower, upper in zip(ranges, ranges[1:]):
+                lower_keys = [key for key in table if key[axis] == lower]
+                if all(
+                        _identical(table[key], table[key[:axis] + (upper,) + key[axis + 1:]])
+                        for key in lower_keys):
+                    for key in lower_keys:
+                        del table[key]
+                    return True
+        return False
+
+    while _merge_once():
+        pass
+    if len(table) < len(bucket_results):
+        logger.info("Merged {} buckets with identical kernels".format(
+            len(bucket_results) - len(table)))
+    return [(dict(zip(names, key)), best) for key, best in sorted(table.items())]
+
+
+def fast_tune_with_dynamic_range(
+    func: tir.PrimFunc,
+    target: tvm.target.Target,
+    topk: int = 10,
+    parallel_build: bool = True,
+    global_symbol: Optional[str] = None,
+    dynamic_range: Optional[Dict[str, List[int]]] = None,
+    seed_hints: Optional[List[Dict]] = None,
+    seed_only: bool = False,
+    tuning_log: Optional[TuningLog] = None,
+    cost_model: Optional[CostModel] = None,
+    prune_topk: Optional[int] = DEFAULT_PRUNE_TOPK,
+    apply_in_process: bool = False,
+    measure_strategy: MeasureStrategy = "fixed",
+    merge_identical: bool = False,
+    budget: Optional[TuningBudget] = None,
+    builder: Optional[Builder] = None,
+) -> IRModule:
+    """
+    Tunes the buckets of the dynamic range (see `fast_tune_dynamic_buckets`, which
+    handles the other options as `fast_tune`) and returns the module dispatching
+    to their kernels.
+    """
+    if not global_symbol:
+        global_symbol = func.attrs["global_symbol"]
+    tuned = fast_tune_dynamic_buckets(
+        func,
+        target,
+        topk=topk,
+        parallel_build=parallel_build,
+        dynamic_range=dynamic_range,
+        seed_hints=seed_hints,
+        seed_only=seed_only,
+        tuning_log=tuning_log,
+        cost_model=cost_model,
+        prune_topk=prune_topk,
+        apply_in_process=apply_in_process,
+        measure_strategy=measure_strategy,
+        merge_identical=merge_identical,
+        budget=budget,
+        builder=builder,
+    )
+    if tuned is None:
+        return None
+    func, bucket_results = tuned
+    specilized_tuned_funcs: List[tir.PrimFunc] = [
+        best.sch.mod["main"].with_attr("opt_shapes", shapes) for shapes, best in bucket_results
+    ]
     return create_dispatch_mod(global_symbol, func, specilized_tuned_funcs)
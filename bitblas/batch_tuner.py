@@ -0,0 +1,283 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""Tuning of many operators (e.g. the linear layers of a model) as one job."""
+import os
+from typing import Dict, List, Optional, Union
+import logging
+
+from tqdm import tqdm
+
+import bitblas
+from tvm.target import Target
+from bitblas.base.roller.arch import CUDA
+from bitblas.base.budget import TuningBudget
+from bitblas.base.cost_model import DEFAULT_PRUNE_TOPK, CostModel
+from bitblas.base.tuning_log import TuningLog
+from bitblas.base.utils import (
+    MeasureStrategy,
+    apply_and_build_buckets,
+    collect_bucket_results,
+    emit_bucket_candidates,
+    emit_candidates,
+)
+from bitblas.cache import global_operator_cache, get_config_key, get_database_path
+from bitblas.ops.operator import Operator, OperatorConfig
+
+logger = logging.getLogger(__name__)
+
+# the operator built from each config type
+_OPERATOR_TYPES = {
+    "MatmulConfig": "Matmul",
+    "MatmulConfigWithSplitK": "MatmulWithSplitK",
+    "MatmulWeightOnlyDequantizeConfig": "MatmulWeightOnlyDequantize",
+}
+
+
+def collect_linear_configs(model,
+                           opt_M: Union[int, List[int]] = None,
+                           **config_kwargs) -> List[OperatorConfig]:
+    """
+    Returns the matmul configs of the linear layers of a torch model, one per layer
+    (duplicates are removed by `BatchTuner.tune`). The configs of `bitblas.Linear`
+    layers are taken as they are; `torch.nn.Linear` layers get a `MatmulConfig` with
+    their shape, `opt_M` (by default the one of `bitblas.Linear`) and `config_kwargs`,
+    e.g. the dtypes or the quantization fields.
+    """
+    import torch.nn as nn
+
+    if opt_M is None:
+        opt_M = bitblas.Linear.opt_M
+    configs = []
+    for module in model.modules():
+        if isinstance(module, bitblas.Linear):
+            configs.append(module.bitblas_matmul.config)
+        elif isinstance(module, nn.Linear):
+            configs.append(
+                bitblas.MatmulConfig(
+                    M=opt_M,
+                    N=module.out_features,
+                    K=module.in_features,
+                    with_bias=module.bias is not None,
+                    **config_kwargs,
+                ))
+    return configs
+
+
+class BatchTuner:
+    """
+    Tunes many operator configs as one job: the configs are deduplicated, the ones
+    in the database are loaded instead of tuned, and the candidates of all the
+    remaining operators (of every bucket of their dynamic ranges) go through one
+    pipeline with shared apply and build pools, see `apply_and_build_buckets`.
+
+    The operators are tuned `chunk_size` at a time; the tuned ones are saved into
+    the database after every chunk, and with a tuning log every evaluated candidate
+    is recorded, so an interrupted job resumes where it stopped.
+
+    A `budget` (see `TuningBudget`) bounds the whole job: once it is exhausted the
+    chunk being tuned keeps the best kernels measured so far and the remaining
+    operators get the default schedule; `stats` reports how many operators were
+    partially tuned or skipped and how much of the candidate space was explored.
+    The partially tuned operators are not saved into the database, so that a later
+    job tunes them again.
+
+        tuner = BatchTuner(target, tuning_log="/path/to/tuning_log.jsonl")
+        ops = tuner.tune(collect_linear_configs(model))
+    """
+
+    def __init__(
+        self,
+        target: Union[str, Target] = None,
+        database_path: Optional[str] = None,
+        topk: int = 20,
+        max_workers: Optional[int] = None,
+        chunk_size: int = 8,
+        tuning_log: Union[str, TuningLog, None] = None,
+        warm_start: Optional[str] = "seed",
+        cost_model: Optional[CostModel] = None,
+        prune_topk: Optional[int] = DEFAULT_PRUNE_TOPK,
+        apply_in_process: bool = False,
+        measure_strategy: MeasureStrategy = "fixed",
+        budget: Optional[TuningBudget] = None,
+        show_progress: bool = True,
+    ):
+        if target is None:
+            target = bitblas.auto_detect_nvidia_target()
+        self.target = Target(target) if isinstance(target, str) else target
+        # the database directory of the target, named as by `bitblas.Linear` for a str target
+        self.database_target = target if isinstance(target, str) else None
+        if self.target.kind.name != "cuda":
+            raise ValueError("Currently only support cuda target")
+        self.database_path = database_path or get_database_path()
+        self.topk = topk
+        self.max_workers = max_workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        self.tuning_log = TuningLog(tuning_log) if isinstance(tuning_log, str) else tuning_log
+        # as `bitblas.Linear.warm_start`: "seed", "fast" or None
+        self.warm_start = warm_start
+        self.cost_model = cost_model
+        self.prune_topk = prune_topk
+        self.apply_in_process = apply_in_process
+        self.measure_strategy = measure_strategy
+        self.budget = budget
+        self.show_progress = show_progress
+        self.stats: Dict = {}
+
+    def _create_operator(self, config: OperatorConfig) -> Operator:
+        operator_type = _OPERATOR_TYPES.get(type(config).__name__)
+        if operator_type is None:
+            raise ValueError(f"Unsupported config type {type(config).__name__}")
+        return getattr(bitblas, operator_type)(config, target=self.target, enable_tuning=False)
+
+    def _emit(self, op_inst: Operator, arch: CUDA):
+        """Returns the opt_shapes, functions and candidates of the buckets of an operator."""
+        seed_hints = None
+        if self.warm_start is not None:
+            seed_hints = global_operator_cache.find_nearest_hints(op_inst.config)
+        seed_only = self.warm_start == "fast"
+        if op_inst.dynamic_range is not None:
+            return emit_bucket_candidates(
+                op_inst.prim_func,
+                arch,
+                self.topk,
+                op_inst.dynamic_range,
+                seed_hints=seed_hints,
+                seed_only=seed_only,
+                cost_model=self.cost_model,
+                prune_topk=self.prune_topk)
+        configs = emit_candidates(
+            op_inst.prim_func,
+            arch,
+            self.topk,
+            seed_hints=seed_hints,
+            seed_only=seed_only,
+            cost_model=self.cost_model,
+            prune_topk=self.prune_topk)
+        if configs is None:
+            return None
+        return op_inst.prim_func, None, [op_inst.prim_func], [configs]
+
+    def _tune_chunk(self, op_insts: List[Operator], arch: CUDA, progress) -> List[str]:
+        """
+        Returns "tuned", "partial" or "failed" for every operator. The operators are
+        partial when the budget ran out before all the candidates of the chunk were
+        explored, or when a bucket had no measured candidate; they are only kept in
+        memory, so that a later job tunes them again.
+        """
+        if self.budget is not None:
+            candidates, explored = self.budget.candidates, self.budget.explored
+        emitted = [self._emit(op_inst, arch) for op_inst in op_insts]
+        funcs, configs = [], []
+        for item in emitted:
+            if item is not None:
+                funcs += item[2]
+                configs += item[3]
+        if progress is not None:
+            progress.total += sum(len(bucket_configs) for bucket_configs in configs)
+            progress.refresh()
+        results = apply_and_build_buckets(
+            funcs,
+            configs,
+            arch,
+            max_workers=self.max_workers,
+            tuning_log=self.tuning_log,
+            apply_in_process=self.apply_in_process,
+            measure_strategy=self.measure_strategy,
+            progress=progress.update if progress is not None else None,
+            budget=self.budget,
+        )
+
+        chunk_complete = self.budget is None or (
+            self.budget.explored - explored >= self.budget.candidates - candidates)
+        statuses = []
+        offset = 0
+        for op_inst, item in zip(op_insts, emitted):
+            if item is None:
+                statuses.append("failed")
+                continue
+            func, specialize_items, bucket_funcs, _ = item
+            op_results = results[offset:offset + len(bucket_funcs)]
+            offset += len(bucket_funcs)
+            # a bucket without a measured candidate falls back to the closest bucket
+            complete = chunk_complete and all(best is not None for _, best in op_results)
+            if specialize_items is None:
+                best = op_results[0][1]
+                optimized_mod = op_inst.apply_tuned_best(best) if best is not None else None
+            else:
+                bucket_results = collect_bucket_results(specialize_items, op_results)
+                optimized_mod = (
+                    op_inst.apply_tuned_buckets(func, bucket_results)
+                    if bucket_results is not None else None)
+            if optimized_mod is None:
+                logger.warning(f"No valid candidate for {op_inst.config}, keeping the default "
+                               "schedule")
+                statuses.append("failed")
+                continue
+            op_inst.optimized_func = optimized_mod
+            op_inst._build_runtime_module(op_inst.target)
+            global_operator_cache.add(op_inst.config, op_inst, persist=complete)
+            statuses.append("tuned" if complete else "partial")
+        return statuses
+
+    def tune(self, configs: List[OperatorConfig]) -> List[Operator]:
+        """
+        Returns the operator of every config, in the order of `configs`; equal
+        configs share their operator. Configs whose tuning fails get an operator
+        with the default schedule, which is not saved into the database.
+        """
+        unique_configs: Dict[str, OperatorConfig] = {}
+        for config in configs:
+            unique_configs.setdefault(get_config_key(config), config)
+
+        global_operator_cache.load_from_database(self.database_path, self.database_target or
+                                                  self.target)
+        operators: Dict[str, Operator] = {}
+        pending: List[str] = []
+        for key, config in unique_configs.items():
+            if global_operator_cache.exists(config):
+                op_inst = global_operator_cache.get(config)
+                if op_inst is not None:
+                    operators[key] = op_inst
+                    continue
+            pending.append(key)
+        self.stats = {
+            "configs": len(configs),
+            "unique": len(unique_configs),
+            "cached": len(operators),
+            "tuned": 0,
+            "partial": 0,
+            "failed": 0,
+            "skipped": 0,
+        }
+        logger.info(f"Tuning {len(pending)} of {len(unique_configs)} unique configs, "
+                    f"{len(operators)} found in the database")
+
+        if self.budget is not None:
+            self.budget.start()
+        arch = CUDA(self.target)
+        progress = tqdm(
+            total=0, desc="BitBLAS tuning", unit="candidate") if self.show_progress else None
+        try:
+            for start in range(0, len(pending), self.chunk_size):
+                chunk = pending[start:start + self.chunk_size]
+                op_insts = [self._create_operator(unique_configs[key]) for key in chunk]
+                if self.budget is not None and self.budget.exhausted:
+                    for key, op_inst in zip(chunk, op_insts):
+                        operators[key] = op_inst
+                    self.stats["skipped"] += len(chunk)
+                    continue
+                statuses = self._tune_chunk(op_insts, arch, progress)
+                for key, op_inst, status in zip(chunk, op_insts, statuses):
+                    operators[key] = op_inst
+                    self.stats[status] += 1
+                # the tuned operators survive an interruption of the remaining chunks
+                global_operator_cache.save_into_database(self.database_path, self.database_target)
+        finally:
+            if progress is not None:
+                progress.close()
+        if self.budget is not None:
+            self.stats.update(self.budget.report())
+            if self.stats["skipped"]:
+                logger.info(f"Tuning budget exhausted, {self.stats['skipped']} operators use the "
+                            "default schedule")
+        return [operators[get_config_key(config)] for config in configs]
@@ -4,6 +4,23 @@
 from .operator import (
     global_operator_cache,  # noqa: F401
     load_global_ops_cache,  # noqa: F401
+    load_global_ops_cache_async,  # noqa: F401
     get_database_path,  # noqa: F401
     set_database_path,  # noqa: F401
 )
+from .packed import (
+    PackedDatabase,  # noqa: F401
+    export_to_directory,  # noqa: F401
+    import_from_directory,  # noqa: F401
+)
+from .keys import (
+    canonicalize_config,  # noqa: F401
+    get_config_key,  # noqa: F401
+    get_database_key,  # noqa: F401
+)
+from .compile_cache import (
+    CompileCache,  # noqa: F401
+    global_compile_cache,  # noqa: F401
+    get_compile_cache,  # noqa: F401
+    set_compile_cache_path,  # noqa: F401
+)
@@ -0,0 +1,181 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""Content-addressed on-disk cache of compiled artifacts."""
+import os
+import json
+import shutil
+import tempfile
+import subprocess
+from functools import lru_cache
+from hashlib import sha256
+from typing import Optional
+import logging
+
+from .operator import file_lock
+
+logger = logging.getLogger(__name__)
+
+BITBLAS_COMPILE_CACHE_PATH = os.path.expanduser("~/.cache/bitblas_compile")
+# the least recently used artifacts are evicted beyond this size
+DEFAULT_MAX_BYTES = 4 << 30
+LOCK_FILE_NAME = ".lock"
+TMP_FILE_PREFIX = ".tmp-"
+
+
+@lru_cache(maxsize=None)
+def get_nvcc_version() -> str:
+    try:
+        ret = subprocess.run(["nvcc", "--version"], capture_output=True, text=True)
+    except OSError:
+        return "unknown"
+    return ret.stdout.strip()
+
+
+class CompileCache:
+    """
+    Stores compiled artifacts (wrapper libraries, exported runtime modules) under
+    the hash of everything that determines them, e.g. the source, the compiler
+    flags, the compiler version and the arch. Artifacts are shared by all
+    operators and processes using the same cache directory: they are published
+    with an atomic rename, and the least recently used ones are evicted once the
+    directory exceeds `max_bytes`. The size of the directory is measured on the
+    first store and then tracked per stored artifact, the directory is only
+    scanned again to evict, which also accounts for the other processes' stores.
+
+    Callers copy the artifacts out with `fetch`, so that evicting an artifact
+    never affects a library another operator has loaded.
+    """
+
+    def __init__(self, cache_dir: str = BITBLAS_COMPILE_CACHE_PATH,
+                 max_bytes: Optional[int] = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        # running size of the cache directory, None until measured
+        self._size: Optional[int] = None
+
+    @staticmethod
+    def make_key(**components) -> str:
+        payload = json.dumps(components, sort_keys=True, default=str, separators=(",", ":"))
+        return sha256(payload.encode()).hexdigest()
+
+    def _get_path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + suffix)
+
+    def fetch(self, key: str, suffix: str, dst_path: str, count: bool = True) -> bool:
+        """
+        Copies the artifact to `dst_path`, returns False on a miss. A lookup made of
+        several artifacts counts its hit or miss on one of them only, the others are
+        fetched with `count=False`.
+        """
+        path = self._get_path(key, suffix)
+        try:
+            shutil.copyfile(path, dst_path)
+            # the modification time orders the artifacts for eviction
+            os.utime(path)
+        except OSError:
+            # missing, or evicted by another process in the meantime
+            self.misses += count
+            return False
+        self.hits += count
+        return True
+
+    def fetch_text(self, key: str, suffix: str, count: bool = True) -> Optional[str]:
+        path = self._get_path(key, suffix)
+        try:
+            with open(path) as f:
+                text = f.read()
+            os.utime(path)
+        except OSError:
+            self.misses += count
+            return None
+        self.hits += count
+        return text
+
+    def store(self, key: str, suffix: str, src_path: str) -> str:
+        """Publishes a copy of `src_path` as the artifact of `key`."""
+        path = self._get_path(key, suffix)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=TMP_FILE_PREFIX, dir=directory)
+        os.close(fd)
+        try:
+            shutil.copyfile(src_path, tmp_path)
+            added_bytes = os.path.getsize(tmp_path)
+            if os.path.exists(path):
+                added_bytes -= os.path.getsize(path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._evict_if_needed(added_bytes)
+        return path
+
+    def store_text(self, key: str, suffix: str, text: str) -> str:
+        with tempfile.NamedTemporaryFile(mode="w", suffix=suffix) as f:
+            f.write(text)
+            f.flush()
+            return self.store(key, suffix, f.name)
+
+    def _list_artifacts(self):
+        artifacts = []
+        if not os.path.isdir(self.cache_dir):
+            return artifacts
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.startswith(TMP_FILE_PREFIX) or name == LOCK_FILE_NAME:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                artifacts.append((stat.st_mtime, stat.st_size, path))
+        return artifacts
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._list_artifacts())
+
+    def _evict_if_needed(self, added_bytes: int = 0):
+        if self.max_bytes is None:
+            return
+        if self._size is None:
+            self._size = self.size()
+        else:
+            self._size += added_bytes
+        if self._size <= self.max_bytes:
+            return
+        with file_lock(os.path.join(self.cache_dir, LOCK_FILE_NAME)):
+            artifacts = self._list_artifacts()
+            total = sum(size for _, size, _ in artifacts)
+            for _, size, path in sorted(artifacts):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                logger.debug(f"Evicted {path} from the compile cache")
+            self._size = total
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        self._size = None
+
+
+global_compile_cache = CompileCache()
+
+
+def get_compile_cache() -> Optional[CompileCache]:
+    """Returns the global compile cache, or None when it is disabled."""
+    return global_compile_cache if global_compile_cache.enabled else None
+
+
+def set_compile_cache_path(path: str, max_bytes: Optional[int] = DEFAULT_MAX_BYTES):
+    global_compile_cache.cache_dir = path
+    global_compile_cache.max_bytes = max_bytes
+    global_compile_cache._size = None
+    return global_compile_cache
@@ -0,0 +1,76 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""Canonical serialization and hashing of operator configs."""
+import json
+from enum import Enum
+from hashlib import sha256
+from dataclasses import fields, is_dataclass
+from typing import Any, Dict
+
+# bump when the canonical form changes, entries of other versions are not reused
+KEY_VERSION = 1
+
+
+def _canonicalize_value(value: Any) -> Any:
+    # enum first as IntEnum is an int as well
+    if isinstance(value, Enum):
+        return _canonicalize_value(value.value)
+    if isinstance(value, (bool, str)) or value is None:
+        return value
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, float):
+        return float(value)
+    if isinstance(value, (list, tuple)):
+        return [_canonicalize_value(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _canonicalize_value(v) for k, v in sorted(value.items())}
+    return str(value)
+
+
+def canonicalize_config(config) -> Dict:
+    """
+    Returns the canonical form of a config dataclass: its type name and its fields
+    sorted by name, with tuples as lists and enums as their values. The config is
+    expected to be constructed, i.e. `__post_init__` has filled in the defaults.
+    """
+    if not is_dataclass(config):
+        raise TypeError(f"Expected a config dataclass, got {type(config)}")
+    return {
+        "type": type(config).__name__,
+        "fields": {f.name: _canonicalize_value(getattr(config, f.name)) for f in fields(config)},
+    }
+
+
+def get_config_key(config) -> str:
+    """Hash of the canonical form, equal for semantically equal configs."""
+    payload = json.dumps(canonicalize_config(config), sort_keys=True, separators=(",", ":"))
+    return sha256(payload.encode()).hexdigest()
+
+
+def get_version_info() -> Dict[str, str]:
+    import bitblas
+    from bitblas import tvm
+
+    return {
+        "bitblas": bitblas.__version__,
+        "tvm": getattr(tvm, "__version__", "unknown"),
+    }
+
+
+def get_database_key(config, arch: str) -> str:
+    """
+    Key of the database entry of a config: the canonical config together with the
+    key version, the BitBLAS/TVM versions and the target arch.
+    """
+    payload = json.dumps(
+        {
+            "key_version": KEY_VERSION,
+            "config": canonicalize_config(config),
+            "versions": get_version_info(),
+            "arch": arch,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return sha256(payload.encode()).hexdigest()
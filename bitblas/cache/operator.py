@@ -3,58 +3,566 @@
 import bitblas
 from bitblas.ops.operator import OperatorConfig, Operator
 from dataclasses import asdict
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Literal, Optional
+import math
 import os
 import json
+import atexit
 import tempfile
-from hashlib import sha256
+import threading
 import shutil
 from bitblas import tvm
 from tvm.contrib.tar import tar
+from .keys import (
+    KEY_VERSION,
+    get_config_key,
+    get_database_key,
+    get_version_info,
+)
+from .packed import PackedDatabase
 import logging
 
 logger = logging.getLogger(__name__)
 
 BITBLAS_DATABASE_PATH = os.path.expanduser("~/.cache/bitblas")
+# the best tuned hints (Hint.to_json) of an entry
+HINTS_FILE_NAME = "hints.json"
+# the config fields which may differ between an entry and the config it warm starts
+SHAPE_FIELDS = ("M", "N", "K")
+# the manifest file that maps config hashes to database entries of an arch
+INDEX_FILE_NAME = "index.json"
+# entries saved after the index was written are appended here, one json object per line
+INDEX_JOURNAL_NAME = "index.journal"
+# the journal is compacted into the index once it grows beyond this size
+INDEX_JOURNAL_MAX_BYTES = 1 << 20
+# advisory lock guarding the index of an arch
+LOCK_FILE_NAME = ".lock"
+# entries are written under this prefix and renamed once complete
+TMP_ENTRY_PREFIX = ".tmp-"
+
+
+@contextmanager
+def file_lock(lock_path):
+    """Exclusive advisory lock on `lock_path`, a no-op where fcntl is unavailable."""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(lock_path, "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
 
 
 class OperatorCache:
     """
     Manages a cache for operator instances (e.g., Matmul, Convolution) based on their configurations.
+
+    The cache is unbounded by default. When `max_entries` or `max_bytes` is set,
+    entries are evicted following `eviction_policy` ("lru" or "lfu") once a bound
+    is exceeded. The cache only drops its reference to an evicted operator, which
+    callers holding it (e.g. `bitblas.Linear`) keep using; entries that came from
+    the database stay loadable. With `release_on_evict` evicted operators are also
+    released (their runtime module and wrapper library are unloaded), which is only
+    safe when no caller keeps the operators returned by `get`.
     """
 
-    def __init__(self):
-        self.cache = {}
+    EVICTION_POLICIES = ("lru", "lfu")
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        eviction_policy: Literal["lru", "lfu"] = "lru",
+        release_on_evict: bool = False,
+    ):
+        self.cache = OrderedDict()
+        # entries which are known from the database index but have not been
+        # deserialized yet, keyed by the canonical key of the config.
+        self.lazy_entries = {}
+        # the config instance used as cache key for each canonical key, so that
+        # semantically equal configs share one slot
+        self._canonical_configs = {}
+        # the lazy entry an in-memory operator was loaded from, used to
+        # make evicted operators loadable again.
+        self._entry_origins = {}
+        self._entry_bytes = {}
+        self._entry_frequency = {}
+        # opened packed databases, keyed by their absolute path
+        self.packed_databases = {}
+        # configs already stored in a database, keyed by the database
+        self._persisted = {}
+        # configs not written into a database yet, as ordered sets keyed by the database,
+        # collected from the cache on the first save into the database and maintained
+        # by `add` afterwards
+        self._dirty = {}
+        # configs added with `persist=False`, never written into a database
+        self._transient = set()
+        # nesting depth of `deferred_flush` and the saves requested meanwhile
+        self._deferred_depth = 0
+        self._deferred_saves = {}
+        # databases whose saves are deferred to interpreter exit, see `enable_flush_at_exit`
+        self._flush_at_exit_keys = set()
+        self._flush_at_exit_registered = False
+        # guards the cache state against the background preload threads
+        self._lock = threading.RLock()
+        # futures of the entries being loaded by `preload`, keyed by canonical key,
+        # and of the database indexes being read
+        self._pending = {}
+        self._pending_indexes = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.set_capacity(max_entries, max_bytes, eviction_policy, release_on_evict)
+
+    def set_capacity(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        eviction_policy: Literal["lru", "lfu"] = "lru",
+        release_on_evict: bool = False,
+    ):
+        if eviction_policy not in self.EVICTION_POLICIES:
+            raise ValueError(f"Unsupported eviction policy {eviction_policy}, "
+                             f"expected one of {self.EVICTION_POLICIES}")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.eviction_policy = eviction_policy
+        self.release_on_evict = release_on_evict
+        if max_bytes is not None:
+            for config, op_inst in self.cache.items():
+                if config not in self._entry_bytes:
+                    self._entry_bytes[config] = op_inst.get_memory_footprint()
+        self._evict_if_needed()
 
-    def add(self, config: OperatorConfig, op_inst: Operator):
-        self.cache[config] = op_inst
+    def add(self, config: OperatorConfig, op_inst: Operator, persist: bool = True):
+        """
+        Caches the operator of a config. With `persist=False` the operator is only
+        kept in memory and never written into a database, e.g. when its tuning was
+        cut short, so that a later run tunes it again.
+        """
+        with self._lock:
+            config = self._canonicalize(config, record=True)
+            if not persist:
+                self._transient.add(config)
+                for dirty in self._dirty.values():
+                    dirty.pop(config, None)
+            elif config in self._transient:
+                self._transient.discard(config)
+                self._mark_dirty(config)
+            elif config in self.cache:
+                if self.cache[config] is not op_inst:
+                    # the entry changed, it has to be written again
+                    self._mark_dirty(config)
+            else:
+                for database_key, dirty in self._dirty.items():
+                    if config not in self._persisted.get(database_key, ()):
+                        dirty[config] = None
+            if config in self.cache:
+                self.cache.move_to_end(config)
+            self.cache[config] = op_inst
+            self._entry_frequency.setdefault(config, 0)
+            if self.max_bytes is not None:
+                self._entry_bytes[config] = op_inst.get_memory_footprint()
+            self._evict_if_needed(keep=config)
 
     def get(self, config: OperatorConfig):
+        config = self._canonicalize(config)
+        op_inst = self.cache.get(config)
+        if op_inst is None and (self._pending or self._pending_indexes):
+            op_inst = self._wait_pending(config)
+        if op_inst is None and self.lazy_entries:
+            op_inst = self._load_lazy_entry(config)
+        if op_inst is None:
+            # a background load may have completed in the meantime
+            op_inst = self.cache.get(config)
+        with self._lock:
+            if op_inst is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if config in self.cache:
+                self.cache.move_to_end(config)
+                self._entry_frequency[config] = self._entry_frequency.get(config, 0) + 1
+        return op_inst
+
+    def preload(self, database_path=None, target=None, max_workers=None) -> Future:
+        """
+        Loads the operators of the database in background threads and returns a
+        future resolving to the number of loaded operators. The runtime modules of
+        the entries are deserialized in parallel; `get` blocks only until the entry
+        it looks up is loaded, so that kernel loading overlaps with other work:
+
+            future = global_operator_cache.preload(database_path, target)
+            ...  # load the model weights
+            future.result()
+        """
+        database_path = database_path or BITBLAS_DATABASE_PATH
+        future = Future()
+        index_loaded = threading.Event()
+        with self._lock:
+            self._pending_indexes.add(index_loaded)
+        thread = threading.Thread(
+            target=self._preload,
+            args=(database_path, target, max_workers, future, index_loaded),
+            name="bitblas-cache-preload",
+            daemon=True,
+        )
+        thread.start()
+        return future
+
+    def is_preloading(self):
+        return bool(self._pending or self._pending_indexes)
+
+    def _preload(self, database_path, target, max_workers, future, index_loaded):
+        keys = []
+        try:
+            with self._lock:
+                known_keys = set(self.lazy_entries)
+                self.load_from_database(database_path, target, lazy=True)
+                keys = [key for key in self.lazy_entries if key not in known_keys]
+                futures = {}
+                if keys:
+                    executor = ThreadPoolExecutor(
+                        max_workers=max_workers, thread_name_prefix="bitblas-cache-load")
+                    for key in keys:
+                        futures[key] = executor.submit(self._materialize_lazy_entry, key)
+                    self._pending.update(futures)
+                    executor.shutdown(wait=False)
+                self._pending_indexes.discard(index_loaded)
+            index_loaded.set()
+            num_loaded = 0
+            for key, entry_future in futures.items():
+                try:
+                    num_loaded += entry_future.result() is not None
+                except Exception as error:
+                    logger.warning(f"Failed to preload database entry {key}: {error}")
+            future.set_result(num_loaded)
+        except Exception as error:
+            future.set_exception(error)
+        finally:
+            with self._lock:
+                self._pending_indexes.discard(index_loaded)
+                for key in keys:
+                    self._pending.pop(key, None)
+            index_loaded.set()
+
+    def _wait_pending(self, config):
+        for index_loaded in list(self._pending_indexes):
+            index_loaded.wait()
+        entry_future = self._pending.get(get_config_key(config))
+        if entry_future is not None:
+            try:
+                entry_future.result()
+            except Exception:
+                # failed entries are reported by the preload, `get` falls back to a miss
+                pass
         return self.cache.get(config)
 
     def exists(self, config):
-        return config in self.cache
+        config = self._canonicalize(config)
+        return config in self.cache or get_config_key(config) in self.lazy_entries
 
     def clear(self):
         self.cache.clear()
+        self.lazy_entries.clear()
+        self._canonical_configs.clear()
+        self._entry_origins.clear()
+        self._entry_bytes.clear()
+        self._entry_frequency.clear()
+        self._persisted.clear()
+        self._dirty.clear()
+        self._transient.clear()
 
     def size(self):
-        return len(self.cache)
+        return len(self.cache) + len(self.lazy_entries)
+
+    def memory_usage(self):
+        """Returns the estimated bytes of the in-memory operators."""
+        if self.max_bytes is None:
+            return sum(op_inst.get_memory_footprint() for op_inst in self.cache.values())
+        return sum(self._entry_bytes.values())
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.cache),
+            "lazy_entries": len(self.lazy_entries),
+            "bytes": self.memory_usage(),
+        }
+
+    def evict(self, config: OperatorConfig):
+        with self._lock:
+            config = self._canonicalize(config)
+            op_inst = self.cache.pop(config, None)
+            if op_inst is None:
+                return
+            self._entry_bytes.pop(config, None)
+            self._entry_frequency.pop(config, None)
+            self._canonical_configs.pop(get_config_key(config), None)
+            self._transient.discard(config)
+            for dirty in self._dirty.values():
+                dirty.pop(config, None)
+            origin = self._entry_origins.pop(config, None)
+            if origin is not None:
+                hash_str, entry = origin
+                self.lazy_entries[hash_str] = entry
+        if self.release_on_evict:
+            op_inst.release()
+        self.evictions += 1
+        logger.debug(f"Evicted operator {config} from the operator cache")
+
+    def _is_over_capacity(self):
+        if self.max_entries is not None and len(self.cache) > self.max_entries:
+            return True
+        if self.max_bytes is not None and sum(self._entry_bytes.values()) > self.max_bytes:
+            return True
+        return False
+
+    def _select_victim(self, keep=None):
+        candidates = [config for config in self.cache if config != keep]
+        if not candidates:
+            return None
+        if self.eviction_policy == "lfu":
+            # the candidates are in recency order, min returns the least recent on ties
+            return min(candidates, key=lambda config: self._entry_frequency.get(config, 0))
+        return candidates[0]
+
+    def _evict_if_needed(self, keep=None):
+        while self._is_over_capacity():
+            victim = self._select_victim(keep)
+            if victim is None:
+                break
+            self.evict(victim)
+
+    def find_nearest_hints(self, config: OperatorConfig) -> Optional[List[Dict]]:
+        """
+        Returns the tuned hints of the closest compatible entry, in memory or in the
+        loaded database index. Entries are compatible when they have the same config
+        type and only differ in their shape fields (M, N, K); the closest one minimizes
+        the log2 distance of these shapes. Returns None when there is no such entry.
+        """
+        config_type = type(config).__name__
+        query = asdict(config)
+
+        candidates = []
+        for cached_config, op_inst in self.cache.items():
+            if type(cached_config).__name__ == config_type and op_inst.tuned_hints:
+                candidates.append((asdict(cached_config), op_inst.tuned_hints))
+        for entry in self.lazy_entries.values():
+            if entry["config_type"] == config_type and entry.get("hints"):
+                candidates.append((entry["config"], entry["hints"]))
+
+        best_hints, best_distance = None, None
+        for candidate, hints in candidates:
+            distance = _shape_distance(query, candidate)
+            if distance is None or distance == 0:
+                # incompatible, or the config itself
+                continue
+            if best_distance is None or distance < best_distance:
+                best_hints, best_distance = hints, distance
+        return best_hints
+
+    def dirty_configs(self, database_path, packed=False):
+        """Returns the in-memory configs which have not been written into the database yet."""
+        with self._lock:
+            return list(self._get_dirty(self._get_database_key(database_path, packed)))
+
+    @contextmanager
+    def deferred_flush(self):
+        """
+        Defers `save_into_database` and `save_into_packed_database` calls made within
+        the context, the new entries are written once when the outermost context exits:
+
+            with global_operator_cache.deferred_flush():
+                for layer in layers:
+                    ...  # tune and save_into_database per layer
+        """
+        self._deferred_depth += 1
+        try:
+            yield self
+        finally:
+            self._deferred_depth -= 1
+            if self._deferred_depth == 0:
+                self.flush()
+
+    def flush(self):
+        """Writes the saves deferred by `deferred_flush`."""
+        deferred_saves = self._deferred_saves
+        # the saves deferred to interpreter exit stay pending
+        self._deferred_saves = {
+            database_key: target
+            for database_key, target in deferred_saves.items()
+            if database_key in self._flush_at_exit_keys
+        }
+        for (kind, path), target in deferred_saves.items():
+            if (kind, path) in self._flush_at_exit_keys:
+                continue
+            if kind == "packed":
+                self.save_into_packed_database(path, target)
+            else:
+                self.save_into_database(path, target)
+
+    def enable_flush_at_exit(self, database_path=None, target=None):
+        """
+        Defers saves into `database_path` to interpreter exit, the saves into other
+        databases are not affected.
+        """
+        database_path = database_path or BITBLAS_DATABASE_PATH
+        database_key = self._get_database_key(database_path)
+        self._flush_at_exit_keys.add(database_key)
+        self._deferred_saves[database_key] = target
+        if not self._flush_at_exit_registered:
+            self._flush_at_exit_registered = True
+            atexit.register(self._flush_at_exit)
+
+    def _flush_at_exit(self):
+        self._deferred_depth = 0
+        self._flush_at_exit_keys.clear()
+        self.flush()
+
+    def _defer_save(self, database_key, target) -> bool:
+        """Records the save into the database when it is deferred, see `deferred_flush`."""
+        if self._deferred_depth > 0 or database_key in self._flush_at_exit_keys:
+            self._deferred_saves[database_key] = target
+            return True
+        return False
 
     def save_into_database(self, database_path=None, target=None):
+        """
+        Writes the operators which are new since the last save into the database.
+        Only dirty entries are visited, so saving after every tuned operator costs
+        time proportional to the new operators only.
+        """
         database_path = self._ensure_database_path(database_path)
-        for config, op_inst in self.cache.items():
+        database_key = self._get_database_key(database_path)
+        if self._defer_save(database_key, target):
+            return
+        index_updates = {}
+        indexed = {}
+        for config in self.dirty_configs(database_path):
+            op_inst = self.cache[config]
             arch_str = self._determine_arch_str(op_inst, target)
             arch_path = os.path.join(database_path, arch_str)
             self._ensure_directory(arch_path)
-            hash_str = sha256(repr(config).encode()).hexdigest()
+            hash_str = get_database_key(config, arch_str)
             config_path = os.path.join(arch_path, hash_str)
             # if the config already exists, skip saving
-            if os.path.exists(config_path):
+            if not os.path.exists(config_path):
+                self._publish_entry(config, op_inst, arch_path, config_path)
+            if arch_path not in indexed:
+                indexed[arch_path] = self._read_index(arch_path) or {}
+            # also indexes the entries published by a writer which crashed before indexing
+            if hash_str not in indexed[arch_path]:
+                index_updates.setdefault(arch_path, {})[hash_str] = self._make_index_entry(
+                    hash_str, config, op_inst, arch_str)
+            self._mark_persisted(database_key, config)
+        for arch_path, entries in index_updates.items():
+            with file_lock(os.path.join(arch_path, LOCK_FILE_NAME)):
+                self._update_index(arch_path, entries)
+
+    @contextmanager
+    def entry_lock(self, config: OperatorConfig, database_path, target):
+        """
+        Holds an inter-process lock for the database entry of a config, so that
+        concurrent processes (e.g. tensor-parallel ranks) tune each config once:
+
+            with cache.entry_lock(config, database_path, target):
+                cache.load_from_database(database_path, target)
+                if not cache.exists(config):
+                    ...  # tune, add and save_into_database
+        """
+        arch_str = self._determine_target_arch_str(target)
+        arch_path = os.path.join(database_path, arch_str)
+        self._ensure_directory(arch_path)
+        with file_lock(os.path.join(arch_path, f"{get_database_key(config, arch_str)}.lock")):
+            yield
+
+    def _publish_entry(self, config, op_inst, arch_path, config_path):
+        """
+        Writes the entry into a temporary directory next to its final location and
+        renames it into place, so readers never observe a partially written entry.
+        """
+        tmp_path = tempfile.mkdtemp(prefix=TMP_ENTRY_PREFIX, dir=arch_path)
+        # mkdtemp creates the directory private to the user
+        os.chmod(tmp_path, 0o755)
+        try:
+            self._save_operator_config_and_artifact(config, op_inst, tmp_path)
+            os.rename(tmp_path, config_path)
+        except OSError:
+            # another process has published the same entry in the meantime
+            if not os.path.exists(config_path):
+                raise
+            logger.debug(f"Database entry {config_path} was published by another process")
+            return False
+        finally:
+            if os.path.exists(tmp_path):
+                shutil.rmtree(tmp_path, ignore_errors=True)
+        return True
+
+    def save_into_packed_database(self, packed_path, target=None):
+        """Appends the new in-memory operators to a single-file packed database."""
+        database_key = self._get_database_key(packed_path, packed=True)
+        if self._defer_save(database_key, target):
+            return
+        packed = self._get_packed_database(packed_path)
+        for config in self.dirty_configs(packed_path, packed=True):
+            op_inst = self.cache[config]
+            arch_str = self._determine_arch_str(op_inst, target)
+            hash_str = get_database_key(config, arch_str)
+            if not packed.contains(arch_str, hash_str):
+                entry_dir = tempfile.mkdtemp()
+                try:
+                    self._save_operator_config_and_artifact(config, op_inst, entry_dir)
+                    packed.write_entry(arch_str, hash_str,
+                                       self._make_index_entry(hash_str, config, op_inst,
+                                                              arch_str),
+                                       entry_dir)
+                finally:
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+            self._mark_persisted(database_key, config)
+
+    def load_from_packed_database(self, packed_path, target=None, lazy=True):
+        if not os.path.isfile(packed_path):
+            logger.info(
+                f"Packed database {packed_path} does not exist, skipping loading operators from the database"
+            )
+            return
+        arch_str = self._determine_target_arch_str(target)
+        packed = self._get_packed_database(packed_path)
+        for entry in packed.read_index(arch_str).values():
+            key = self._get_entry_lookup_key(entry)
+            if key is None or key in self.lazy_entries:
                 continue
-            self._ensure_directory(config_path)
-            self._save_operator_config_and_artifact(config, op_inst, config_path)
+            self.lazy_entries[key] = {
+                **entry,
+                "packed": (packed_path, arch_str),
+                "database": self._get_database_key(packed_path, packed=True),
+                "target": target,
+            }
+        if not lazy:
+            for key in list(self.lazy_entries.keys()):
+                self._materialize_lazy_entry(key)
 
-    def load_from_database(self, database_path, target=None):
+    def load_from_database(self, database_path, target=None, lazy=True):
+        """
+        Registers the operators stored in the database for the given target.
+
+        With lazy loading (the default) only the index of the database is read,
+        the runtime module of an operator is loaded and the operator is
+        instantiated on its first lookup through `get`. `database_path` can
+        either be a database directory or a packed database file.
+        """
+        if os.path.isfile(database_path):
+            return self.load_from_packed_database(database_path, target, lazy=lazy)
         if not os.path.exists(database_path):
             logger.info(
                 f"Database path {database_path} does not exist, skipping loading operators from the database"
@@ -67,7 +575,71 @@ class OperatorCache:
                 f"Target {arch_str} does not exist in the database, skipping loading operators from the database"
             )
             return
-        self._load_operators_from_arch_path(arch_path, target)
+        self._load_operators_from_arch_path(
+            arch_path, target, lazy=lazy, database_key=self._get_database_key(database_path))
+
+    def _get_database_key(self, path, packed=False):
+        return ("packed" if packed else "directory", os.path.abspath(path))
+
+    def _get_dirty(self, database_key):
+        dirty = self._dirty.get(database_key)
+        if dirty is None:
+            persisted = self._persisted.get(database_key, set())
+            dirty = {
+                config: None
+                for config in self.cache
+                if config not in persisted and config not in self._transient
+            }
+            self._dirty[database_key] = dirty
+        return dirty
+
+    def _mark_dirty(self, config):
+        for persisted in self._persisted.values():
+            persisted.discard(config)
+        for dirty in self._dirty.values():
+            dirty[config] = None
+
+    def _mark_persisted(self, database_key, config):
+        self._persisted.setdefault(database_key, set()).add(config)
+        if database_key in self._dirty:
+            self._dirty[database_key].pop(config, None)
+
+    def _get_packed_database(self, packed_path):
+        packed_path = os.path.abspath(packed_path)
+        if packed_path not in self.packed_databases:
+            self.packed_databases[packed_path] = PackedDatabase(packed_path)
+        return self.packed_databases[packed_path]
+
+    def _canonicalize(self, config, record=False):
+        """
+        Returns the config instance the cache stores for configs equal to `config`.
+        With `record` (when the config is cached), `config` becomes that instance if
+        there is none yet; lookups record nothing, so misses do not grow the map.
+        """
+        if config in self.cache:
+            return config
+        key = get_config_key(config)
+        if record:
+            return self._canonical_configs.setdefault(key, config)
+        return self._canonical_configs.get(key, config)
+
+    def _get_entry_lookup_key(self, entry):
+        """
+        Returns the canonical key an index entry is registered under, or None when
+        the entry was written by other BitBLAS/TVM versions or an unknown key version.
+        Legacy entries (keyed by the hash of the config repr) carry no key version,
+        their config is reconstructed to compute the canonical key.
+        """
+        if "key_version" in entry:
+            if entry["key_version"] != KEY_VERSION or entry.get("versions") != get_version_info():
+                return None
+            return entry["config_key"]
+        try:
+            config_cls = getattr(bitblas, entry["config_type"])
+            return get_config_key(config_cls(**entry["config"]))
+        except Exception as error:
+            logger.debug(f"Skipping legacy database entry {entry['path']}: {error}")
+            return None
 
     def _ensure_database_path(self, database_path):
         if database_path is None:
@@ -91,8 +663,13 @@ class OperatorCache:
         except Exception as e:
             # library does not support export_library
             export_error = e  # noqa: F841
-            pass
+            # modules restored from the compile cache keep their exported artifact
+            if op_inst.rt_mod_path is not None:
+                shutil.copyfile(op_inst.rt_mod_path, artifact_path)
         json_data = {"config_type": config_type, "operator_type": operator_type}
+        # the best hints are kept so that similar configs can start tuning from them
+        with open(os.path.join(config_path, HINTS_FILE_NAME), "w") as hints_file:
+            json.dump(op_inst.tuned_hints, hints_file)
         json_file_path = os.path.join(config_path, "mapping.json")
         with open(json_file_path, "w") as json_file:
             json.dump(json_data, json_file)
@@ -107,7 +684,7 @@ class OperatorCache:
         with open(optimized_file_path, "w") as optimized_file:
             if op_inst.optimized_func is not None:
                 optimized_file.write(op_inst.optimized_func.script(show_meta=False))
-        if op_inst.wrapper.lib_name is not None:
+        if op_inst.wrapper is not None and op_inst.wrapper.lib_name is not None:
             # copy lib name to the same directory as the artifact
             src_name = op_inst.wrapper.src_name
             shutil.copy(
@@ -123,52 +700,257 @@ class OperatorCache:
     def _determine_target_arch_str(self, target):
         return (target if isinstance(target, str) else "-".join(list(target.keys) + [target.arch]))
 
-    def _load_operators_from_arch_path(self, arch_path, target):
-        for root, dirs, _ in os.walk(arch_path):
-            for directory in dirs:
-                config_path = os.path.join(root, directory)
-                self._load_operator(config_path, target)
+    def _make_index_entry(self, hash_str, config, op_inst, arch_str):
+        return {
+            "path": hash_str,
+            "config_type": type(config).__name__,
+            "operator_type": type(op_inst).__name__,
+            "config": asdict(config),
+            "hints": op_inst.tuned_hints,
+            "config_key": get_config_key(config),
+            "key_version": KEY_VERSION,
+            "versions": get_version_info(),
+            "arch": arch_str,
+        }
+
+    def _read_index(self, arch_path):
+        index_path = os.path.join(arch_path, INDEX_FILE_NAME)
+        if not os.path.exists(index_path):
+            return None
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to read database index {index_path}: {e}")
+            return None
+        # replay the entries appended since the index was written
+        journal_path = os.path.join(arch_path, INDEX_JOURNAL_NAME)
+        if os.path.exists(journal_path):
+            with open(journal_path) as f:
+                for line in f:
+                    try:
+                        index.update(json.loads(line))
+                    except ValueError:
+                        # a torn trailing line of a crashed writer
+                        continue
+        # drop entries whose directory has been removed
+        return {
+            hash_str: entry
+            for hash_str, entry in index.items()
+            if os.path.isdir(os.path.join(arch_path, entry["path"]))
+        }
+
+    def _update_index(self, arch_path, entries):
+        index_path = os.path.join(arch_path, INDEX_FILE_NAME)
+        journal_path = os.path.join(arch_path, INDEX_JOURNAL_NAME)
+        if os.path.exists(index_path):
+            # append to the journal instead of rewriting the whole index
+            with open(journal_path, "a") as f:
+                f.write(json.dumps(entries) + "\n")
+            if os.path.getsize(journal_path) <= INDEX_JOURNAL_MAX_BYTES:
+                return
+            # compact the journal into the index, replaying it is idempotent should
+            # the removal of the journal not happen
+            index = self._read_index(arch_path)
+            if index is None:
+                return
+        else:
+            # databases written before the index existed, pick up their entries as well
+            index = self._scan_arch_path(arch_path)
+            index.update(entries)
+        self._write_index(arch_path, index)
+        if os.path.exists(journal_path):
+            os.remove(journal_path)
+
+    def _write_index(self, arch_path, index):
+        # write to a temporary file and replace the index atomically
+        fd, tmp_index_path = tempfile.mkstemp(prefix=TMP_ENTRY_PREFIX, dir=arch_path)
+        with os.fdopen(fd, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_index_path, os.path.join(arch_path, INDEX_FILE_NAME))
+
+    def _scan_arch_path(self, arch_path):
+        """Builds the index of an arch path from the json files of its entries."""
+        index = {}
+        for directory in os.listdir(arch_path):
+            config_path = os.path.join(arch_path, directory)
+            if directory.startswith(TMP_ENTRY_PREFIX) or not os.path.isdir(config_path):
+                continue
+            mapping, config = self._read_entry_metadata(config_path)
+            if mapping is None or config is None:
+                continue
+            hints = []
+            hints_path = os.path.join(config_path, HINTS_FILE_NAME)
+            if os.path.exists(hints_path):
+                with open(hints_path) as f:
+                    hints = json.load(f)
+            index[directory] = {"path": directory, **mapping, "config": config, "hints": hints}
+        return index
+
+    def _read_entry_metadata(self, config_path):
+        mapping, config = None, None
+        for file in os.listdir(config_path):
+            full_path = os.path.join(config_path, file)
+            if file == "mapping.json":
+                with open(full_path) as f:
+                    mapping = json.load(f)
+            elif file == HINTS_FILE_NAME:
+                continue
+            elif file.endswith(".json"):
+                with open(full_path) as f:
+                    config = json.load(f)
+        return mapping, config
+
+    def _load_operators_from_arch_path(self, arch_path, target, lazy=True, database_key=None):
+        index = self._read_index(arch_path)
+        if index is None:
+            index = self._scan_arch_path(arch_path)
+        for entry in index.values():
+            key = self._get_entry_lookup_key(entry)
+            if key is None or key in self.lazy_entries:
+                continue
+            self.lazy_entries[key] = {
+                **entry,
+                "path": os.path.join(arch_path, entry["path"]),
+                "database": database_key,
+                "target": target,
+            }
+        if not lazy:
+            for key in list(self.lazy_entries.keys()):
+                self._materialize_lazy_entry(key)
+
+    def _load_lazy_entry(self, config):
+        key = get_config_key(config)
+        if key not in self.lazy_entries:
+            return None
+        return self._materialize_lazy_entry(key)
+
+    def _materialize_lazy_entry(self, key):
+        with self._lock:
+            # popped under the lock so that each entry is deserialized once
+            entry = self.lazy_entries.pop(key, None)
+        if entry is None:
+            return None
+        config_cls = getattr(bitblas, entry["config_type"])
+        config = self._canonicalize(config_cls(**entry["config"]))
+        # the operator may have been registered in memory after the index was loaded
+        if config in self.cache:
+            return self.cache[config]
+        if "packed" in entry:
+            packed_path, arch_str = entry["packed"]
+            config_path = self._get_packed_database(packed_path).extract_entry(
+                arch_str, entry["path"])
+        else:
+            config_path = entry["path"]
+        op_inst = self._load_operator(config_path, entry["target"])
+        if op_inst is None:
+            # dropped, so that the lookups of the config do not load the broken entry again
+            logger.warning(f"Failed to load the database entry of {config}, it is ignored")
+            return None
+        with self._lock:
+            if config in self.cache:
+                self._entry_origins[config] = (key, entry)
+                # loaded operators are already stored in their database
+                self._mark_persisted(entry.get("database"), config)
+            else:
+                self.lazy_entries[key] = entry
+        return op_inst
 
     def _load_operator(self, config_path, target):
+        if not os.path.isdir(config_path):
+            logger.warning(f"Database entry {config_path} does not exist, skipping")
+            return None
         mapping, config, rt_mod, src_name, lib_name = None, None, None, None, None
+        hints = []
         for file in os.listdir(config_path):
             full_path = os.path.join(config_path, file)
             if file == "mapping.json":
                 with open(full_path) as f:
                     mapping = json.load(f)
+            elif file == HINTS_FILE_NAME:
+                with open(full_path) as f:
+                    hints = json.load(f)
             elif file.endswith(".json"):
                 with open(full_path) as f:
                     config = json.load(f)
             elif file.endswith(".tar"):
-                rt_mod = tvm.runtime.load_module(full_path)
+                try:
+                    rt_mod = tvm.runtime.load_module(full_path)
+                except Exception as e:
+                    logger.warning(f"Skipping incomplete database entry {config_path}: {e}")
+                    return None
             elif file == "wrapper_compiled.so":
                 lib_name = full_path
             elif file == "wrapper_source.cu":
                 src_name = full_path
 
         if mapping and config and rt_mod:
-            self._instantiate_and_add_operator(mapping, config, rt_mod, src_name, lib_name, target)
+            return self._instantiate_and_add_operator(mapping, config, rt_mod, src_name, lib_name,
+                                                      target, hints)
+        return None
 
-    def _instantiate_and_add_operator(self, mapping, config, rt_mod, src_name, lib_name, target):
+    def _instantiate_and_add_operator(self,
+                                      mapping,
+                                      config,
+                                      rt_mod,
+                                      src_name,
+                                      lib_name,
+                                      target,
+                                      hints=None):
         config_cls = getattr(bitblas, mapping["config_type"])
         operator_cls = getattr(bitblas, mapping["operator_type"])
         op_inst = operator_cls(
             config=config_cls(**config), target=target, enable_tuning=False, from_database=True)
         op_inst.update_runtime_module(rt_mod, src_name=src_name, lib_name=lib_name)
+        op_inst.tuned_hints = hints or []
         self.add(config_cls(**config), op_inst)
+        return op_inst
+
+
+def _shape_distance(query: Dict, candidate: Dict) -> Optional[float]:
+    """log2 distance between the shape fields of two configs, None if they are incompatible."""
+
+    def normalize(value):
+        # json turns tuples into lists
+        return list(value) if isinstance(value, (list, tuple)) else value
+
+    distance = 0.0
+    for field, value in query.items():
+        other = candidate.get(field)
+        if field not in SHAPE_FIELDS:
+            if normalize(value) != normalize(other):
+                return None
+            continue
+        if isinstance(value, (list, tuple)) or isinstance(other, (list, tuple)):
+            # dynamic shapes have to share the same buckets
+            if normalize(value) != normalize(other):
+                return None
+            continue
+        if not isinstance(value, int) or not isinstance(other, int) or value <= 0 or other <= 0:
+            return None
+        distance += abs(math.log2(value) - math.log2(other))
+    return distance
 
 
 global_operator_cache = OperatorCache()
 
 
-def load_global_ops_cache(database_path=BITBLAS_DATABASE_PATH, target=None):
+def load_global_ops_cache(database_path=BITBLAS_DATABASE_PATH, target=None, lazy=True):
     if target is None:
         target = bitblas.auto_detect_nvidia_target()
     logger.info(f"Loading operators from database {database_path} for target {target}")
-    global_operator_cache.load_from_database(database_path, target)
+    global_operator_cache.load_from_database(database_path, target, lazy=lazy)
     return global_operator_cache
 
 
+def load_global_ops_cache_async(database_path=BITBLAS_DATABASE_PATH, target=None, max_workers=None):
+    """Preloads the database into the global cache in the background."""
+    if target is None:
+        target = bitblas.auto_detect_nvidia_target()
+    logger.info(f"Preloading operators from database {database_path} for target {target}")
+    return global_operator_cache.preload(database_path, target, max_workers=max_workers)
+
+
 def get_database_path():
     return BITBLAS_DATABASE_PATH
 
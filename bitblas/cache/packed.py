@@ -0,0 +1,221 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""Single-file (SQLite) storage for the operator database."""
+import os
+import json
+import atexit
+import shutil
+import sqlite3
+import tempfile
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# let sqlite serve reads from a memory mapping of the database file
+MMAP_SIZE = 1 << 34
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    arch TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    config_type TEXT NOT NULL,
+    operator_type TEXT NOT NULL,
+    config TEXT NOT NULL,
+    hints TEXT NOT NULL DEFAULT '[]',
+    key_info TEXT NOT NULL DEFAULT '{}',
+    PRIMARY KEY (arch, hash)
+);
+CREATE TABLE IF NOT EXISTS files (
+    arch TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    name TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (arch, hash, name)
+);
+"""
+
+# the fields of an index entry describing its key, stored in the key_info column
+_KEY_FIELDS = ("config_key", "key_version", "versions", "arch")
+
+
+class PackedDatabase:
+    """
+    Stores every entry of the operator database (the files of an entry directory:
+    config json, mapping.json, tvm_rt_mod.tar, sources and the wrapper library)
+    as rows of a single SQLite file.
+
+    Reads go through sqlite's memory mapped I/O. Since `tvm.runtime.load_module`
+    and ctypes need files on disk, `extract_entry` materializes one entry into a
+    process local directory on demand.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._extract_root: Optional[str] = None
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        # WAL allows concurrent readers while another process appends entries
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(entries)")]
+        if "key_info" not in columns:
+            # databases written before canonical keys, their entries are legacy ones
+            with self.conn:
+                self.conn.execute(
+                    "ALTER TABLE entries ADD COLUMN key_info TEXT NOT NULL DEFAULT '{}'")
+
+    def close(self):
+        self.conn.close()
+        if self._extract_root is not None:
+            shutil.rmtree(self._extract_root, ignore_errors=True)
+            self._extract_root = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def contains(self, arch: str, hash_str: str) -> bool:
+        row = self.conn.execute("SELECT 1 FROM entries WHERE arch = ? AND hash = ?",
+                                (arch, hash_str)).fetchone()
+        return row is not None
+
+    def list_archs(self) -> List[str]:
+        return [row[0] for row in self.conn.execute("SELECT DISTINCT arch FROM entries")]
+
+    def read_index(self, arch: str) -> Dict[str, Dict]:
+        index = {}
+        for hash_str, config_type, operator_type, config, hints, key_info in self.conn.execute(
+                "SELECT hash, config_type, operator_type, config, hints, key_info FROM entries"
+                " WHERE arch = ?", (arch,)):
+            index[hash_str] = {
+                "path": hash_str,
+                "config_type": config_type,
+                "operator_type": operator_type,
+                "config": json.loads(config),
+                "hints": json.loads(hints),
+                **json.loads(key_info),
+            }
+        return index
+
+    def write_entry(self, arch: str, hash_str: str, index_entry: Dict, entry_dir: str) -> bool:
+        """
+        Packs the files of `entry_dir` into the database in one transaction. Returns
+        False, writing nothing, when the entry exists already, e.g. when written
+        concurrently by another process.
+        """
+        files = []
+        for name in os.listdir(entry_dir):
+            full_path = os.path.join(entry_dir, name)
+            if os.path.isfile(full_path):
+                with open(full_path, "rb") as f:
+                    files.append((arch, hash_str, name, sqlite3.Binary(f.read())))
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO entries"
+                " (arch, hash, config_type, operator_type, config, hints, key_info)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    arch,
+                    hash_str,
+                    index_entry["config_type"],
+                    index_entry["operator_type"],
+                    json.dumps(index_entry["config"]),
+                    json.dumps(index_entry.get("hints", [])),
+                    json.dumps({
+                        field: index_entry[field] for field in _KEY_FIELDS if field in index_entry
+                    }),
+                ),
+            )
+            if cursor.rowcount == 0:
+                return False
+            self.conn.executemany(
+                "INSERT INTO files (arch, hash, name, data) VALUES (?, ?, ?, ?)", files)
+        return True
+
+    def extract_entry(self, arch: str, hash_str: str, directory: Optional[str] = None) -> str:
+        """
+        Writes the files of an entry into `directory` and returns its path. Raises
+        KeyError if the database has no such entry.
+        """
+        if not self.contains(arch, hash_str):
+            raise KeyError(f"No entry {hash_str} for {arch} in packed database {self.path}")
+        if directory is None:
+            directory = os.path.join(self._get_extract_root(), arch, hash_str)
+        if os.path.isdir(directory):
+            return directory
+        parent = os.path.dirname(directory)
+        os.makedirs(parent, exist_ok=True)
+        tmp_directory = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+        os.chmod(tmp_directory, 0o755)
+        for name, data in self.conn.execute(
+                "SELECT name, data FROM files WHERE arch = ? AND hash = ?", (arch, hash_str)):
+            with open(os.path.join(tmp_directory, name), "wb") as f:
+                f.write(data)
+        try:
+            os.rename(tmp_directory, directory)
+        except OSError:
+            # extracted concurrently by another thread or process
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+            if not os.path.isdir(directory):
+                raise
+        return directory
+
+    def _get_extract_root(self) -> str:
+        if self._extract_root is None:
+            self._extract_root = tempfile.mkdtemp(prefix="bitblas_packed_")
+            atexit.register(shutil.rmtree, self._extract_root, True)
+        return self._extract_root
+
+
+def export_to_directory(packed_path: str, database_path: str) -> int:
+    """Unpacks a packed database into the directory layout, returns the number of new entries."""
+    # imported lazily as the operator cache depends on this module
+    from .operator import LOCK_FILE_NAME, OperatorCache, file_lock
+
+    updater = OperatorCache()
+    num_exported = 0
+    with PackedDatabase(packed_path) as packed:
+        for arch in packed.list_archs():
+            arch_path = os.path.join(database_path, arch)
+            os.makedirs(arch_path, exist_ok=True)
+            index = packed.read_index(arch)
+            for hash_str in index:
+                if os.path.exists(os.path.join(arch_path, hash_str)):
+                    continue
+                # published atomically, see extract_entry
+                packed.extract_entry(arch, hash_str, os.path.join(arch_path, hash_str))
+                num_exported += 1
+            # the same locked, atomic index update as the saves of the operator cache
+            with file_lock(os.path.join(arch_path, LOCK_FILE_NAME)):
+                updater._update_index(arch_path, index)
+    return num_exported
+
+
+def import_from_directory(database_path: str, packed_path: str) -> int:
+    """Packs the entries of a directory database into `packed_path`, returns the number of new entries."""
+    # imported lazily as the operator cache depends on this module
+    from .operator import OperatorCache
+
+    scanner = OperatorCache()
+    num_imported = 0
+    with PackedDatabase(packed_path) as packed:
+        for arch in os.listdir(database_path):
+            arch_path = os.path.join(database_path, arch)
+            if not os.path.isdir(arch_path):
+                continue
+            index = scanner._read_index(arch_path)
+            if index is None:
+                index = scanner._scan_arch_path(arch_path)
+            for hash_str, entry in index.items():
+                entry_dir = os.path.join(arch_path, entry["path"])
+                if packed.write_entry(arch, hash_str, entry, entry_dir):
+                    num_imported += 1
+    return num_imported
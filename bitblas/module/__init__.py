@@ -3,6 +3,8 @@
 
 import ctypes
 import operator
+from collections import Counter
+from dataclasses import replace
 from functools import reduce
 from logging import getLogger
 
@@ -11,12 +13,14 @@ import torch.nn as nn
 
 logger = getLogger(__name__)
 
-from typing import List, Union, Optional
+from typing import Dict, List, Union, Optional
 
 from bitblas.cache import global_operator_cache, get_database_path
 from bitblas import Matmul, MatmulConfig
 from bitblas.quantization.utils import general_compress
 from bitblas import auto_detect_nvidia_target
+from bitblas.base.budget import TuningBudget
+from bitblas.base.buckets import select_buckets
 
 BITBLAS_TARGET = auto_detect_nvidia_target()
 BITBLAS_DATABASE_PATH = get_database_path()
@@ -42,6 +46,15 @@ def unpack_qzeros(qzeros, bits):
 
 class Linear(nn.Module):
     opt_M = [1, 16, 32, 64, 128, 256, 512]
+    # how to use the tuned kernels of similar configs on a cache miss:
+    # "seed" tries them ahead of the policy's candidates, "fast" only builds them,
+    # None always tunes from scratch.
+    warm_start: Optional[str] = "seed"
+    # count the M of every forward call in `m_histogram`, for `retune_from_histogram`
+    record_m: bool = False
+    # bound the tuning of an operator on a cache miss, the best kernel so far is kept
+    max_tuning_seconds: Optional[float] = None
+    max_tuning_builds: Optional[int] = None
     STORAGE_DTYPE = "int8"  # assume int8 storage
     TORCH_STORAGE_DTYPE = getattr(torch, STORAGE_DTYPE)
     BITBLAS_DTYPES = {
@@ -66,6 +79,7 @@ class Linear(nn.Module):
         with_zeros: bool = False,
         zeros_mode: str = None,
         opt_M: Union[int, List[int]] = opt_M,
+        m_histogram: Optional[Dict[int, int]] = None,
         # performance related configs
         enable_tuning: bool = True,
         fast_decoding: Optional[bool] = None,
@@ -75,11 +89,17 @@ class Linear(nn.Module):
         @opt_M: optimize range of the input shape for dynamic symbolic
         if the input shape is a range, we will optimize the matmul with dynamic symbolic.
         if the input shape is int, we will optimize the matmul with static symbolic.
+        @m_histogram: observed input shapes, mapping M to its number of calls.
+        if given with a range, the buckets are selected from it (at most as many as
+        the range has) instead of using the range itself.
         """
         super().__init__()
 
         self.in_features = in_features
         self.out_features = out_features
+        self.m_histogram = Counter(m_histogram or {})
+        if m_histogram and not isinstance(opt_M, int):
+            opt_M = select_buckets(m_histogram, max_buckets=len(opt_M))
         self.opt_M = opt_M
         self.group_size = self._set_group_size(group_size, in_features)
         self.torch_dtype = getattr(torch, A_dtype)
@@ -206,28 +226,77 @@ class Linear(nn.Module):
         self.source_format = self.bitblas_matmul.source_format
 
     def _get_or_create_bitblas_operator(self, config, enable_tuning):
-        if global_operator_cache.size() == 0:
+        # a background preload (load_global_ops_cache_async) is waited on by `get`
+        if global_operator_cache.size() == 0 and not global_operator_cache.is_preloading():
             global_operator_cache.load_from_database(BITBLAS_DATABASE_PATH, BITBLAS_TARGET)
             logger.info(f"Loaded {global_operator_cache.size()} operators from database.")
 
         bitblas_matmul = global_operator_cache.get(config)
-        if bitblas_matmul is None:
+        if bitblas_matmul is None and enable_tuning:
+            # other processes may tune the same config concurrently, hold the entry lock
+            # and re-check the database so that the config is only tuned once.
+            with global_operator_cache.entry_lock(config, BITBLAS_DATABASE_PATH, BITBLAS_TARGET):
+                global_operator_cache.load_from_database(BITBLAS_DATABASE_PATH, BITBLAS_TARGET)
+                bitblas_matmul = global_operator_cache.get(config)
+                if bitblas_matmul is None:
+                    bitblas_matmul = self._tune_bitblas_operator(config)
+        elif bitblas_matmul is None:
             # should disable tuning for the first time because we may require loading bitblas operator from database.
             bitblas_matmul = Matmul(config, target=BITBLAS_TARGET, enable_tuning=False)
-            if enable_tuning:
-                bitblas_matmul.hardware_aware_finetune(topk=20)
-                global_operator_cache.add(config, bitblas_matmul)
-                global_operator_cache.save_into_database(BITBLAS_DATABASE_PATH, BITBLAS_TARGET)
-                print("BitBLAS Tuning done, appended operator to global_operator_cache.")
-            else:
-                print("BitBLAS Operator created.")
+            print("BitBLAS Operator created.")
         else:
             print("BitBLAS Operator found in global_operator_cache.")
         return bitblas_matmul
 
+    def _tune_bitblas_operator(self, config):
+        bitblas_matmul = Matmul(config, target=BITBLAS_TARGET, enable_tuning=False)
+        # start from the kernel of the closest tuned config, e.g. a different N or K
+        seed_hints = None
+        if self.warm_start is not None:
+            seed_hints = global_operator_cache.find_nearest_hints(config)
+        budget = None
+        if self.max_tuning_seconds is not None or self.max_tuning_builds is not None:
+            budget = TuningBudget(self.max_tuning_seconds, self.max_tuning_builds)
+        bitblas_matmul.hardware_aware_finetune(
+            topk=20, seed_hints=seed_hints, seed_only=self.warm_start == "fast", budget=budget)
+        if budget is not None and not budget.is_complete:
+            # a partial tuning is only kept for this run, a later run tunes the config again
+            global_operator_cache.add(config, bitblas_matmul, persist=False)
+            print("BitBLAS Tuning budget exhausted before all candidates were explored, the "
+                  "operator is not saved into the database.")
+            return bitblas_matmul
+        global_operator_cache.add(config, bitblas_matmul)
+        global_operator_cache.save_into_database(BITBLAS_DATABASE_PATH, BITBLAS_TARGET)
+        print("BitBLAS Tuning done, appended operator to global_operator_cache.")
+        return bitblas_matmul
+
     def warmup(self, topk=20):
         self.bitblas_matmul.hardware_aware_finetune(topk=topk)
 
+    def retune_from_histogram(self,
+                              m_histogram: Optional[Dict[int, int]] = None,
+                              max_buckets: Optional[int] = None,
+                              enable_tuning: bool = True):
+        """
+        Selects the buckets of the dynamic range from the observed shapes, by default
+        the ones recorded with `record_m`, and switches to the operator of these
+        buckets, tuning it if it is not in the cache. The weights are kept, as the
+        layout of the weights does not depend on the buckets.
+        """
+        if isinstance(self.opt_M, int):
+            raise ValueError("Buckets can only be selected for a dynamic range of M.")
+        if m_histogram is None:
+            m_histogram = self.m_histogram
+        if max_buckets is None:
+            max_buckets = len(self.opt_M)
+        opt_M = select_buckets(m_histogram, max_buckets=max_buckets)
+        if list(opt_M) == list(self.opt_M):
+            return self.opt_M
+        config = replace(self.bitblas_matmul.config, M=opt_M)
+        self.bitblas_matmul = self._get_or_create_bitblas_operator(config, enable_tuning)
+        self.opt_M = opt_M
+        return self.opt_M
+
     def forward(self, A, output=None):
         if A.dtype != torch.float16:
             A = A.half()
@@ -246,6 +315,8 @@ class Linear(nn.Module):
         if self.bitblas_matmul.dynamic_range is not None:
             m = reduce(operator.mul, A.shape[:-1], 1)
             args.append(m)
+            if self.record_m:
+                self.m_histogram[m] += 1
         args.append(stream_handle)
         # m is the product of the last n - 1 dimensions of A
         self.bitblas_matmul.lib.call(*args)
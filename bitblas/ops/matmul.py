@@ -1,9 +1,7 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 from bitblas import tvm
-import numpy as np
 from tvm.target import Target
-from bitblas.utils.tensor_adapter import tvm_tensor_to_torch
 from typing import List, Union, Optional, Any, Tuple
 from .operator import Operator, TransformKind
 from .impl.matmul_impl import select_implementation
@@ -31,7 +29,7 @@ class TransformExecutorCPU:
     def forward(self, weight):
         inputs = [weight]
         for op in self.operators:
-            inputs.append(tvm_tensor_to_torch(op.get_profile_tensors()[-1]).cpu())
+            inputs.append(op.get_output_tensor())
             inputs = [op.forward(*inputs)]
         return inputs[-1]
 
@@ -193,34 +191,9 @@ class Matmul(Operator):
         return code
 
     def _profile_latency_with_dynamic_range(self) -> List:
-        func = self.prim_func_mod["main"]
-        device = self.arch.device
-
-        def var_warpper(v, m):
-            if isinstance(v, tvm.tir.Var):
-                assert "opt_shapes" in func.attrs
-                assert v.name in func.attrs["opt_shapes"]
-                return m
-            elif isinstance(v, tvm.tir.IntImm):
-                return v.value
-            else:
-                raise RuntimeError("Not supported type: ", type(v))
-
         benchmark_latencies = []
         for m in self.dynamic_range["m"]:
-            profile_tensors = []
-            for param in func.params:
-                if param not in func.buffer_map:
-                    # in case of dynamic symbolic may in params
-                    continue
-                arg = func.buffer_map[param]
-                profile_tensors.append(
-                    tvm.nd.array(
-                        np.random.uniform(0, 1,
-                                          [var_warpper(i, m) for i in arg.shape]).astype(arg.dtype),
-                        device=device,
-                    ))
-            self.profile_tensors = profile_tensors
+            profile_tensors = self.get_profile_tensors({"m": m})
             latency = self.time_evaluator(*profile_tensors).mean * 1e3
             benchmark_latencies.append({"m": m, "latency": latency})
         # ms
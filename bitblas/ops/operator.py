@@ -6,16 +6,22 @@ from tvm import IRModule
 from tvm.target import Target
 from tvm.tir import PrimFunc
 from tvm.contrib.dlpack import to_pytorch_func
+from tvm.contrib.tar import tar
 from tvm._ffi.base import _LIB, raise_last_ffi_error
 from tvm._ffi._ctypes.types import TVMValue, ArgTypeCode
 import bitblas
 import ctypes
+import os
+import tempfile
 from typing import List, Dict, Any, Optional
 import numpy as np
-from ..base import fast_tune, fast_tune_with_dynamic_range
+from ..base import fast_tune
+from ..base.budget import TuningBudget
+from ..base.measure import MeasureOption, measure_latency
+from ..base.tensor_pool import get_profile_tensor_pool, get_torch_dtype
+from ..base.utils import fast_tune_dynamic_buckets, create_dispatch_mod
 from copy import deepcopy
 from bitblas.base.roller.arch import get_arch
-from bitblas.utils.tensor_adapter import tvm_tensor_to_torch
 from bitblas.wrapper import CUDASourceWrapper, CUDASourceWrapperWithDynamic
 from dataclasses import dataclass
 from enum import IntEnum
@@ -50,6 +56,7 @@ class Operator(ABC):
         self.rt_mod = None
         self.time_evaluator = None
         self.profile_tensors = None
+        self.latency_stats: Dict = {}
         self.arch = get_arch(target) if target else None
         self.dynamic_range = None
         self.pass_context: Dict = {}
@@ -62,14 +69,72 @@ class Operator(ABC):
         self.src_name = None
         self.lib_name = None
         self.lib = None
+        # the device source of a runtime module restored from the compile cache
+        self._source: Optional[str] = None
+        # the exported runtime module the current one was loaded from, if any
+        self.rt_mod_path: Optional[str] = None
+        # the temporary directory holding rt_mod_path, removed with the operator
+        self._rt_mod_dir: Optional[tempfile.TemporaryDirectory] = None
+        # serialized best hints of the last tuning, with the opt_shapes they were tuned for
+        self.tuned_hints: List[Dict] = []
 
     def get_source(self, target: Target = None) -> str:
         if target is None:
             target = self.target
         if self.rt_mod is None:
             self._build_runtime_module(target)
+        if self._source is not None:
+            return self._source
         return self.rt_mod.imported_modules[0].get_source() if self.rt_mod else None
 
+    def _get_runtime_module_cache_key(self, compile_cache, target: Target) -> str:
+        return compile_cache.make_key(
+            kind="runtime_module",
+            mod=self.optimized_func.script(),
+            target=str(target),
+            pass_context={
+                "tir.use_async_copy": True,
+                **self.pass_context
+            },
+            # the generated code is rewritten by the post_process of the operator
+            post_process=f"{type(self).__module__}.{type(self).__qualname__}",
+            tvm=getattr(tvm, "__version__", "unknown"),
+        )
+
+    def _load_cached_runtime_module(self, compile_cache, cache_key: str):
+        rt_mod_dir = tempfile.TemporaryDirectory()
+        artifact_path = os.path.join(rt_mod_dir.name, "tvm_rt_mod." + tar.output_format)
+        # the lookup is counted once, on the artifact
+        if not compile_cache.fetch(cache_key, "." + tar.output_format, artifact_path):
+            rt_mod_dir.cleanup()
+            return None, None
+        source = compile_cache.fetch_text(cache_key, ".cu", count=False)
+        if source is None:
+            rt_mod_dir.cleanup()
+            return None, None
+        try:
+            rt_mod = tvm.runtime.load_module(artifact_path)
+        except Exception as e:
+            logger.debug("Failed to load the cached runtime module {}".format(e))
+            rt_mod_dir.cleanup()
+            return None, None
+        # loaded modules can not be exported again, the database copies the artifact,
+        # which is kept as long as the operator
+        self.rt_mod_path = artifact_path
+        self._rt_mod_dir = rt_mod_dir
+        return rt_mod, source
+
+    def _store_cached_runtime_module(self, compile_cache, cache_key: str, rt_mod):
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                artifact_path = os.path.join(tmp_dir, "tvm_rt_mod." + tar.output_format)
+                rt_mod.export_library(artifact_path, fcompile=tar)
+                compile_cache.store(cache_key, "." + tar.output_format, artifact_path)
+            # the source is stored last, lookups start from it
+            compile_cache.store_text(cache_key, ".cu", rt_mod.imported_modules[0].get_source())
+        except Exception as e:
+            logger.debug("Failed to store the runtime module in the compile cache {}".format(e))
+
     def _build_runtime_module(self, target: Target):
         """
         Builds the runtime module based on the architecture platform.
@@ -89,23 +154,36 @@ class Operator(ABC):
 
         # Initialize rt_mod as None to handle cases where build fails or is skipped
         rt_mod = None
+        source = None
 
         # Check if the platform is CUDA and we have an optimized function
         if self.arch.platform == "CUDA":
             if self.optimized_func is None:
                 return None
 
+            # identical kernels (e.g. layers of the same shape) are built once,
+            # imported lazily as bitblas.cache depends on this module
+            from bitblas.cache.compile_cache import get_compile_cache
+            compile_cache = get_compile_cache()
+            cache_key = None
+            if compile_cache is not None:
+                cache_key = self._get_runtime_module_cache_key(compile_cache, target)
+                rt_mod, source = self._load_cached_runtime_module(compile_cache, cache_key)
+
             @tvm.register_func(func_name="tvm_callback_cuda_postproc", override=True)
             def tvm_callback_cuda_postproc(code, _):
                 return self.post_process(code)
 
             try:
                 # Use a specific TVM pass context for CUDA platforms
-                with tvm.transform.PassContext(config={
-                        "tir.use_async_copy": True,
-                        **self.pass_context
-                }):
-                    rt_mod = tvm.build(self.optimized_func, target=target, name=self.name)
+                if rt_mod is None:
+                    with tvm.transform.PassContext(config={
+                            "tir.use_async_copy": True,
+                            **self.pass_context
+                    }):
+                        rt_mod = tvm.build(self.optimized_func, target=target, name=self.name)
+                    if cache_key is not None:
+                        self._store_cached_runtime_module(compile_cache, cache_key, rt_mod)
             except Exception: # noqa: F841
                 logger.debug(
                     "Failed to build optimized function for CUDA target with default schedule, Please consider enable hardware aware tuning!"
@@ -117,6 +195,9 @@ class Operator(ABC):
         # If the runtime module was successfully built, set up for evaluation
         if rt_mod:
             self.rt_mod = rt_mod
+            self._source = source
+            if source is None:
+                self.rt_mod_path = None
             # Initialize a time evaluator with the built module, specifying the device and the number of runs
             self.time_evaluator = rt_mod.time_evaluator(
                 rt_mod.entry_name, self.arch.device, number=10)
@@ -166,22 +247,60 @@ class Operator(ABC):
                           func: PrimFunc,
                           target: Target,
                           topk: int = 20,
-                          parallel_build=True) -> IRModule:
-        _, best = fast_tune(func, target, topk=topk, parallel_build=parallel_build)
+                          parallel_build=True,
+                          seed_hints: Optional[List[Dict]] = None,
+                          seed_only: bool = False,
+                          budget: Optional[TuningBudget] = None) -> IRModule:
+        _, best = fast_tune(
+            func,
+            target,
+            topk=topk,
+            parallel_build=parallel_build,
+            seed_hints=seed_hints,
+            seed_only=seed_only,
+            budget=budget)
         if best is not None:
-            return best.sch.mod
-        self.pass_context = best.config.pass_context
+            return self.apply_tuned_best(best)
         return None
 
+    def apply_tuned_best(self, best) -> IRModule:
+        """Adopts the best compile result of a static shape tuning, returns its module."""
+        self.pass_context = best.config.pass_context
+        self.tuned_hints = [best.config.to_json()]
+        return best.sch.mod
+
+    def apply_tuned_buckets(self, func: PrimFunc, bucket_results) -> IRModule:
+        """Adopts the best result of every bucket of a dynamic range, returns its dispatcher."""
+        self.tuned_hints = [best.config.to_json() for _, best in bucket_results]
+        # a bucket may use the kernel tuned for another one, see `collect_bucket_results`
+        return create_dispatch_mod(func.attrs["global_symbol"], func, [
+            best.sch.mod["main"].with_attr("opt_shapes", shapes) for shapes, best in bucket_results
+        ])
+
     def apply_fast_tuning_with_dynamic_range(
         self,
         func: PrimFunc,
         target: Target,
         topk: int = 20,
         dynamic_range: Dict[str, List[int]] = None,
+        seed_hints: Optional[List[Dict]] = None,
+        seed_only: bool = False,
+        budget: Optional[TuningBudget] = None,
+        parallel_build: bool = True,
     ):
-        optimized_mod = fast_tune_with_dynamic_range(
-            func, target, topk=topk, parallel_build=True, dynamic_range=dynamic_range)
+        tuned = fast_tune_dynamic_buckets(
+            func,
+            target,
+            topk=topk,
+            parallel_build=parallel_build,
+            dynamic_range=dynamic_range,
+            seed_hints=seed_hints,
+            seed_only=seed_only,
+            budget=budget)
+        if tuned is None:
+            return None
+        func, bucket_results = tuned
+        optimized_mod = self.apply_tuned_buckets(func, bucket_results)
         if optimized_mod is not None:
             return optimized_mod
         return None
@@ -189,24 +308,55 @@ class Operator(ABC):
     def hardware_aware_finetune(self,
                                 topk: int = 20,
                                 target: tvm.target.Target = None,
-                                parallel_build=True):
+                                parallel_build=True,
+                                seed_hints: Optional[List[Dict]] = None,
+                                seed_only: bool = False,
+                                budget: Optional[TuningBudget] = None):
+        """
+        Tunes the operator for the target. `seed_hints` are serialized hints
+        (Hint.to_json) of a similar operator, e.g. from
+        `OperatorCache.find_nearest_hints`, which are tried first; with
+        `seed_only` they are the only candidates. With a `budget` (see
+        `TuningBudget`), tuning stops when it is exhausted and the best kernel
+        so far is used, the default schedule if none was measured; the budget
+        reports how much of the candidate space was explored.
+        """
         if target is None:
             target = self.target
         dynamic_range = self.dynamic_range
         func = self.prim_func
         if dynamic_range is not None:
-            self.optimized_func = self.apply_fast_tuning_with_dynamic_range(
-                func, target, topk, dynamic_range)
+            optimized_func = self.apply_fast_tuning_with_dynamic_range(
+                func,
+                target,
+                topk,
+                dynamic_range,
+                seed_hints=seed_hints,
+                seed_only=seed_only,
+                budget=budget,
+                parallel_build=parallel_build)
         else:
-            self.optimized_func = self.apply_fast_tuning(
-                func, target, topk, parallel_build=parallel_build)
+            optimized_func = self.apply_fast_tuning(
+                func,
+                target,
+                topk,
+                parallel_build=parallel_build,
+                seed_hints=seed_hints,
+                seed_only=seed_only,
+                budget=budget)
+        if budget is not None:
+            logger.info(f"Tuning {self.name}: {budget.report()}")
+        if optimized_func is None:
+            # nothing was measured, e.g. the budget ran out, keep the current schedule
+            return
+        self.optimized_func = optimized_func
         self._build_runtime_module(self.target)
 
-    def get_profile_tensors(self, dynamic_symbolic_constrains: Optional[Dict] = None):
+    def _get_profile_specs(self, dynamic_symbolic_constrains: Optional[Dict] = None) -> List:
+        """The (shape, dtype) of the buffer arguments, the dynamic symbols bound to their opt_shapes."""
         if dynamic_symbolic_constrains is None:
             dynamic_symbolic_constrains = {}
         func = self.prim_func
-        device = self.arch.device
 
         def var_warpper(v):
             if isinstance(v, tvm.tir.Var):
@@ -220,38 +370,57 @@ class Operator(ABC):
             else:
                 raise RuntimeError("Not supported type: ", type(v))
 
-        def map_numpy_type(intype):
-            typemap = {
-                'e4m3_float8': 'float8_e4m3fn',
-                'e5m2_float8': 'float8_e5m2',
-            }
-            if intype in typemap:
-                return typemap[intype]
-            else:
-                return intype
-
-        profile_tensors = []
+        specs = []
         for param in func.params:
             if param not in func.buffer_map:
                 # in case of dynamic symbolic may in params
                 continue
             arg = func.buffer_map[param]
-            numpy_dtype = map_numpy_type(arg.dtype)
-            profile_tensors.append(
-                tvm.nd.array(
-                    np.random.uniform(0, 1,
-                                      [var_warpper(i) for i in arg.shape]).astype(numpy_dtype),
-                    device=device,
-                ))
+            specs.append(([var_warpper(i) for i in arg.shape], arg.dtype))
+        return specs
+
+    def get_profile_tensors(self, dynamic_symbolic_constrains: Optional[Dict] = None):
+        """
+        The tensors to profile the operator with, from the profile tensor pool: they
+        are generated once per shape and shared with the other operators.
+        """
+        profile_tensors = get_profile_tensor_pool().get_tensors(
+            self._get_profile_specs(dynamic_symbolic_constrains), self.arch.device)
         self.profile_tensors = profile_tensors
         return profile_tensors
 
-    def profile_latency(self, dynamic_symbolic_constrains: Optional[Dict] = None) -> str:
+    def get_output_tensor(self, dynamic_symbolic_constrains: Optional[Dict] = None):
+        """
+        A new, uninitialized torch tensor on the CPU for the output (the last
+        argument) of the operator, which is returned to the caller and so can not
+        be a shared profile tensor.
+        """
+        import torch
+
+        shape, dtype = self._get_profile_specs(dynamic_symbolic_constrains)[-1]
+        torch_dtype = get_torch_dtype(dtype)
+        if torch_dtype is None:
+            raise ValueError(f"Unsupported output dtype {dtype} of {self.name}")
+        return torch.empty(shape, dtype=torch_dtype)
+
+    def profile_latency(self,
+                        dynamic_symbolic_constrains: Optional[Dict] = None,
+                        measure_option: Optional[MeasureOption] = None) -> str:
+        """
+        Returns the latency in ms: the mean of 10 runs, or with a `measure_option`
+        the median of a robust measurement (see `measure_latency`), whose
+        statistics are kept in `latency_stats`.
+        """
         if dynamic_symbolic_constrains is None:
             dynamic_symbolic_constrains = {}
         profile_tensors = self.get_profile_tensors(dynamic_symbolic_constrains)
-        latency = self.time_evaluator(*profile_tensors).mean * 1e3
-        return latency
+        if measure_option is None:
+            latency = self.time_evaluator(*profile_tensors).mean * 1e3
+            return latency
+        _, self.latency_stats = measure_latency(self.rt_mod, self.arch.device, profile_tensors,
+                                                measure_option,
+                                                getattr(self.arch, "l2_cache_size_bytes", None))
+        return self.latency_stats["median"]
 
     def _tensor_adapter(self, tensor, device):
         import torch
@@ -316,6 +485,8 @@ class Operator(ABC):
 
     def update_runtime_module(self, rt_mod, src_name=None, lib_name=None):
         self.rt_mod = rt_mod
+        self._source = None
+        self.rt_mod_path = None
         self.time_evaluator = rt_mod.time_evaluator(rt_mod.entry_name, self.arch.device, number=10)
         self.function_handle = rt_mod.get_function(rt_mod.entry_name).handle
         self.torch_func = to_pytorch_func(rt_mod)
@@ -326,6 +497,47 @@ class Operator(ABC):
             self.lib = ctypes.CDLL(lib_name)
             self.lib.init()
 
+    def get_memory_footprint(self) -> int:
+        """
+        Estimates the bytes held by the operator: the profile tensors, the workspace,
+        the runtime module and the prebuilt wrapper library.
+        """
+        nbytes = 0
+        for tensor in self.profile_tensors or []:
+            nbytes += int(np.prod(tensor.shape)) * ((tvm.DataType(tensor.dtype).bits + 7) // 8)
+        for attr in ("workspace", "lut"):
+            tensor = getattr(self, attr, None)
+            if tensor is not None:
+                nbytes += tensor.numel() * tensor.element_size()
+        if self.rt_mod is not None:
+            nbytes += sum(len(mod.get_source()) for mod in self.rt_mod.imported_modules)
+        if self.lib_name is not None and os.path.exists(self.lib_name):
+            nbytes += os.path.getsize(self.lib_name)
+        return nbytes
+
+    def release(self):
+        """
+        Releases the runtime module and unloads the prebuilt wrapper library.
+        The operator can not be invoked afterwards.
+        """
+        if self.lib is not None:
+            try:
+                import _ctypes
+                _ctypes.dlclose(self.lib._handle)
+            except (ImportError, AttributeError, OSError) as e:
+                logger.debug("Failed to unload the wrapper library {}".format(e))
+        self.lib = None
+        self.rt_mod = None
+        self._source = None
+        self.rt_mod_path = None
+        self._rt_mod_dir = None
+        self.time_evaluator = None
+        self.function_handle = None
+        self.torch_func = None
+        self.profile_tensors = None
+        if hasattr(self, "workspace"):
+            self.workspace = None
+
     @abstractmethod
     def _select_implementation(self) -> IRModule:
         pass
@@ -354,7 +566,7 @@ class OPExecutorCPU:
     def forward(self, weight):
         inputs = [weight]
         for op in self.operators:
-            inputs.append(tvm_tensor_to_torch(op.get_profile_tensors()[-1]).cpu())
+            inputs.append(op.get_output_tensor())
             inputs = [op.forward(*inputs)]
         return inputs[-1]
 
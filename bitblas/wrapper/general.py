@@ -8,6 +8,7 @@ from tvm.runtime import ndarray
 from bitblas.utils import match_global_kernel
 import re
 import ctypes
+import math
 import os
 import tempfile
 import subprocess
@@ -166,6 +167,21 @@ class CUDASourceWrapper(object):
         ]
         src.write(self.lib_code)
         src.flush()
+        # imported lazily as bitblas.cache depends on the operators using this wrapper
+        from bitblas.cache.compile_cache import get_compile_cache, get_nvcc_version
+        compile_cache = get_compile_cache()
+        cache_key = None
+        if compile_cache is not None:
+            cache_key = compile_cache.make_key(
+                source=self.lib_code,
+                flags=[arg for arg in command if arg not in (src.name, lib_name)],
+                nvcc=get_nvcc_version(),
+                arch=compute_version,
+            )
+            if compile_cache.fetch(cache_key, ".so", lib_name):
+                self.src_name = src.name
+                self.lib_name = lib_name
+                return
         try:
             ret = subprocess.run(command, timeout=timeout)
         except subprocess.TimeoutExpired:
@@ -174,6 +190,11 @@ class CUDASourceWrapper(object):
         if ret.returncode != 0:
             logger.warning(f"Compilation Failed! {command}")
             return None
+        if cache_key is not None:
+            try:
+                compile_cache.store(cache_key, ".so", lib_name)
+            except OSError as e:
+                logger.debug(f"Failed to store the wrapper library in the compile cache: {e}")
         self.src_name = src.name
         self.lib_name = lib_name
 
@@ -195,13 +216,14 @@ class CUDASourceWrapper(object):
                         self.grid_info["xyz".index(tag[-1])] = extent
 
     def get_dynamic_symbolic_set(self, prim_func):
-        # Determine the set of dynamic symbols used in the function
-        dynamic_symbolic_set = set()
+        # Determine the dynamic symbols used in the function, in the order of their first
+        # appearance, which is also the order of the dynamic arguments of the kernels
+        dynamic_symbolic_set = []
         for param in prim_func.params:
             buffer = prim_func.buffer_map[param]
             for dim in buffer.shape:
-                if isinstance(dim, tvm.tir.Var):
-                    dynamic_symbolic_set.add(dim.name)
+                if isinstance(dim, tvm.tir.Var) and dim.name not in dynamic_symbolic_set:
+                    dynamic_symbolic_set.append(dim.name)
         return dynamic_symbolic_set
 
     def get_cuda_init_func(self):
@@ -288,7 +310,8 @@ class CUDASourceWrapper(object):
         smem_str = 0 if self.dynamic_smem_buf is None else self.dynamic_smem_buf
         # Format the CUDA kernel launch string
         if len(dynamic_symbolic_set) != 0:
-            call_str = "if ({} == 0) return; \n\t\t".format(list(dynamic_symbolic_set)[0])
+            call_str = "if ({}) return; \n\t\t".format(" || ".join(
+                f"{dyn_sym} == 0" for dyn_sym in dynamic_symbolic_set))
         else:
             call_str = ""
         call_str += "{}<<<{}, {}, {}, stream>>>({});".format(function_name, grid_str, block_str,
@@ -368,9 +391,11 @@ extern "C" void init() {{
             pattern = r"[,\s]*(?:\w+\s*\*+\s*__restrict__\s+)?(\w+)"
             matches = re.findall(pattern, s)
             call_args = []
+            arg_names = [arg["name"] for arg in function_args]
             for match in matches:
-                match = re.sub(r"\d+", "", match)  # Remove numbers
-                match = re.sub(r"_", "", match)  # Remove underscores
+                if match not in arg_names:
+                    match = re.sub(r"\d+", "", match)  # Remove numbers
+                    match = re.sub(r"_", "", match)  # Remove underscores
                 for arg in function_args:
                     if arg["name"] == match:
                         call_args.append(match)
@@ -387,9 +412,8 @@ extern "C" void init() {{
                 p = int(p)
             return str(p).replace("//", "/")
 
-        last_range = 0
-        num_items = len(function_informations)
-        _call_str = """"""
+        kernel_launches = {}
+        bucket_functions = {}
         for function_name, info in function_informations.items():
             # Prepare block and grid configurations for kernel launches
             block_info, grid_info = info["block_info"], info["grid_info"]
@@ -405,37 +429,40 @@ extern "C" void init() {{
             )
             # Handle dynamic shared memory specification
             smem_str = (0 if info["dynamic_smem_buf"] is None else info["dynamic_smem_buf"])
+            kernel_launches[function_name] = "{}<<<{}, {}, {}, stream>>>({});".format(
+                function_name, grid_str, block_str, smem_str, call_args)
             opt_shapes = info["opt_shapes"]
-            # Generate conditional kernel launch code based on dynamic symbolic ranges
-            (symbolic,) = list(dynamic_symbolic_set)
-            range_str = opt_shapes[symbolic]
-            if last_range == 0:
-                call_str = "if ({} == 0) return; \n".format(symbolic,)
-                call_str += "if ({} <= {}) {{\n\t\t\t {}<<<{}, {}, {}, stream>>>({}); \n\t\t}}\n".format(
-                    symbolic,
-                    range_str,
-                    function_name,
-                    grid_str,
-                    block_str,
-                    smem_str,
-                    call_args,
-                )
-            else:
-                call_str = "\t\telse if ({} <= {}) {{\n\t\t\t {}<<<{}, {}, {}, stream>>>({}); \n\t\t}}\n".format(
-                    symbolic,
-                    range_str,
-                    function_name,
-                    grid_str,
-                    block_str,
-                    smem_str,
-                    call_args,
-                )
-            if last_range == num_items - 1:
-                call_str += (
-                    "\t\telse {{\n\t\t\t {}<<<{}, {}, {}, stream>>>({}); \n\t\t}}\n".format(
-                        function_name, grid_str, block_str, smem_str, call_args))
-            last_range += 1
-            _call_str += call_str
+            bucket_functions[tuple(
+                int(opt_shapes[symbolic]) for symbolic in dynamic_symbolic_set)] = function_name
+
+        # The buckets form a grid over the dynamic symbols, the kernel is selected by a
+        # decision tree with one if/else-if chain over the ranges of each symbol
+        ranges = [
+            sorted({key[axis] for key in bucket_functions})
+            for axis in range(len(dynamic_symbolic_set))
+        ]
+        assert len(bucket_functions) == math.prod(len(axis_ranges) for axis_ranges in ranges), (
+            "The opt_shapes of the kernels should form a grid")
+
+        def dispatch_str(axis, key, indent):
+            if axis == len(dynamic_symbolic_set):
+                return "{}{}\n".format(indent, kernel_launches[bucket_functions[key]])
+            symbolic = dynamic_symbolic_set[axis]
+            call_str = """"""
+            for i, range_str in enumerate(ranges[axis]):
+                condition = "if" if i == 0 else "else if"
+                call_str += "{}{} ({} <= {}) {{\n{}{}}}\n".format(
+                    indent, condition, symbolic, range_str,
+                    dispatch_str(axis + 1, key + (range_str,), indent + "\t"), indent)
+            # Beyond the largest bucket the largest one is used
+            call_str += "{}else {{\n{}{}}}\n".format(
+                indent, dispatch_str(axis + 1, key + (ranges[axis][-1],), indent + "\t"), indent)
+            return call_str
+
+        # Generate conditional kernel launch code based on dynamic symbolic ranges
+        _call_str = "if ({}) return; \n".format(" || ".join(
+            f"{symbolic} == 0" for symbolic in dynamic_symbolic_set))
+        _call_str += dispatch_str(0, (), "\t\t")
 
         # Wrap the kernel dispatch logic in an external C function
         host_func = """
@@ -0,0 +1,86 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import os
+import shutil
+import bitblas
+from bitblas import Matmul, MatmulConfig
+from bitblas.cache import CompileCache, global_compile_cache, set_compile_cache_path
+
+target = bitblas.utils.auto_detect_nvidia_target()
+
+
+def test_compile_cache_store_and_fetch():
+    cache_dir = "/tmp/.tmp_bitblas_compile_cache"
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    cache = CompileCache(cache_dir, max_bytes=None)
+    key = cache.make_key(source="__global__ void main() {}", flags=["-O3"], arch="80")
+    assert key == cache.make_key(arch="80", flags=["-O3"], source="__global__ void main() {}")
+    dst_path = os.path.join(cache_dir, "fetched.so")
+    assert not cache.fetch(key, ".so", dst_path)
+
+    src_path = "/tmp/.tmp_bitblas_compile_cache_artifact.so"
+    with open(src_path, "wb") as f:
+        f.write(b"\0" * 1024)
+    cache.store(key, ".so", src_path)
+    assert cache.fetch(key, ".so", dst_path)
+    with open(dst_path, "rb") as f:
+        assert f.read() == b"\0" * 1024
+    assert cache.hits == 1 and cache.misses == 1
+    # the other artifacts of a lookup are not counted again
+    cache.store_text(key, ".cu", "__global__ void main() {}")
+    assert cache.fetch_text(key, ".cu", count=False) == "__global__ void main() {}"
+    assert cache.fetch_text(cache.make_key(), ".cu", count=False) is None
+    assert cache.hits == 1 and cache.misses == 1
+
+
+def test_compile_cache_eviction():
+    cache_dir = "/tmp/.tmp_bitblas_compile_cache_eviction"
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    cache = CompileCache(cache_dir, max_bytes=2048)
+    src_path = "/tmp/.tmp_bitblas_compile_cache_artifact.so"
+    with open(src_path, "wb") as f:
+        f.write(b"\0" * 1024)
+    keys = [cache.make_key(index=index) for index in range(3)]
+    for key in keys:
+        cache.store(key, ".so", src_path)
+    # the least recently used artifact is evicted
+    assert cache.size() <= 2048
+    assert not cache.fetch(keys[0], ".so", "/tmp/.tmp_bitblas_compile_cache_fetched.so")
+    assert cache.fetch(keys[2], ".so", "/tmp/.tmp_bitblas_compile_cache_fetched.so")
+
+
+def test_compile_cache_tracks_its_size(monkeypatch):
+    cache_dir = "/tmp/.tmp_bitblas_compile_cache_size"
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    cache = CompileCache(cache_dir, max_bytes=1 << 20)
+    src_path = "/tmp/.tmp_bitblas_compile_cache_artifact.so"
+    with open(src_path, "wb") as f:
+        f.write(b"\0" * 1024)
+    scans = []
+    list_artifacts = cache._list_artifacts
+    monkeypatch.setattr(cache, "_list_artifacts", lambda: scans.append(1) or list_artifacts())
+    for index in range(4):
+        cache.store(cache.make_key(index=index), ".so", src_path)
+    # the directory is only scanned on the first store while under the bound
+    assert len(scans) == 1
+    assert cache._size == 4 * 1024 == cache.size()
+
+
+def test_compile_cache_shared_by_identical_operators():
+    cache_dir = "/tmp/.tmp_bitblas_compile_cache_operators"
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    set_compile_cache_path(cache_dir)
+    config = MatmulConfig(M=1, N=1024, K=1024, A_dtype="float16", layout="nt")
+    matmul = Matmul(config=config, target=target, enable_tuning=False)
+    hits, misses = global_compile_cache.hits, global_compile_cache.misses
+    # the runtime module and the wrapper library of the same kernel come from the cache,
+    # each counted as one hit
+    cached_matmul = Matmul(config=config, target=target, enable_tuning=False)
+    assert global_compile_cache.hits == hits + 2
+    assert global_compile_cache.misses == misses
+    assert cached_matmul.get_source() == matmul.get_source()
+    assert cached_matmul.lib is not None
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
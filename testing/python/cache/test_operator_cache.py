@@ -279,6 +279,439 @@ def test_global_cache_save_to_database(
     torch.testing.assert_close(bitblas_output, ref_result, rtol=1e-2, atol=1e-2)
 
 
+@pytest.mark.parametrize(
+    "M,N,K,in_dtype,out_dtype,accum_dtype,with_bias,propagate_a,propagate_b,layout,enable_tuning",
+    [
+        (1, 1024, 1024, "float16", "float16", "float16", False, False, False, "nt", False),
+    ],
+)
+def test_global_cache_lazy_load_from_database(
+    M,
+    N,
+    K,
+    in_dtype,
+    out_dtype,
+    accum_dtype,
+    with_bias,
+    propagate_a,
+    propagate_b,
+    layout,
+    enable_tuning,
+):
+
+    matmul_config = MatmulConfig(
+        M=M,
+        N=N,
+        K=K,
+        A_dtype=in_dtype,
+        out_dtype=out_dtype,
+        accum_dtype=accum_dtype,
+        with_bias=with_bias,
+        propagate_a=propagate_a,
+        propagate_b=propagate_b,
+        layout=layout,
+    )
+    matmul = Matmul(
+        config=matmul_config,
+        target=target,
+    )
+    if enable_tuning:
+        matmul.hardware_aware_finetune(topk=20)
+    global_operator_cache.add(matmul.config, matmul)
+
+    database_path = "/tmp/.tmp_bitblas_cache_lazy.db"
+    global_operator_cache.save_into_database(database_path, target=target)
+    global_operator_cache.clear()
+    global_operator_cache.load_from_database(database_path, target=target)
+    # only the index is read, the operator is instantiated on the first lookup
+    assert global_operator_cache.exists(matmul_config)
+    assert len(global_operator_cache.cache) == 0
+    assert len(global_operator_cache.lazy_entries) > 0
+
+    matmul = global_operator_cache.get(matmul_config)
+    assert matmul is not None
+    assert matmul_config in global_operator_cache.cache
+
+
+def test_global_cache_drops_broken_lazy_entries(monkeypatch):
+    import shutil
+    from bitblas.cache.operator import OperatorCache
+    database_path = "/tmp/.tmp_bitblas_cache_broken.db"
+    shutil.rmtree(database_path, ignore_errors=True)
+    config = MatmulConfig(M=1, N=1024, K=1024, A_dtype="float16", layout="nt")
+    cache = OperatorCache()
+    cache.add(config, Matmul(config=config, target=target, enable_tuning=False))
+    cache.save_into_database(database_path, target=target)
+    # corrupt the runtime module of the entry
+    arch_path = os.path.join(database_path, target)
+    for entry in os.listdir(arch_path):
+        entry_path = os.path.join(arch_path, entry)
+        if os.path.isdir(entry_path):
+            for file in os.listdir(entry_path):
+                if file.endswith(".tar"):
+                    with open(os.path.join(entry_path, file), "wb") as f:
+                        f.write(b"broken")
+
+    cache = OperatorCache()
+    cache.load_from_database(database_path, target=target)
+    loads = []
+    load_operator = cache._load_operator
+    monkeypatch.setattr(cache, "_load_operator", lambda *args: loads.append(1) or
+                        load_operator(*args))
+    assert cache.get(config) is None
+    assert cache.get(config) is None
+    # the entry is only loaded once
+    assert len(loads) == 1 and not cache.exists(config)
+
+
+def test_global_cache_lru_eviction():
+    from bitblas.cache.operator import OperatorCache
+    cache = OperatorCache(max_entries=2, eviction_policy="lru")
+    configs = [
+        MatmulConfig(M=1, N=N, K=1024, A_dtype="float16", layout="nt") for N in [1024, 2048, 4096]
+    ]
+    operators = [Matmul(config=config, target=target, enable_tuning=False) for config in configs]
+    cache.add(configs[0], operators[0])
+    cache.add(configs[1], operators[1])
+    # touch the first entry so that the second one becomes the least recently used
+    assert cache.get(configs[0]) is not None
+    cache.add(configs[2], operators[2])
+    assert cache.exists(configs[0])
+    assert not cache.exists(configs[1])
+    # the cache only drops its reference, the evicted operator stays usable
+    assert operators[1].rt_mod is not None
+    assert cache.get(configs[1]) is None
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2
+    # the canonical config of an evicted entry is dropped with it
+    assert len(cache._canonical_configs) == 2
+
+    # evicted operators are unloaded when opted in
+    cache.set_capacity(max_entries=1, eviction_policy="lru", release_on_evict=True)
+    assert operators[0].rt_mod is None and operators[0].lib is None
+    assert operators[2].rt_mod is not None
+
+
+def test_global_cache_packed_database():
+    from bitblas.cache import export_to_directory, import_from_directory
+    matmul_config = MatmulConfig(M=1, N=1024, K=1024, A_dtype="float16", layout="nt")
+    matmul = Matmul(config=matmul_config, target=target, enable_tuning=False)
+    global_operator_cache.clear()
+    global_operator_cache.add(matmul.config, matmul)
+
+    packed_path = "/tmp/.tmp_bitblas_cache_packed.sqlite"
+    if os.path.exists(packed_path):
+        os.remove(packed_path)
+    global_operator_cache.save_into_packed_database(packed_path, target=target)
+    global_operator_cache.clear()
+    # load_from_database accepts a packed database file as well
+    global_operator_cache.load_from_database(packed_path, target=target)
+    assert global_operator_cache.get(matmul_config) is not None
+
+    # round trip through the directory layout
+    database_path = "/tmp/.tmp_bitblas_cache_exported.db"
+    export_to_directory(packed_path, database_path)
+    # the index is published through the locked, atomic update of the operator cache
+    from bitblas.cache.operator import INDEX_FILE_NAME, TMP_ENTRY_PREFIX
+    arch_path = os.path.join(database_path, target)
+    assert os.path.exists(os.path.join(arch_path, INDEX_FILE_NAME))
+    assert not any(name.startswith(TMP_ENTRY_PREFIX) for name in os.listdir(arch_path))
+    reimported_path = "/tmp/.tmp_bitblas_cache_reimported.sqlite"
+    if os.path.exists(reimported_path):
+        os.remove(reimported_path)
+    assert import_from_directory(database_path, reimported_path) > 0
+    global_operator_cache.clear()
+    global_operator_cache.load_from_database(reimported_path, target=target)
+    assert global_operator_cache.get(matmul_config) is not None
+
+
+def test_packed_database_concurrent_writes(tmp_path):
+    from bitblas.cache.packed import PackedDatabase
+    entry_dir = tmp_path / "entry"
+    entry_dir.mkdir()
+    (entry_dir / "MatmulConfig.json").write_text("{}")
+    index_entry = {"config_type": "MatmulConfig", "operator_type": "Matmul", "config": {}}
+    packed_path = str(tmp_path / "packed.sqlite")
+    # two connections stand for two writer processes
+    with PackedDatabase(packed_path) as first, PackedDatabase(packed_path) as second:
+        assert first.write_entry("arch", "hash", index_entry, str(entry_dir))
+        assert not second.write_entry("arch", "hash", index_entry, str(entry_dir))
+        assert len(first.read_index("arch")) == 1
+        # unknown entries are not extracted
+        with pytest.raises(KeyError):
+            first.extract_entry("arch", "unknown", str(tmp_path / "unknown"))
+        assert not (tmp_path / "unknown").exists()
+
+
+def test_global_cache_incremental_save():
+    import shutil
+    database_path = "/tmp/.tmp_bitblas_cache_incremental.db"
+    shutil.rmtree(database_path, ignore_errors=True)
+    global_operator_cache.clear()
+    configs = [
+        MatmulConfig(M=1, N=N, K=1024, A_dtype="float16", layout="nt") for N in [1024, 2048]
+    ]
+    with global_operator_cache.deferred_flush():
+        for config in configs:
+            matmul = Matmul(config=config, target=target, enable_tuning=False)
+            global_operator_cache.add(config, matmul)
+            global_operator_cache.save_into_database(database_path, target=target)
+            # saves are deferred until the context exits
+            assert len(global_operator_cache.dirty_configs(database_path)) > 0
+    assert len(global_operator_cache.dirty_configs(database_path)) == 0
+
+    global_operator_cache.clear()
+    global_operator_cache.load_from_database(database_path, target=target)
+    for config in configs:
+        assert global_operator_cache.get(config) is not None
+
+
+def test_global_cache_flush_at_exit(monkeypatch):
+    import shutil
+    from bitblas.cache import operator as operator_cache
+    exit_hooks = []
+    monkeypatch.setattr(operator_cache.atexit, "register", exit_hooks.append)
+    deferred_path = "/tmp/.tmp_bitblas_cache_flush_at_exit.db"
+    other_path = "/tmp/.tmp_bitblas_cache_flush_at_exit_other.db"
+    for path in [deferred_path, other_path]:
+        shutil.rmtree(path, ignore_errors=True)
+    cache = operator_cache.OperatorCache()
+    config = MatmulConfig(M=1, N=1024, K=1024, A_dtype="float16", layout="nt")
+    cache.add(config, Matmul(config=config, target=target, enable_tuning=False))
+    cache.enable_flush_at_exit(deferred_path, target)
+    cache.enable_flush_at_exit(deferred_path, target)
+    assert len(exit_hooks) == 1
+
+    # only the saves into the deferred database wait for the exit
+    cache.save_into_database(deferred_path, target=target)
+    cache.save_into_database(other_path, target=target)
+    assert len(cache.dirty_configs(deferred_path)) == 1
+    assert len(cache.dirty_configs(other_path)) == 0
+    with cache.deferred_flush():
+        pass
+    assert len(cache.dirty_configs(deferred_path)) == 1
+    exit_hooks[0]()
+    assert len(cache.dirty_configs(deferred_path)) == 0
+
+
+def test_global_cache_transient_entries():
+    import shutil
+    database_path = "/tmp/.tmp_bitblas_cache_transient.db"
+    shutil.rmtree(database_path, ignore_errors=True)
+    global_operator_cache.clear()
+    config = MatmulConfig(M=1, N=1024, K=1024, A_dtype="float16", layout="nt")
+    matmul = Matmul(config=config, target=target, enable_tuning=False)
+    # e.g. an operator whose tuning ran out of budget
+    global_operator_cache.add(config, matmul, persist=False)
+    assert global_operator_cache.get(config) is matmul
+    global_operator_cache.save_into_database(database_path, target=target)
+    global_operator_cache.clear()
+    global_operator_cache.load_from_database(database_path, target=target)
+    assert not global_operator_cache.exists(config)
+
+    # added again once fully tuned, it is saved
+    global_operator_cache.add(config, matmul, persist=False)
+    global_operator_cache.add(config, matmul)
+    assert global_operator_cache.dirty_configs(database_path) == [config]
+
+
+def test_global_cache_index_journal_compaction(monkeypatch):
+    import json
+    import shutil
+    from bitblas.cache import operator as operator_cache
+    database_path = "/tmp/.tmp_bitblas_cache_journal.db"
+    shutil.rmtree(database_path, ignore_errors=True)
+    monkeypatch.setattr(operator_cache, "INDEX_JOURNAL_MAX_BYTES", 0)
+    global_operator_cache.clear()
+    configs = [
+        MatmulConfig(M=1, N=N, K=1024, A_dtype="float16", layout="nt") for N in [1024, 2048]
+    ]
+    for config in configs:
+        matmul = Matmul(config=config, target=target, enable_tuning=False)
+        global_operator_cache.add(config, matmul)
+        global_operator_cache.save_into_database(database_path, target=target)
+    # the second save appended to the journal, which was compacted into the index
+    arch_path = os.path.join(database_path, target)
+    assert not os.path.exists(os.path.join(arch_path, operator_cache.INDEX_JOURNAL_NAME))
+    with open(os.path.join(arch_path, operator_cache.INDEX_FILE_NAME)) as f:
+        assert len(json.load(f)) == len(configs)
+
+
+def test_global_cache_concurrent_saves():
+    import shutil
+    import threading
+    from bitblas.cache.operator import OperatorCache, TMP_ENTRY_PREFIX
+    database_path = "/tmp/.tmp_bitblas_cache_concurrent.db"
+    shutil.rmtree(database_path, ignore_errors=True)
+    config = MatmulConfig(M=1, N=1024, K=1024, A_dtype="float16", layout="nt")
+    matmul = Matmul(config=config, target=target, enable_tuning=False)
+    # each cache stands for a process saving the same config
+    caches = [OperatorCache() for _ in range(4)]
+    tuned = []
+
+    def _save(cache):
+        with cache.entry_lock(config, database_path, target):
+            cache.load_from_database(database_path, target)
+            if not cache.exists(config):
+                tuned.append(cache)
+                cache.add(config, matmul)
+                cache.save_into_database(database_path, target=target)
+
+    threads = [threading.Thread(target=_save, args=(cache,)) for cache in caches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(tuned) == 1
+
+    # without the entry lock, a single publisher wins the rename
+    arch_path = os.path.join(database_path, target)
+    config_path = os.path.join(arch_path, "racing-entry")
+    barrier = threading.Barrier(len(caches))
+    published = []
+
+    def _publish(cache):
+        barrier.wait()
+        published.append(cache._publish_entry(config, matmul, arch_path, config_path))
+
+    threads = [threading.Thread(target=_publish, args=(cache,)) for cache in caches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(published) == [False] * (len(caches) - 1) + [True]
+    shutil.rmtree(config_path)
+
+    assert not any(name.startswith(TMP_ENTRY_PREFIX) for name in os.listdir(arch_path))
+    entries = [
+        name for name in os.listdir(arch_path) if os.path.isdir(os.path.join(arch_path, name))
+    ]
+    assert len(entries) == 1
+    index = caches[0]._read_index(arch_path)
+    assert list(index) == entries
+    cache = OperatorCache()
+    cache.load_from_database(database_path, target)
+    assert cache.get(config) is not None
+
+
+def test_global_cache_indexes_unindexed_entries():
+    import shutil
+    from bitblas.cache.operator import OperatorCache, get_database_key
+    database_path = "/tmp/.tmp_bitblas_cache_unindexed.db"
+    shutil.rmtree(database_path, ignore_errors=True)
+    configs = [
+        MatmulConfig(M=1, N=N, K=1024, A_dtype="float16", layout="nt") for N in [1024, 2048]
+    ]
+    operators = [Matmul(config=config, target=target, enable_tuning=False) for config in configs]
+    cache = OperatorCache()
+    cache.add(configs[0], operators[0])
+    cache.save_into_database(database_path, target=target)
+    # a writer which crashed between publishing the entry and indexing it
+    arch_path = os.path.join(database_path, target)
+    cache._publish_entry(configs[1], operators[1], arch_path,
+                         os.path.join(arch_path, get_database_key(configs[1], target)))
+    cache = OperatorCache()
+    cache.load_from_database(database_path, target=target)
+    assert not cache.exists(configs[1])
+
+    cache.add(configs[1], operators[1])
+    cache.save_into_database(database_path, target=target)
+    assert len(cache._read_index(arch_path)) == 2
+    cache = OperatorCache()
+    cache.load_from_database(database_path, target=target)
+    assert cache.get(configs[1]) is not None
+
+
+def test_global_cache_warm_start_from_nearest():
+    global_operator_cache.clear()
+    tuned_config = MatmulConfig(M=16, N=1024, K=1024, A_dtype="float16", layout="nt")
+    tuned_matmul = Matmul(config=tuned_config, target=target, enable_tuning=False)
+    tuned_matmul.hardware_aware_finetune(topk=10)
+    assert len(tuned_matmul.tuned_hints) > 0
+    global_operator_cache.add(tuned_config, tuned_matmul)
+
+    # a slightly wider config reuses the tuned hints of the closest entry
+    config = MatmulConfig(M=16, N=1536, K=1024, A_dtype="float16", layout="nt")
+    seed_hints = global_operator_cache.find_nearest_hints(config)
+    assert seed_hints == tuned_matmul.tuned_hints
+    # a different dtype is not compatible
+    assert global_operator_cache.find_nearest_hints(
+        MatmulConfig(M=16, N=1536, K=1024, A_dtype="float16", W_dtype="int4",
+                     layout="nt")) is None
+
+    matmul = Matmul(config=config, target=target, enable_tuning=False)
+    matmul.hardware_aware_finetune(topk=10, seed_hints=seed_hints, seed_only=True)
+    assert matmul.rt_mod is not None
+
+
+def test_global_cache_canonical_keys():
+    import json
+    import shutil
+    from bitblas.cache import get_config_key
+    from bitblas.ops.operator import TransformKind
+    config = MatmulConfig(M=[1, 16], N=1024, K=1024, A_dtype="float16", layout="nt",
+                          propagate_b=False)
+    equivalent = MatmulConfig(M=(1, 16), N=1024, K=1024, A_dtype="float16", layout="nt",
+                              propagate_b=TransformKind.NonTransform)
+    assert get_config_key(config) == get_config_key(equivalent)
+    assert get_config_key(config) != get_config_key(
+        MatmulConfig(M=[1, 32], N=1024, K=1024, A_dtype="float16", layout="nt"))
+
+    matmul = Matmul(config=config, target=target, enable_tuning=False)
+    global_operator_cache.clear()
+    global_operator_cache.add(config, matmul)
+    assert global_operator_cache.get(equivalent) is matmul
+    # lookups of unknown configs record no canonical config
+    num_canonical = len(global_operator_cache._canonical_configs)
+    missing = MatmulConfig(M=[1, 64], N=1024, K=1024, A_dtype="float16", layout="nt")
+    assert global_operator_cache.get(missing) is None
+    assert not global_operator_cache.exists(missing)
+    assert len(global_operator_cache._canonical_configs) == num_canonical
+
+    database_path = "/tmp/.tmp_bitblas_cache_canonical.db"
+    shutil.rmtree(database_path, ignore_errors=True)
+    global_operator_cache.save_into_database(database_path, target=target)
+    # strip the key fields from the index, as written by earlier versions
+    arch_path = os.path.join(database_path, target)
+    index_path = os.path.join(arch_path, "index.json")
+    with open(index_path) as f:
+        index = json.load(f)
+    for entry in index.values():
+        for field in ("config_key", "key_version", "versions", "arch"):
+            entry.pop(field)
+    with open(index_path, "w") as f:
+        json.dump(index, f)
+    global_operator_cache.clear()
+    global_operator_cache.load_from_database(database_path, target=target)
+    assert global_operator_cache.get(equivalent) is not None
+
+
+def test_global_cache_async_preload():
+    import shutil
+    database_path = "/tmp/.tmp_bitblas_cache_preload.db"
+    shutil.rmtree(database_path, ignore_errors=True)
+    configs = [
+        MatmulConfig(M=1, N=N, K=1024, A_dtype="float16", layout="nt") for N in [1024, 2048]
+    ]
+    global_operator_cache.clear()
+    for config in configs:
+        global_operator_cache.add(config, Matmul(config=config, target=target,
+                                                 enable_tuning=False))
+    global_operator_cache.save_into_database(database_path, target=target)
+
+    global_operator_cache.clear()
+    future = global_operator_cache.preload(database_path, target=target, max_workers=2)
+    # get blocks on the entry it needs while the rest is loaded in the background
+    assert global_operator_cache.get(configs[1]) is not None
+    assert future.result() <= len(configs)
+    assert not global_operator_cache.is_preloading()
+    for config in configs:
+        assert global_operator_cache.get(config) is not None
+
+
 # fmt: on
 if __name__ == "__main__":
     bitblas.testing.main()
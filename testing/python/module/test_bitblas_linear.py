@@ -169,6 +169,27 @@ def test_correctness_weight_only_dequantize(
     torch.testing.assert_close(output_bitblas, ref_result, rtol=1e0, atol=1e0)
 
 
+def test_retune_from_recorded_histogram():
+    in_features, out_features = 1024, 1024
+    linear_torch = (nn.Linear(in_features, out_features, bias=False).to(torch.float16).cuda())
+    linear_bitblas = BitBLASLinear(
+        in_features, out_features, opt_M=[1, 16, 32, 64, 128, 256, 512]).cuda()
+    with torch.no_grad():
+        linear_bitblas.load_and_transform_weight(linear_torch.weight.clone())
+
+    linear_bitblas.record_m = True
+    with torch.no_grad():
+        for m in [1, 1, 1, 8, 48]:
+            linear_bitblas(torch.randn(m, in_features, dtype=torch.float16).cuda())
+    assert linear_bitblas.m_histogram == {1: 3, 8: 1, 48: 1}
+
+    assert linear_bitblas.retune_from_histogram(max_buckets=2) == [1, 48]
+    with torch.no_grad():
+        input_data = torch.randn(48, in_features, dtype=torch.float16).cuda()
+        output_bitblas = linear_bitblas(input_data)
+    torch.testing.assert_close(linear_torch(input_data), output_bitblas, rtol=1e-1, atol=1e-2)
+
+
 def profile(model, input_data):
     model = model.cuda()
     model.eval()
@@ -0,0 +1,94 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import os
+import pytest
+import bitblas
+from bitblas import tvm
+from bitblas import Matmul, MatmulConfig
+from bitblas.base.roller.arch import CUDA
+from bitblas.base.roller.policy import DefaultPolicy
+from bitblas.base.utils import (apply_and_build_parallel, apply_and_build_buckets, _apply_config,
+                                _apply_config_in_worker, ARTIFACT_DIR_PREFIX)
+
+target = bitblas.utils.auto_detect_nvidia_target()
+
+
+@pytest.mark.parametrize("queue_size", [1, 4, None])
+def test_pipelined_apply_and_build(queue_size):
+    config = MatmulConfig(M=16, N=1024, K=1024, A_dtype="float16", layout="nt")
+    matmul = Matmul(config=config, target=target, enable_tuning=False)
+    arch = CUDA(tvm.target.Target(target))
+    configs = DefaultPolicy(func=matmul.prim_func, arch=arch).emit_config(8)
+    cpresults, best = apply_and_build_parallel(
+        matmul.prim_func, configs, arch, max_workers=4, queue_size=queue_size)
+    assert best is not None
+    assert len(cpresults) <= len(configs)
+    assert best.latency == min(cpresult.latency for cpresult in cpresults)
+
+
+def test_buckets_share_builds():
+    config = MatmulConfig(M=[16, 32], N=1024, K=1024, A_dtype="float16", layout="nt")
+    matmul = Matmul(config=config, target=target, enable_tuning=False)
+    arch = CUDA(tvm.target.Target(target))
+    funcs = [matmul.prim_func.with_attr("opt_shapes", {"m": m}) for m in [16, 32]]
+    configs = DefaultPolicy(func=funcs[0], arch=arch).emit_config(4)
+    results = apply_and_build_buckets(funcs, [configs, configs], arch, max_workers=4)
+    assert all(best is not None for _, best in results)
+    # the schedules of both buckets only differ in their opt_shapes, so they are built once
+    modules = {id(cpresult.mod) for cpresult in results[0][0]}
+    assert all(id(cpresult.mod) in modules for cpresult in results[1][0])
+
+
+def test_successive_halving_measurement():
+    config = MatmulConfig(M=16, N=1024, K=1024, A_dtype="float16", layout="nt")
+    matmul = Matmul(config=config, target=target, enable_tuning=False)
+    arch = CUDA(tvm.target.Target(target))
+    configs = DefaultPolicy(func=matmul.prim_func, arch=arch).emit_config(8)
+    cpresults, best = apply_and_build_parallel(
+        matmul.prim_func, configs, arch, max_workers=4, measure_strategy="successive_halving")
+    assert best is not None
+    # the cheap round alone takes three samples per candidate
+    assert len(best.latency_samples) >= 3
+    assert best.latency_std >= 0
+    # the best is the fastest survivor, the eliminated candidates are not ranked
+    survivors = [cpresult for cpresult in cpresults if cpresult.ranked]
+    assert best.ranked
+    assert best.latency == min(cpresult.latency for cpresult in survivors)
+
+
+def test_apply_schedules_in_worker_processes():
+    config = MatmulConfig(M=16, N=1024, K=1024, A_dtype="float16", layout="nt")
+    matmul = Matmul(config=config, target=target, enable_tuning=False)
+    arch = CUDA(tvm.target.Target(target))
+    configs = DefaultPolicy(func=matmul.prim_func, arch=arch).emit_config(4)
+    _, best = apply_and_build_parallel(
+        matmul.prim_func, configs, arch, max_workers=4, apply_workers=2, apply_in_process=True)
+    assert best is not None
+
+    # a hint shipped as json schedules the same module as the hint itself
+    mod_json = _apply_config_in_worker(
+        tvm.ir.save_json(matmul.prim_func), configs[0].to_json(), str(arch.target))
+    assert tvm.ir.structural_equal(
+        tvm.ir.load_json(mod_json), _apply_config(matmul.prim_func, configs[0]).mod)
+
+
+@pytest.mark.parametrize("in_memory", [False, True])
+def test_build_artifacts_are_removed(in_memory, tmp_path, monkeypatch):
+    monkeypatch.setenv("BITBLAS_ARTIFACT_DIR", str(tmp_path))
+    # the directory of a killed tuning process is swept
+    stale_dir = tmp_path / f"{ARTIFACT_DIR_PREFIX}999999999_stale"
+    stale_dir.mkdir()
+    config = MatmulConfig(M=16, N=1024, K=1024, A_dtype="float16", layout="nt")
+    matmul = Matmul(config=config, target=target, enable_tuning=False)
+    arch = CUDA(tvm.target.Target(target))
+    configs = DefaultPolicy(func=matmul.prim_func, arch=arch).emit_config(4)
+    _, best = apply_and_build_parallel(
+        matmul.prim_func, configs, arch, max_workers=4, in_memory=in_memory)
+    assert best is not None
+    # the loaded modules do not need their artifacts
+    assert best.time_evaluator(*best.profile_tensors).mean > 0
+    assert os.listdir(tmp_path) == []
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
@@ -0,0 +1,68 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import os
+import shutil
+import bitblas
+from bitblas import BatchTuner, MatmulConfig
+from bitblas.base import TuningBudget
+from bitblas.cache import global_operator_cache
+
+target = bitblas.utils.auto_detect_nvidia_target()
+
+
+def test_batch_tuner_dedup_and_resume():
+    database_path = "/tmp/.tmp_bitblas_batch_tuner_database"
+    log_path = "/tmp/.tmp_bitblas_batch_tuner_log.jsonl"
+    shutil.rmtree(database_path, ignore_errors=True)
+    if os.path.exists(log_path):
+        os.remove(log_path)
+    global_operator_cache.clear()
+
+    configs = [
+        MatmulConfig(M=1, N=1024, K=1024, A_dtype="float16", layout="nt"),
+        MatmulConfig(M=[1, 16], N=1024, K=1024, A_dtype="float16", layout="nt"),
+        # a duplicate of the first config
+        MatmulConfig(M=1, N=1024, K=1024, A_dtype="float16", layout="nt"),
+    ]
+    tuner = BatchTuner(
+        target, database_path=database_path, topk=4, tuning_log=log_path, show_progress=False)
+    ops = tuner.tune(configs)
+    assert ops[0] is ops[2]
+    assert tuner.stats["unique"] == 2
+    assert tuner.stats["tuned"] == 2
+    assert ops[1].dynamic_range is not None and ops[1].lib is not None
+
+    # a new job finds the operators in the database
+    global_operator_cache.clear()
+    tuner = BatchTuner(target, database_path=database_path, topk=4, show_progress=False)
+    tuner.tune(configs)
+    assert tuner.stats["cached"] == 2
+    assert tuner.stats["tuned"] == 0
+
+
+def test_batch_tuner_does_not_save_partial_tunings():
+    database_path = "/tmp/.tmp_bitblas_batch_tuner_partial_database"
+    shutil.rmtree(database_path, ignore_errors=True)
+    global_operator_cache.clear()
+
+    configs = [MatmulConfig(M=16, N=1024, K=1024, A_dtype="float16", layout="nt")]
+    tuner = BatchTuner(
+        target,
+        database_path=database_path,
+        topk=8,
+        budget=TuningBudget(max_builds=1),
+        show_progress=False)
+    ops = tuner.tune(configs)
+    assert tuner.stats["partial"] == 1 and tuner.stats["tuned"] == 0
+    assert ops[0].lib is not None
+
+    # a new job tunes the config again instead of loading the partial tuning
+    global_operator_cache.clear()
+    tuner = BatchTuner(target, database_path=database_path, topk=8, show_progress=False)
+    tuner.tune(configs)
+    assert tuner.stats["cached"] == 0
+    assert tuner.stats["tuned"] == 1
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
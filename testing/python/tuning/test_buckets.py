@@ -0,0 +1,69 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+from types import SimpleNamespace
+import bitblas
+from bitblas import tvm
+from tvm import te
+from bitblas.base import select_buckets
+from bitblas.base.utils import CompileResult, merge_identical_buckets
+
+
+def test_select_buckets():
+    histogram = {1: 1000, 2: 30, 16: 400, 17: 2, 512: 50}
+    # the largest size is always covered
+    assert select_buckets(histogram, max_buckets=1) == [512]
+    buckets = select_buckets(histogram, max_buckets=3)
+    assert len(buckets) == 3 and buckets[-1] == 512
+    # the frequent sizes get their own buckets
+    assert 1 in buckets
+    assert select_buckets(histogram, max_buckets=10) == [1, 2, 16, 17, 512]
+
+
+def test_select_buckets_with_measured_cost():
+    # a kernel tuned for 16 rows serves the small sizes as fast as a dedicated one
+    def cost_fn(m, bucket):
+        return 1.0 if bucket <= 16 else bucket / m
+
+    assert select_buckets({1: 100, 8: 100, 16: 100, 256: 1}, max_buckets=3, cost_fn=cost_fn) == [
+        16, 256
+    ]
+
+
+def _make_result(op, m):
+    A = te.placeholder((1024,), name="A", dtype="float16")
+    B = te.compute((1024,), lambda i: op(A[i]), name="B")
+    func = te.create_prim_func([A, B]).with_attr("opt_shapes", {"m": m})
+    config = SimpleNamespace(pass_context={})
+    return CompileResult(config, SimpleNamespace(mod=tvm.IRModule({"main": func})), None)
+
+
+def test_merge_identical_buckets():
+    double, square = (lambda x: x * 2), (lambda x: x * x)
+    bucket_results = [({"m": m}, _make_result(op, m)) for m, op in [(16, double), (32, double),
+                                                                     (64, square)]]
+    # the smaller of two identical kernels, up to the opt_shapes, is dropped
+    merged = merge_identical_buckets(bucket_results)
+    assert [shapes for shapes, _ in merged] == [{"m": 32}, {"m": 64}]
+    assert merged[0][1] is bucket_results[1][1]
+
+
+def test_merge_identical_buckets_grid():
+    double, square, negate = (lambda x: x * 2), (lambda x: x * x), (lambda x: -x)
+
+    def grid(ops):
+        return [({
+            "m": m,
+            "n": n
+        }, _make_result(op, m)) for (m, n), op in zip([(16, 1024), (16, 2048), (32, 1024),
+                                                       (32, 2048)], ops)]
+
+    # m=16 and m=32 are identical for every n, so the m=16 row is merged
+    merged = merge_identical_buckets(grid([double, square, double, square]))
+    assert [shapes for shapes, _ in merged] == [{"m": 32, "n": 1024}, {"m": 32, "n": 2048}]
+    # a single differing kernel keeps the grid, no bucket is merged
+    merged = merge_identical_buckets(grid([double, square, double, negate]))
+    assert len(merged) == 4
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
@@ -0,0 +1,46 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import pytest
+import bitblas
+from bitblas import tvm
+from bitblas import Matmul, MatmulConfig
+from bitblas.base import BuildServer, RemoteBuilder
+from bitblas.base.roller.arch import CUDA
+from bitblas.base.roller.policy import DefaultPolicy
+from bitblas.base.utils import apply_and_build_parallel
+
+target = bitblas.utils.auto_detect_nvidia_target()
+
+AUTHKEY = b"bitblas-test"
+
+
+@pytest.fixture
+def build_server():
+    server = BuildServer(("localhost", 0), authkey=AUTHKEY, max_workers=2).start()
+    yield server
+    server.close()
+
+
+def test_remote_builder(build_server):
+    builder = RemoteBuilder([build_server.address], authkey=AUTHKEY)
+    assert builder.max_workers == 2
+    config = MatmulConfig(M=16, N=1024, K=1024, A_dtype="float16", layout="nt")
+    matmul = Matmul(config=config, target=target, enable_tuning=False)
+    arch = CUDA(tvm.target.Target(target))
+    configs = DefaultPolicy(func=matmul.prim_func, arch=arch).emit_config(4)
+    try:
+        cpresults, best = apply_and_build_parallel(
+            matmul.prim_func, configs, arch, builder=builder)
+    finally:
+        builder.shutdown()
+    assert best is not None
+    assert best.latency == min(cpresult.latency for cpresult in cpresults)
+
+
+def test_remote_builder_rejects_wrong_authkey(build_server):
+    with pytest.raises(Exception):
+        RemoteBuilder([build_server.address], authkey=b"wrong")
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
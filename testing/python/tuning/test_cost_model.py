@@ -0,0 +1,38 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import os
+import bitblas
+from bitblas import tvm
+from bitblas import Matmul, MatmulConfig
+from bitblas.base import RidgeCostModel, TuningLog, fast_tune
+
+target = bitblas.utils.auto_detect_nvidia_target()
+
+
+def test_ridge_cost_model_prunes_candidates():
+    log_path = "/tmp/.tmp_bitblas_cost_model_log.jsonl"
+    if os.path.exists(log_path):
+        os.remove(log_path)
+    tuning_log = TuningLog(log_path)
+    tvm_target = tvm.target.Target(target)
+    for N in [1024, 2048]:
+        config = MatmulConfig(M=16, N=N, K=1024, A_dtype="float16", layout="nt")
+        matmul = Matmul(config=config, target=target, enable_tuning=False)
+        fast_tune(matmul.prim_func, tvm_target, topk=10, tuning_log=tuning_log)
+
+    cost_model = RidgeCostModel().fit_from_log(tuning_log)
+    assert cost_model.is_trained
+    model_path = "/tmp/.tmp_bitblas_cost_model.json"
+    cost_model.save(model_path)
+    cost_model = RidgeCostModel.load(model_path)
+
+    config = MatmulConfig(M=16, N=4096, K=1024, A_dtype="float16", layout="nt")
+    matmul = Matmul(config=config, target=target, enable_tuning=False)
+    cpresults, best = fast_tune(
+        matmul.prim_func, tvm_target, topk=20, cost_model=cost_model, prune_topk=3)
+    assert len(cpresults) <= 3
+    assert best is not None
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
@@ -0,0 +1,91 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import os
+import numpy as np
+import bitblas
+from bitblas import tvm
+from tvm import te
+from bitblas.base import TuningBudget, TuningLog
+from bitblas.base.roller.arch import CUDA
+from bitblas.base.utils import fast_tune_with_dynamic_range
+from bitblas.wrapper.general import CUDASourceWrapperWithDynamic
+
+target = bitblas.utils.auto_detect_nvidia_target()
+
+
+def batch_matmul_nt(N=256, K=256, dtype="float16"):
+    B = te.var("b")
+    M = te.var("m")
+    A = te.placeholder((B, M, K), name="A", dtype=dtype)
+    W = te.placeholder((B, N, K), name="W", dtype=dtype)
+    k = te.reduce_axis((0, K), name="k")
+    C = te.compute(
+        (B, M, N),
+        lambda b, i, j: te.sum(A[b, i, k].astype("float32") * W[b, j, k].astype("float32"),
+                               axis=k),
+        name="C",
+    )
+    D = te.compute((B, M, N), lambda b, i, j: C[b, i, j].astype(dtype), name="D")
+    return te.create_prim_func([A, W, D]).with_attr("global_symbol", "batch_matmul")
+
+
+def test_multi_symbol_dispatch():
+    tvm_target = tvm.target.Target(target)
+    dispatch_mod = fast_tune_with_dynamic_range(
+        batch_matmul_nt(),
+        tvm_target,
+        topk=4,
+        dynamic_range={
+            "b": [1, 4],
+            "m": [16, 64]
+        },
+    )
+    assert dispatch_mod is not None
+    # one kernel per bucket of the grid, plus the dispatch function
+    assert len(dispatch_mod.functions) == 5
+
+    with tvm.transform.PassContext(config={"tir.use_async_copy": True}):
+        rt_mod = tvm.build(dispatch_mod, target=tvm_target)
+    device = tvm.cuda(0)
+    # shapes inside, between and beyond the buckets of both symbols
+    for b, m in [(1, 16), (3, 7), (4, 64), (6, 100)]:
+        a = np.random.uniform(-1, 1, (b, m, 256)).astype("float16")
+        w = np.random.uniform(-1, 1, (b, 256, 256)).astype("float16")
+        d = tvm.nd.empty((b, m, 256), "float16", device)
+        rt_mod(tvm.nd.array(a, device), tvm.nd.array(w, device), d)
+        expected = np.matmul(a.astype("float32"), w.astype("float32").transpose(0, 2, 1))
+        np.testing.assert_allclose(d.numpy(), expected, rtol=1e-2, atol=1e-1)
+
+    # the C wrapper selects the kernels with the same decision tree
+    source = rt_mod.imported_modules[0].get_source()
+    wrapper = CUDASourceWrapperWithDynamic(dispatch_mod, source, CUDA(tvm_target))
+    assert "if (b == 0 || m == 0) return;" in wrapper.lib_code
+    # an if/else-if chain over m in each of the three branches over b
+    assert wrapper.lib_code.count("if (m <= 16)") == 3
+
+
+def test_dynamic_range_tuning_options():
+    log_path = "/tmp/.tmp_bitblas_dynamic_dispatch_log.jsonl"
+    if os.path.exists(log_path):
+        os.remove(log_path)
+    tuning_log = TuningLog(log_path)
+    budget = TuningBudget(max_builds=100)
+    dispatch_mod = fast_tune_with_dynamic_range(
+        batch_matmul_nt(),
+        tvm.target.Target(target),
+        topk=4,
+        dynamic_range={
+            "b": [1, 4],
+            "m": [16, 64]
+        },
+        tuning_log=tuning_log,
+        budget=budget,
+    )
+    assert dispatch_mod is not None
+    # the options reach the bucket pipeline
+    assert budget.report()["candidates"] > 0
+    assert len(tuning_log.query()) == budget.report()["explored"]
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
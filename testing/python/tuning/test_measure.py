@@ -0,0 +1,54 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import bitblas
+from bitblas import tvm
+from bitblas import Matmul, MatmulConfig
+from bitblas.base import MeasureOption, TuningLog, summarize_latency
+from bitblas.base.roller.arch import CUDA
+from bitblas.base.roller.policy import DefaultPolicy
+from bitblas.base.utils import apply_and_build_parallel
+
+target = bitblas.utils.auto_detect_nvidia_target()
+
+
+def test_summarize_latency_rejects_outliers():
+    samples, stats = summarize_latency([1.0, 1.1, 0.9, 1.0, 1.05, 9.0])
+    assert 9.0 not in samples
+    assert stats["num_outliers"] == 1
+    assert stats["num_samples"] == 5
+    assert stats["median"] == 1.0
+    assert stats["min"] <= stats["median"] <= stats["p90"]
+
+    # without a threshold every sample is kept
+    samples, stats = summarize_latency([1.0, 1.1, 9.0], outlier_threshold=None)
+    assert len(samples) == 3 and stats["num_outliers"] == 0
+
+
+def test_robust_measurement(tmp_path):
+    config = MatmulConfig(M=1, N=1024, K=1024, A_dtype="float16", layout="nt")
+    matmul = Matmul(config=config, target=target, enable_tuning=False)
+    arch = CUDA(tvm.target.Target(target))
+    configs = DefaultPolicy(func=matmul.prim_func, arch=arch).emit_config(4)
+    tuning_log = TuningLog(str(tmp_path / "tuning_log.jsonl"))
+    option = MeasureOption(warmup=2, repeat=10)
+    cpresults, best = apply_and_build_parallel(
+        matmul.prim_func,
+        configs,
+        arch,
+        max_workers=4,
+        tuning_log=tuning_log,
+        measure_strategy="robust",
+        measure_option=option)
+    assert best is not None
+    assert best.latency == best.latency_stats["median"]
+    assert best.latency_stats["num_samples"] + best.latency_stats["num_outliers"] == 10
+    # the statistics are recorded with the latency
+    record = tuning_log.best(TuningLog.get_workload_key(matmul.prim_func), str(arch.target))
+    assert record["stats"]["median"] == record["latency"]
+
+    matmul.profile_latency(measure_option=option)
+    assert matmul.latency_stats["p90"] >= matmul.latency_stats["median"]
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
@@ -0,0 +1,64 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import pytest
+import bitblas
+from bitblas import tvm
+from tvm import te
+from bitblas.base.roller.arch import CUDA
+from bitblas.base.roller.policy import DefaultPolicy
+
+target = bitblas.utils.auto_detect_nvidia_target()
+
+
+def matmul_nt(M, N, K, dtype="float16"):
+    A = te.placeholder((M, K), name="A", dtype=dtype)
+    B = te.placeholder((N, K), name="B", dtype=dtype)
+    k = te.reduce_axis((0, K), name="k")
+    C = te.compute((M, N), lambda i, j: te.sum(A[i, k] * B[j, k], axis=k), name="C")
+    return te.create_prim_func([A, B, C])
+
+
+def batch_matmul_nn(batch, M, N, K, dtype="float16"):
+    A = te.placeholder((batch, M, K), name="A", dtype=dtype)
+    B = te.placeholder((batch, K, N), name="B", dtype=dtype)
+    k = te.reduce_axis((0, K), name="k")
+    C = te.compute((batch, M, N),
+                   lambda b, i, j: te.sum(A[b, i, k] * B[b, k, j], axis=k),
+                   name="C")
+    return te.create_prim_func([A, B, C])
+
+
+def add(M, N, dtype="float16"):
+    A = te.placeholder((M, N), name="A", dtype=dtype)
+    B = te.placeholder((M, N), name="B", dtype=dtype)
+    C = te.compute((M, N), lambda i, j: A[i, j] + B[i, j], name="C")
+    return te.create_prim_func([A, B, C])
+
+
+@pytest.mark.parametrize("func", [
+    matmul_nt(1, 16384, 16384),
+    matmul_nt(128, 1024, 1024),
+    matmul_nt(4096, 4096, 4096, dtype="float32"),
+    batch_matmul_nn(8, 256, 256, 64),
+])
+def test_tile_grid_matches_generic_search(func, monkeypatch):
+    arch = CUDA(tvm.target.Target(target))
+    policy = DefaultPolicy(func=func, arch=arch)
+    assert policy._get_tile_grid_access(policy.prim_func_node) is not None
+    configs = policy.emit_config(20)
+    assert len(configs) > 0
+
+    monkeypatch.setattr(DefaultPolicy, "_evaluate_tile_grid", lambda *args: None)
+    generic_configs = DefaultPolicy(func=func, arch=arch).emit_config(20)
+    assert [repr(config) for config in configs] == [repr(config) for config in generic_configs]
+
+
+def test_irregular_op_uses_generic_search():
+    arch = CUDA(tvm.target.Target(target))
+    policy = DefaultPolicy(func=add(1024, 1024), arch=arch)
+    assert policy._get_tile_grid_access(policy.prim_func_node) is None
+    assert len(policy.emit_config(10)) > 0
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
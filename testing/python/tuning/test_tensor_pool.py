@@ -0,0 +1,62 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import bitblas
+from bitblas import tvm
+from bitblas import Matmul, MatmulConfig
+from bitblas.base import ProfileTensorPool, get_profile_tensor_pool
+from bitblas.base.tensor_pool import get_torch_dtype
+
+target = bitblas.utils.auto_detect_nvidia_target()
+
+
+def test_pool_reuses_device_tensors():
+    pool = ProfileTensorPool()
+    device = tvm.cuda(0)
+    a = pool.get((128, 256), "float16", device)
+    assert a.device == device
+    assert a.shape == (128, 256)
+    assert pool.get((128, 256), "float16", device) is a
+    assert pool.get((128, 256), "float16", device, distribution="onefill") is not a
+    assert (pool.get((16,), "int8", device, distribution="onefill").numpy() == 1).all()
+
+    # the arguments of one call are never aliased
+    x, y = pool.get_tensors([((64, 64), "float16"), ((64, 64), "float16")], device)
+    assert x is not y
+    assert pool.get_tensors([((64, 64), "float16")], device)[0] is x
+
+
+def test_pool_evicts_least_recently_used():
+    pool = ProfileTensorPool(max_bytes=2 * 1024 * 2)
+    device = tvm.cuda(0)
+    first = pool.get((1024,), "float16", device)
+    pool.get((1025,), "float16", device)
+    assert len(pool) == 1
+    assert pool.nbytes == 1025 * 2
+    assert pool.get((1024,), "float16", device) is not first
+
+
+def test_operators_share_profile_tensors():
+    config = MatmulConfig(M=16, N=1024, K=1024, A_dtype="float16", layout="nt")
+    matmul = Matmul(config=config, target=target, enable_tuning=False)
+    other = Matmul(config=config, target=target, enable_tuning=False)
+    tensors = matmul.get_profile_tensors()
+    assert all(a is b for a, b in zip(tensors, other.get_profile_tensors()))
+    assert matmul.profile_latency() > 0
+    assert len(get_profile_tensor_pool()) >= len(tensors)
+
+
+def test_torch_dtypes_of_tvm_names():
+    import torch
+    assert get_torch_dtype("float16") is torch.float16
+    assert get_torch_dtype("e4m3_float8") is torch.float8_e4m3fn
+    assert get_torch_dtype("e5m2_float8") is torch.float8_e5m2
+    assert get_torch_dtype("int4") is None
+
+    config = MatmulConfig(M=16, N=1024, K=1024, A_dtype="float16", layout="nt")
+    matmul = Matmul(config=config, target=target, enable_tuning=False)
+    output = matmul.get_output_tensor()
+    assert output.dtype is torch.float16 and tuple(output.shape) == (16, 1024)
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
@@ -0,0 +1,56 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import os
+import bitblas
+from bitblas import tvm
+from bitblas import Matmul, MatmulConfig
+from bitblas.base import TuningBudget, TuningLog
+from bitblas.base.roller.arch import CUDA
+from bitblas.base.roller.policy import DefaultPolicy
+from bitblas.base.utils import apply_and_build_parallel
+
+target = bitblas.utils.auto_detect_nvidia_target()
+
+
+def test_build_budget_keeps_best_so_far():
+    log_path = "/tmp/.tmp_bitblas_tuning_budget_log.jsonl"
+    if os.path.exists(log_path):
+        os.remove(log_path)
+    config = MatmulConfig(M=16, N=1024, K=1024, A_dtype="float16", layout="nt")
+    matmul = Matmul(config=config, target=target, enable_tuning=False)
+    arch = CUDA(tvm.target.Target(target))
+    configs = DefaultPolicy(func=matmul.prim_func, arch=arch).emit_config(8)
+    budget = TuningBudget(max_builds=2)
+    tuning_log = TuningLog(log_path)
+    _, best = apply_and_build_parallel(
+        matmul.prim_func, configs, arch, max_workers=1, tuning_log=tuning_log, budget=budget)
+    assert best is not None
+    report = budget.report()
+    assert report["builds"] == 2 and report["exhausted"]
+    assert report["candidates"] == len(configs)
+    assert report["explored"] < len(configs) and not report["complete"]
+    # the unexplored candidates are left for a later run
+    assert len(tuning_log.query()) == report["explored"]
+
+
+def test_exhausted_time_budget_keeps_default_schedule():
+    config = MatmulConfig(M=16, N=1024, K=1024, A_dtype="float16", layout="nt")
+    matmul = Matmul(config=config, target=target, enable_tuning=False)
+    budget = TuningBudget(max_seconds=0)
+    matmul.hardware_aware_finetune(topk=10, budget=budget)
+    assert budget.report()["explored"] == 0
+    assert matmul.rt_mod is not None
+
+
+def test_budget_exhausted_by_the_last_candidate_is_complete():
+    budget = TuningBudget(max_builds=2).start()
+    budget.candidates += 2
+    budget.builds += 2
+    budget.explored += 2
+    assert budget.exhausted and budget.is_complete
+    budget.candidates += 1
+    assert not budget.is_complete
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
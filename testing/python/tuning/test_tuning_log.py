@@ -0,0 +1,69 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import os
+import bitblas
+from bitblas import Matmul, MatmulConfig
+from bitblas.base import TuningLog, set_tuning_log
+
+target = bitblas.utils.auto_detect_nvidia_target()
+
+
+def test_tuning_log_append_and_query():
+    log_path = "/tmp/.tmp_bitblas_tuning_log.jsonl"
+    if os.path.exists(log_path):
+        os.remove(log_path)
+    tuning_log = TuningLog(log_path)
+    hint_json = {"block": [16, 128], "pass_context": {}}
+    tuning_log.append([
+        tuning_log.make_record("workload", "sm_80", hint_json, "ok", 0.5, [0.5, 0.5]),
+        tuning_log.make_record("workload", "sm_80", {"block": [32, 64]}, "build_failed"),
+    ])
+    # an interrupted writer leaves a truncated line behind
+    with open(log_path, "a") as f:
+        f.write('{"workload": "wor')
+    assert len(tuning_log.query(workload="workload")) == 2
+    assert len(tuning_log.query(status="ok")) == 1
+    assert tuning_log.best("workload", "sm_80")["latency"] == 0.5
+    assert tuning_log.get_candidate_key(hint_json) in tuning_log.lookup("workload", "sm_80")
+
+
+def test_tuning_log_append_after_truncated_line():
+    log_path = "/tmp/.tmp_bitblas_tuning_log_truncated.jsonl"
+    if os.path.exists(log_path):
+        os.remove(log_path)
+    tuning_log = TuningLog(log_path)
+    tuning_log.append([tuning_log.make_record("workload", "sm_80", {"block": [16]}, "ok", 0.5)])
+    # a crash in the middle of writing the last line
+    with open(log_path, "rb+") as f:
+        f.seek(-10, os.SEEK_END)
+        f.truncate()
+    assert len(tuning_log.query()) == 0
+    tuning_log.append([tuning_log.make_record("workload", "sm_80", {"block": [32]}, "ok", 0.4)])
+    # the new record is not concatenated to the truncated line
+    records = tuning_log.query()
+    assert len(records) == 1 and records[0]["hint"] == {"block": [32]}
+
+
+def test_tuning_log_resume():
+    log_path = "/tmp/.tmp_bitblas_tuning_log_resume.jsonl"
+    if os.path.exists(log_path):
+        os.remove(log_path)
+    tuning_log = set_tuning_log(log_path)
+    try:
+        config = MatmulConfig(M=16, N=1024, K=1024, A_dtype="float16", layout="nt")
+        matmul = Matmul(config=config, target=target, enable_tuning=False)
+        matmul.hardware_aware_finetune(topk=10)
+        num_records = len(tuning_log.query())
+        assert num_records > 0
+
+        # the candidates are all in the log, only the best one is rebuilt
+        matmul = Matmul(config=config, target=target, enable_tuning=False)
+        matmul.hardware_aware_finetune(topk=10)
+        assert len(tuning_log.query()) == num_records
+        assert matmul.rt_mod is not None
+    finally:
+        set_tuning_log(None)
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()
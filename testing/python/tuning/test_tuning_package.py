@@ -0,0 +1,51 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import os
+import bitblas
+from bitblas import tvm
+from bitblas import Matmul, MatmulConfig
+from bitblas.base import TuningLog, build_tuning_package, measure_tuning_package
+from bitblas.base.roller.arch import CUDA
+
+target = bitblas.utils.auto_detect_nvidia_target()
+
+
+def test_deviceless_arch_matches_device():
+    tvm_target = tvm.target.Target(target)
+    deviceless = CUDA(tvm_target, deviceless=True)
+    assert not deviceless.has_device
+    arch = CUDA(tvm_target)
+    assert deviceless.compute_capability == arch.compute_capability
+    assert deviceless.warp_size == arch.warp_size
+
+
+def test_build_then_measure_package(tmp_path):
+    config = MatmulConfig(M=16, N=1024, K=1024, A_dtype="float16", layout="nt")
+    matmul = Matmul(config=config, target=target, enable_tuning=False)
+    package_dir = str(tmp_path / "package")
+    manifest_path = build_tuning_package(matmul.prim_func, target, package_dir, topk=4)
+    assert os.path.exists(manifest_path)
+    assert os.listdir(os.path.join(package_dir, "artifacts"))
+    assert os.listdir(os.path.join(package_dir, "sources"))
+
+    tuning_log = TuningLog(str(tmp_path / "tuning_log.jsonl"))
+    cpresults, best = measure_tuning_package(package_dir, tuning_log=tuning_log)
+    assert best is not None
+    # every candidate is ranked with the fixed strategy
+    assert all(cpresult.ranked for cpresult in cpresults)
+    assert best.latency == min(cpresult.latency for cpresult in cpresults)
+    # the measurements resume a later tuning of the same function
+    assert tuning_log.best(TuningLog.get_workload_key(matmul.prim_func), str(
+        tvm.target.Target(target)))["latency"] == best.latency
+    assert matmul.apply_tuned_best(best) is not None
+
+    # with successive halving the best is the fastest survivor
+    cpresults, best = measure_tuning_package(
+        package_dir, tuning_log=None, measure_strategy="successive_halving")
+    survivors = [cpresult for cpresult in cpresults if cpresult.ranked]
+    assert best is not None and best.ranked
+    assert best.latency == min(cpresult.latency for cpresult in survivors)
+
+
+if __name__ == "__main__":
+    bitblas.testing.main()